@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+DomainSelector 冷启动基准：JSON解析 vs 编译快照
+
+Usage:
+    python scripts/benchmarks/bench_startup.py [--repeat N]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from domain_selector import DomainSelector  # noqa: E402
+
+
+def time_startup(repeat, **kwargs):
+    """重复构造DomainSelector，返回每次耗时（毫秒）"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        DomainSelector(**kwargs)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DomainSelector 冷启动基准")
+    parser.add_argument("--repeat", type=int, default=200, help="每种方式的重复次数")
+    parser.add_argument("--tags-file", default=None, help="morphism_tags.json路径")
+    args = parser.parse_args()
+
+    # 预先生成快照，确保快照路径测到的是纯读取
+    DomainSelector(args.tags_file, use_snapshot=True)
+    snapshot = DomainSelector.snapshot_path(
+        args.tags_file or str(Path(__file__).resolve().parent.parent.parent / "assets" / "morphism_tags.json")
+    )
+
+    json_ms = time_startup(args.repeat, tags_file=args.tags_file, use_snapshot=False)
+    snap_ms = time_startup(args.repeat, tags_file=args.tags_file, use_snapshot=True)
+
+    print(f"快照文件: {snapshot} ({os.path.getsize(snapshot) / 1024:.1f} KB)")
+    print(f"{'方式':<10}{'中位数(ms)':>12}{'p95(ms)':>12}{'最小(ms)':>12}")
+    for label, timings in (("JSON", json_ms), ("快照", snap_ms)):
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        print(f"{label:<10}{statistics.median(timings):>12.3f}{p95:>12.3f}{timings[0]:>12.3f}")
+    print(f"加速比: {statistics.median(json_ms) / statistics.median(snap_ms):.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+热点路径基准套件
+覆盖 extract_user_tags / calculate_domain_score / select_domains / select_domains_by_morphisms /
+SelectionSession（增量修改 vs 完整重算）/ extract_morphisms_from_domain / extract_tags_enhanced，
+用合成负载改变每次查询的Morphism数、dynamics长度、领域目录规模与历史长度。
+
+输出每个用例的延迟分布（p50/p90/p99）、吞吐与峰值内存（tracemalloc），
+可保存为JSON基线，并在相对基线退化超过阈值时以非零状态退出。
+
+Usage:
+    python scripts/benchmarks/suite.py [--quick] [--filter 关键字]
+    python scripts/benchmarks/suite.py --save baseline.json
+    python scripts/benchmarks/suite.py --compare baseline.json [--threshold 0.25]
+"""
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Any, Iterator, Tuple
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+from domain_selector import DomainSelector  # noqa: E402
+from enhance_annotations import extract_tags_enhanced  # noqa: E402
+from update_morphism_db import extract_morphisms_from_domain  # noqa: E402
+
+TAGS_FILE = SCRIPTS_DIR.parent / "assets" / "morphism_tags.json"
+REFERENCES_DIR = SCRIPTS_DIR.parent / "references"
+FILLER = "的与在对中将其被使之为了通过形成相互持续逐步"
+
+
+# ---------------------------------------------------------------------------
+# 合成负载
+# ---------------------------------------------------------------------------
+
+def synthetic_dynamics(rng: random.Random, indicators: List[str], length: int) -> str:
+    """生成约length个字符的dynamics：填充字中随机混入指标词"""
+    parts = []
+    size = 0
+    while size < length:
+        piece = rng.choice(indicators) if rng.random() < 0.3 else rng.choice(FILLER)
+        parts.append(piece)
+        size += len(piece)
+    return "".join(parts)[:length]
+
+
+def synthetic_morphisms(rng: random.Random, indicators: List[str], count: int, length: int) -> List[Dict[str, str]]:
+    """生成count个Morphism"""
+    return [
+        {"from": f"O{i}", "to": f"O{i + 1}", "dynamics": synthetic_dynamics(rng, indicators, length)}
+        for i in range(count)
+    ]
+
+
+def synthetic_catalog(directory: Path, domain_count: int, seed: int = 0) -> str:
+    """
+    生成含domain_count个领域的标签库（保留31个内置领域，其余随机取3-4个标签）
+
+    Returns:
+        写入的JSON路径
+    """
+    rng = random.Random(seed)
+    with open(TAGS_FILE, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    mapping = data["tag_relationships"]["domain_tag_mapping"]
+    tag_ids = list(data["tags"].keys())
+    for i in range(len(mapping), domain_count):
+        mapping[f"synthetic_domain_{i:05d}"] = rng.sample(tag_ids, rng.randint(3, 4))
+    path = directory / f"catalog_{domain_count}.json"
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    return str(path)
+
+
+def synthetic_morphism_db(directory: Path, domain_count: int, seed: int = 0) -> str:
+    """
+    生成含domain_count个领域、每个领域14个Core Morphism（各0-3个标签）的Morphism数据库
+
+    Returns:
+        写入的JSON路径
+    """
+    rng = random.Random(seed)
+    with open(TAGS_FILE, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    tag_ids = list(data["tags"].keys())
+    data["domains"] = {
+        f"synthetic_domain_{i:05d}": {"morphisms": [
+            {"id": j, "name": f"morphism_{j}", "tags": rng.sample(tag_ids, rng.randint(0, 3))}
+            for j in range(1, 15)
+        ]}
+        for i in range(domain_count)
+    }
+    path = directory / f"morphism_db_{domain_count}.json"
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    return str(path)
+
+
+# ---------------------------------------------------------------------------
+# 测量
+# ---------------------------------------------------------------------------
+
+def measure(fn: Callable[[], Any], repeat: int, budget: float, items: int = 1) -> Dict[str, Any]:
+    """
+    多次调用fn，统计延迟分布、吞吐与峰值内存
+
+    Args:
+        fn: 被测函数（无参）
+        repeat: 最大重复次数
+        budget: 计时阶段的时间预算（秒），至少运行3次
+        items: 每次调用处理的条目数（用于计算条目吞吐）
+    """
+    fn()  # 预热
+    latencies = []
+    deadline = time.perf_counter() + budget
+    while len(latencies) < repeat and (len(latencies) < 3 or time.perf_counter() < deadline):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+
+    # 峰值内存单独测一次，避免tracemalloc拖慢计时
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+
+    def pct(q):
+        return latencies[min(len(latencies) - 1, int(q / 100 * len(latencies)))]
+
+    mean = statistics.fmean(latencies)
+    return {
+        "runs": len(latencies),
+        "p50_ms": pct(50) * 1000,
+        "p90_ms": pct(90) * 1000,
+        "p99_ms": pct(99) * 1000,
+        "mean_ms": mean * 1000,
+        "throughput": items / mean if mean > 0 else 0.0,
+        "peak_kb": peak / 1024,
+    }
+
+
+# ---------------------------------------------------------------------------
+# 用例
+# ---------------------------------------------------------------------------
+
+def iter_cases(quick: bool, workdir: Path) -> Iterator[Tuple[str, Callable[[], Any], int]]:
+    """产出 (用例名, 被测函数, 每次调用条目数)"""
+    rng = random.Random(42)
+    base = DomainSelector(str(TAGS_FILE), use_snapshot=False)
+    indicators = [i for tag in base.tags.values() for i in tag.indicators]
+
+    morphism_counts = (1, 10, 100, 1000) if quick else (1, 10, 100, 1000, 10000)
+    lengths = (16, 256) if quick else (16, 128, 1024)
+    catalogs = (31, 1000) if quick else (31, 1000, 10000)
+    histories = (0, 10, 1000) if quick else (0, 10, 1000, 100000)
+
+    # extract_user_tags：Morphism数 × dynamics长度
+    for count in morphism_counts:
+        for length in lengths:
+            morphisms = synthetic_morphisms(rng, indicators, count, length)
+            yield (f"extract_user_tags/m={count}/len={length}",
+                   lambda m=morphisms: base.extract_user_tags(m), count)
+
+    # calculate_domain_score / select_domains：领域目录规模
+    sample = synthetic_morphisms(rng, indicators, 8, 32)
+    for size in catalogs:
+        selector = DomainSelector(synthetic_catalog(workdir, size), use_snapshot=False)
+        user_tags = selector.extract_user_tags(sample)
+        domains = list(selector.domain_tag_mapping)
+
+        def score_all(s=selector, d=domains, t=user_tags):
+            for domain in d:
+                s.calculate_domain_score(domain, t, "tech_executive")
+
+        yield f"calculate_domain_score/domains={size}", score_all, len(domains)
+        yield (f"select_domains/domains={size}",
+               lambda s=selector: s.select_domains(["A"], sample, "tech_executive"), 1)
+        yield (f"select_domains_lean/domains={size}",
+               lambda s=selector: s.select_domains(["A"], sample, "tech_executive", lean=True), 1)
+
+        # 会话中修改一个Morphism的dynamics后重新选择：增量 vs 完整重算
+        # 每次修改把该Morphism的两个标签换成另外两个（其余Morphism的标签不受影响）
+        tag_list = list(base.tags.values())
+        session_morphisms = [{"from": f"O{i}", "to": f"O{i + 1}", "dynamics": tag.indicators[0]}
+                             for i, tag in enumerate(tag_list[4:8])]
+        variants = [tag_list[0].indicators[0] + tag_list[1].indicators[0],
+                    tag_list[2].indicators[0] + tag_list[3].indicators[0]]
+        session = selector.new_session(objects=["A"], morphisms=session_morphisms, user_profile="tech_executive")
+
+        def session_delta(s=session, v=variants, state=[0]):
+            state[0] ^= 1
+            s.edit_morphism(0, dynamics=v[state[0]])
+            return s.result(lean=True)
+
+        def session_full(s=selector, m=session_morphisms, v=variants, state=[0]):
+            state[0] ^= 1
+            m[0] = dict(m[0], dynamics=v[state[0]])
+            return s.select_domains(["A"], m, "tech_executive", lean=True)
+
+        yield f"selection_session/delta/domains={size}", session_delta, 1
+        yield f"selection_session/full/domains={size}", session_full, 1
+
+    # select_domains_by_morphisms：领域数 × 14个Core Morphism
+    for size in catalogs:
+        selector = DomainSelector(str(TAGS_FILE), use_snapshot=False,
+                                  morphism_db=synthetic_morphism_db(workdir, size))
+        selector.morphism_index()
+        yield (f"select_domains_by_morphisms/domains={size}",
+               lambda s=selector: s.select_domains_by_morphisms(sample), 1)
+
+    # select_domains：历史长度
+    for length in histories:
+        history = [rng.choice(base.domain_names) for _ in range(length)]
+        yield (f"select_domains/history={length}",
+               lambda h=history: base.select_domains(["A"], sample, history_domains=h), 1)
+
+    # extract_morphisms_from_domain：真实领域文件
+    reference_files = sorted(REFERENCES_DIR.glob("*_v2.md"))
+    if quick:
+        reference_files = reference_files[:5]
+
+    def parse_references(paths=reference_files):
+        for path in paths:
+            extract_morphisms_from_domain(path)
+
+    yield f"extract_morphisms_from_domain/files={len(reference_files)}", parse_references, len(reference_files)
+
+    # extract_tags_enhanced：dynamics长度
+    for length in lengths:
+        texts = [(synthetic_dynamics(rng, indicators, length), synthetic_dynamics(rng, indicators, 8))
+                 for _ in range(100)]
+
+        def annotate(t=texts):
+            for dynamics, name in t:
+                extract_tags_enhanced(dynamics, name)
+
+        yield f"extract_tags_enhanced/len={length}", annotate, len(texts)
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """对比基线，返回p50退化超过阈值的用例说明"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous or previous["p50_ms"] <= 0:
+            continue
+        ratio = current["p50_ms"] / previous["p50_ms"] - 1
+        if ratio > threshold:
+            regressions.append(f"{name}: p50 {previous['p50_ms']:.3f} -> {current['p50_ms']:.3f} ms (+{ratio:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="热点路径基准套件")
+    parser.add_argument("--quick", action="store_true", help="缩小规模，快速运行")
+    parser.add_argument("--filter", default=None, help="只运行名称包含该关键字的用例")
+    parser.add_argument("--repeat", type=int, default=200, help="每个用例的最大重复次数")
+    parser.add_argument("--budget", type=float, default=1.0, help="每个用例的计时预算（秒）")
+    parser.add_argument("--save", metavar="JSON", help="保存结果为基线")
+    parser.add_argument("--compare", metavar="JSON", help="与基线对比")
+    parser.add_argument("--threshold", type=float, default=0.25, help="允许的p50退化比例（默认25%%）")
+    args = parser.parse_args()
+
+    results: Dict[str, Any] = {}
+    print(f"{'用例':<48}{'p50(ms)':>10}{'p90(ms)':>10}{'p99(ms)':>10}{'吞吐(/s)':>12}{'峰值内存(KB)':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, fn, items in iter_cases(args.quick, Path(tmp)):
+            if args.filter and args.filter not in name:
+                continue
+            stats = measure(fn, args.repeat, args.budget, items)
+            results[name] = stats
+            print(f"{name:<48}{stats['p50_ms']:>10.3f}{stats['p90_ms']:>10.3f}{stats['p99_ms']:>10.3f}"
+                  f"{stats['throughput']:>12.1f}{stats['peak_kb']:>14.1f}")
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({
+                "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "quick": args.quick,
+                "results": results,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\n✅ 基线已保存: {args.save}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} 个用例退化超过 {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print(f"\n✅ 相对基线无超过 {args.threshold:.0%} 的退化")
+
+
+if __name__ == "__main__":
+    main()
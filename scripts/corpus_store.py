@@ -0,0 +1,521 @@
+#!/usr/bin/env python3
+"""
+Corpus Store - 压缩的领域知识库常驻存储
+把 references/ 与 references/custom/ 下每个领域文件按章节（文件头 + 各 "## " 章节）独立压缩，
+所有章节共用一个从语料训练出的zlib预置字典，写入单个只读文件并以mmap打开：
+- 压缩数据位于文件页缓存中，fork出的工作进程（乃至多个独立进程）共享同一份物理页
+- 访问时只解压所需章节，解压结果放入每个进程的小LRU
+- 条目/字段仍按reference_index的字节偏移读取（相对所在章节切片）；
+  各领域的条目偏移同样压缩存放，首次访问该领域时才解析
+
+Usage:
+    python corpus_store.py build
+    python corpus_store.py show <domain> [section]
+    python corpus_store.py bench [--workers N]
+"""
+
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Dict, List, Tuple, Any, Optional
+
+from reference_index import (
+    KINDS, REFERENCES_DIR, Span, domain_name_for, iter_reference_files, parse_reference
+)
+
+STORE_VERSION = 1
+STORE_PATH = REFERENCES_DIR / ".corpus_store.bin"
+MAGIC = b"MCS1"
+# 魔数 + 元数据长度（小端u32）
+PREAMBLE = struct.Struct("<4sI")
+
+# zlib只使用预置字典的最后32KB
+DICTIONARY_SIZE = 32 * 1024
+COMPRESS_LEVEL = 9
+# 文件头（第一个 "## " 之前）作为一个独立章节
+HEADER_SECTION = "header"
+
+
+# ---------------------------------------------------------------------------
+# 构建
+# ---------------------------------------------------------------------------
+
+def train_dictionary(documents: List[bytes], size: int = DICTIONARY_SIZE) -> bytes:
+    """
+    从语料训练zlib预置字典
+
+    取在至少两个文件中出现的行（章节标题、字段名、模板句式），按 出现文件数 × 长度 排序，
+    收益最高的放在字典末尾（距离越近，匹配编码越短）；不足size时用各文件均匀抽取的片段补足。
+
+    Args:
+        documents: 各领域文件的原始字节
+        size: 字典大小上限
+
+    Returns:
+        字典字节
+    """
+    document_frequency: Counter = Counter()
+    for data in documents:
+        lines = {line.strip() for line in data.splitlines()}
+        document_frequency.update(line for line in lines if len(line) >= 4)
+    shared = [line for line, count in document_frequency.items() if count >= 2]
+    shared.sort(key=lambda line: (document_frequency[line] * len(line), line))
+
+    chunks: List[bytes] = []
+    total = 0
+    for line in reversed(shared):
+        if total + len(line) + 1 > size:
+            break
+        chunks.append(line + b"\n")
+        total += len(line) + 1
+
+    # 补足：从每个文件均匀抽取片段（体现正文中常见的术语与搭配）
+    remaining = size - total
+    if remaining > 0 and documents:
+        per_document = remaining // len(documents)
+        samples = []
+        for data in documents:
+            if per_document <= 0:
+                break
+            start = max(0, len(data) // 2 - per_document // 2)
+            samples.append(data[start:start + per_document])
+        chunks.extend(samples)
+
+    # 高收益的共享行在末尾
+    chunks.reverse()
+    return b"".join(chunks)[-size:]
+
+
+def _section_spans(data: bytes, entry: Dict[str, Any]) -> Dict[str, Span]:
+    """文件头与各章节的字节区间"""
+    sections = dict(entry["sections"])
+    first = min((span[0] for span in sections.values()), default=len(data))
+    return {HEADER_SECTION: (0, first), **sections}
+
+
+def build_store(references_dir: Path = REFERENCES_DIR, store_path: Path = STORE_PATH) -> Dict[str, Any]:
+    """
+    构建压缩存储并原子替换旧文件（已打开旧文件的进程继续使用旧映射）
+
+    文件布局: MAGIC | 元数据长度 | 元数据JSON | 字典 | 各章节与条目偏移的压缩块
+
+    元数据只含每个领域的章节表 [名称, 原文起, 原文止, 块偏移, 块长度] 与条目偏移块的位置，
+    保持常驻部分足够小
+
+    Returns:
+        元数据字典
+    """
+    references_dir = Path(references_dir)
+    sources = []
+    for path in iter_reference_files(references_dir):
+        data = path.read_bytes()
+        stat = path.stat()
+        sources.append((path, stat, data))
+    dictionary = train_dictionary([data for _, _, data in sources])
+
+    blobs: List[bytes] = []
+    offset = 0
+    files: Dict[str, Any] = {}
+    raw_bytes = 0
+    compressed_bytes = 0
+    for path, stat, data in sources:
+        entry = parse_reference(data)
+        sections = []
+        for name, (start, end) in _section_spans(data, entry).items():
+            compressor = zlib.compressobj(COMPRESS_LEVEL, zdict=dictionary)
+            blob = compressor.compress(data[start:end]) + compressor.flush()
+            sections.append([name, start, end, offset, len(blob)])
+            blobs.append(blob)
+            offset += len(blob)
+            raw_bytes += end - start
+            compressed_bytes += len(blob)
+        items = {"header": entry["header"], **{kind: entry[kind] for kind in KINDS}}
+        blob = zlib.compress(json.dumps(items, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+                             COMPRESS_LEVEL)
+        blobs.append(blob)
+        files[domain_name_for(path)] = {
+            "path": path.relative_to(references_dir).as_posix(),
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sections": sections,
+            "items": [offset, len(blob)],
+        }
+        offset += len(blob)
+
+    meta = {
+        "version": STORE_VERSION,
+        "dictionary": len(dictionary),
+        "raw_bytes": raw_bytes,
+        "compressed_bytes": compressed_bytes,
+        "index_bytes": offset - compressed_bytes,
+        "files": files,
+    }
+    encoded = json.dumps(meta, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    store_path = Path(store_path)
+    tmp_path = store_path.with_name(f"{store_path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(PREAMBLE.pack(MAGIC, len(encoded)))
+        f.write(encoded)
+        f.write(dictionary)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp_path, store_path)
+    return meta
+
+
+def _read_meta(store_path: Path) -> Optional[Dict[str, Any]]:
+    """只读取存储文件的元数据；文件缺失或格式不符返回None"""
+    try:
+        with open(store_path, 'rb') as f:
+            magic, length = PREAMBLE.unpack(f.read(PREAMBLE.size))
+            if magic != MAGIC:
+                return None
+            meta = json.loads(f.read(length))
+    except (OSError, ValueError, struct.error):
+        return None
+    return meta if meta.get("version") == STORE_VERSION else None
+
+
+def _is_current(meta: Dict[str, Any], references_dir: Path) -> bool:
+    """存储是否与磁盘上的领域文件一致（文件集合、mtime与大小）"""
+    paths = list(iter_reference_files(references_dir))
+    if len(paths) != len(meta["files"]):
+        return False
+    for path in paths:
+        entry = meta["files"].get(domain_name_for(path))
+        if entry is None or entry["path"] != path.relative_to(references_dir).as_posix():
+            return False
+        stat = path.stat()
+        if stat.st_mtime_ns != entry["mtime_ns"] or stat.st_size != entry["size"]:
+            return False
+    return True
+
+
+def ensure_store(references_dir: Path = REFERENCES_DIR, store_path: Path = STORE_PATH) -> Path:
+    """存储缺失、版本不符或领域文件有变化时重建（字典依赖全体语料，因此整体重建）"""
+    meta = _read_meta(store_path)
+    if meta is None or not _is_current(meta, Path(references_dir)):
+        build_store(references_dir, store_path)
+    return Path(store_path)
+
+
+# ---------------------------------------------------------------------------
+# 读取
+# ---------------------------------------------------------------------------
+
+class CorpusStore:
+    """
+    压缩存储的只读访问器
+
+    在fork工作进程之前打开即可让各进程共享映射页；每个进程各自维护解压后章节的LRU。
+
+    用法:
+        with CorpusStore() as corpus:
+            corpus.section("game_theory", "Core Morphisms")
+            corpus.theorem("game_theory", "纳什均衡", "Mapping_Hint")
+    """
+
+    def __init__(
+        self,
+        store_path: Path = STORE_PATH,
+        references_dir: Optional[Path] = REFERENCES_DIR,
+        cache_size: int = 16
+    ):
+        """
+        Args:
+            store_path: 存储文件路径
+            references_dir: references目录；给出时先检查并按需重建存储，None则直接打开
+            cache_size: 每个进程缓存的解压章节数
+        """
+        if references_dir is not None:
+            ensure_store(references_dir, store_path)
+        self.store_path = Path(store_path)
+        self.cache_size = cache_size
+        self._handle = open(self.store_path, 'rb')
+        self._map = mmap.mmap(self._handle.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, length = PREAMBLE.unpack(self._map[:PREAMBLE.size])
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"不是有效的压缩存储: {self.store_path}")
+        start = PREAMBLE.size + length
+        self.meta = json.loads(self._map[PREAMBLE.size:start])
+        self._dictionary = self._map[start:start + self.meta["dictionary"]]
+        self._data_start = start + self.meta["dictionary"]
+        self._cache: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """释放mmap"""
+        self._map.close()
+        self._handle.close()
+
+    def domains(self) -> List[str]:
+        """已存储的领域列表"""
+        return list(self.meta["files"])
+
+    def _file(self, domain: str) -> Dict[str, Any]:
+        try:
+            return self.meta["files"][domain]
+        except KeyError:
+            raise KeyError(f"领域 {domain} 不在存储中") from None
+
+    def _blob(self, offset: int, length: int) -> memoryview:
+        start = self._data_start + offset
+        return memoryview(self._map)[start:start + length]
+
+    def entry(self, domain: str) -> Dict[str, Any]:
+        """领域的索引条目 {"header", "objects", "morphisms", "theorems"}（偏移为原文件的字节偏移）"""
+        with self._lock:
+            entry = self._entries.get(domain)
+            if entry is not None:
+                self._entries.move_to_end(domain)
+                return entry
+        with self._blob(*self._file(domain)["items"]) as blob:
+            entry = json.loads(zlib.decompress(blob))
+        with self._lock:
+            if self.cache_size > 0:
+                self._entries[domain] = entry
+                while len(self._entries) > self.cache_size:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def sections(self, domain: str) -> List[str]:
+        """领域的章节名（含文件头）"""
+        return [record[0] for record in self._file(domain)["sections"]]
+
+    def _section_bytes(self, domain: str, name: str) -> bytes:
+        """解压单个章节（经LRU）"""
+        key = (domain, name)
+        with self._lock:
+            data = self._cache.get(key)
+            if data is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return data
+        for record in self._file(domain)["sections"]:
+            if record[0] == name:
+                break
+        else:
+            raise KeyError(f"{domain} 中不存在章节: {name}")
+        decompressor = zlib.decompressobj(zdict=self._dictionary)
+        with self._blob(record[3], record[4]) as blob:
+            data = decompressor.decompress(blob) + decompressor.flush()
+        with self._lock:
+            self.misses += 1
+            if self.cache_size > 0:
+                self._cache[key] = data
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return data
+
+    def section(self, domain: str, name: str) -> str:
+        """读取整个章节（含标题行）；name为 header 时返回文件头"""
+        return self._section_bytes(domain, name).decode("utf-8")
+
+    def read(self, domain: str, span: Span) -> str:
+        """按原文件字节区间读取文本（区间须位于单个章节内）"""
+        start, end = span
+        for name, section_start, section_end, _, _ in self._file(domain)["sections"]:
+            if section_start <= start and end <= section_end:
+                data = self._section_bytes(domain, name)
+                return data[start - section_start:end - section_start].decode("utf-8")
+        raise KeyError(f"{domain} 中没有包含区间 {span} 的章节")
+
+    def header(self, domain: str, field: str) -> str:
+        """读取文件头字段（Domain / Source / Structural_Primitives）"""
+        return self.read(domain, self.entry(domain)["header"][field])
+
+    def find(self, domain: str, kind: str, key) -> Dict[str, Any]:
+        """按名称（或定理编号）查找条目的索引记录"""
+        for item in self.entry(domain)[kind]:
+            if item["name"] == key or item.get("number") == key:
+                return item
+        raise KeyError(f"{domain} 中不存在 {kind} 条目: {key}")
+
+    def item(self, domain: str, kind: str, key, field: Optional[str] = None) -> str:
+        """读取整个条目，或其中的单个字段"""
+        record = self.find(domain, kind, key)
+        return self.read(domain, record["fields"][field] if field else record["span"])
+
+    def morphism(self, domain: str, name: str, field: Optional[str] = None) -> str:
+        """读取Core Morphism（field: 定义/涉及/动态）"""
+        return self.item(domain, "morphisms", name, field)
+
+    def theorem(self, domain: str, key, field: Optional[str] = None) -> str:
+        """读取Theorem（key: 名称或编号；field: 内容/Applicable_Structure/Mapping_Hint/Case_Study）"""
+        return self.item(domain, "theorems", key, field)
+
+    def clear_cache(self):
+        """清空解压缓存"""
+        with self._lock:
+            self._cache.clear()
+            self._entries.clear()
+
+    def info(self) -> Dict[str, Any]:
+        """存储与缓存统计"""
+        with self._lock:
+            cached = sum(len(data) for data in self._cache.values())
+            entries = len(self._cache)
+        return {
+            "domains": len(self.meta["files"]),
+            "raw_bytes": self.meta["raw_bytes"],
+            "compressed_bytes": self.meta["compressed_bytes"],
+            "dictionary_bytes": self.meta["dictionary"],
+            "index_bytes": self.meta["index_bytes"],
+            "mapped_bytes": len(self._map),
+            "cached_sections": entries,
+            "cached_bytes": cached,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# ---------------------------------------------------------------------------
+# 报告：常驻内存与访问延迟
+# ---------------------------------------------------------------------------
+
+def _percentiles(latencies: List[float]) -> str:
+    latencies = sorted(latencies)
+
+    def pct(q):
+        return latencies[min(len(latencies) - 1, int(q / 100 * len(latencies)))] * 1e6
+
+    return f"p50 {pct(50):.1f} µs, p99 {pct(99):.1f} µs"
+
+
+def bench(references_dir: Path = REFERENCES_DIR, store_path: Path = STORE_PATH, workers: int = 4):
+    """比较 全部原文常驻 与 压缩存储 的内存占用，并测量章节访问延迟"""
+    import random
+    import time
+    import tracemalloc
+
+    ensure_store(references_dir, store_path)
+
+    # 基线：每个进程把所有领域文件读入为str并按章节切分
+    tracemalloc.start()
+    texts = {}
+    for path in iter_reference_files(Path(references_dir)):
+        data = path.read_bytes()
+        entry = parse_reference(data)
+        texts[domain_name_for(path)] = {
+            name: data[start:end].decode("utf-8") for name, (start, end) in _section_spans(data, entry).items()
+        }
+    baseline = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    corpus = CorpusStore(store_path, None)
+    keys = [(domain, name) for domain in corpus.domains() for name in corpus.sections(domain)]
+    rng = random.Random(0)
+    # 热点访问：反复访问少量章节，LRU容量内
+    for domain, name in rng.sample(keys, min(len(keys), corpus.cache_size)):
+        corpus.section(domain, name)
+    store_heap = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    info = corpus.info()
+    mapped = info["mapped_bytes"]
+    print(f"📦 {info['domains']} 个领域, {len(keys)} 个章节")
+    print(f"   原文 {info['raw_bytes'] / 1024:.0f} KB -> 压缩 {info['compressed_bytes'] / 1024:.0f} KB "
+          f"+ 字典 {info['dictionary_bytes'] / 1024:.0f} KB + 条目偏移 {info['index_bytes'] / 1024:.0f} KB "
+          f"(映射文件 {mapped / 1024:.0f} KB)")
+
+    # 无字典时的压缩量，体现共享字典的作用
+    plain = sum(len(zlib.compress(text.encode("utf-8"), COMPRESS_LEVEL))
+                for sections in texts.values() for text in sections.values())
+    print(f"   无共享字典时逐章节压缩 {plain / 1024:.0f} KB")
+
+    print(f"🧠 单进程常驻: 原文str {baseline / 1024:.0f} KB vs 存储堆内存 {store_heap / 1024:.0f} KB "
+          f"(元数据+{info['cached_sections']}个热点章节) + 共享映射 {mapped / 1024:.0f} KB")
+    print(f"   {workers} 个工作进程合计: {workers * baseline / 1024:.0f} KB vs "
+          f"{(workers * store_heap + mapped) / 1024:.0f} KB, "
+          f"节省 {(workers * baseline - workers * store_heap - mapped) / 1024:.0f} KB")
+
+    hot = [keys[i] for i in range(0, len(keys), max(1, len(keys) // corpus.cache_size))][:corpus.cache_size]
+    for domain, name in hot:
+        corpus.section(domain, name)
+    hit_latencies = []
+    for _ in range(2000):
+        domain, name = rng.choice(hot)
+        start = time.perf_counter()
+        corpus.section(domain, name)
+        hit_latencies.append(time.perf_counter() - start)
+
+    miss_latencies = []
+    for _ in range(2000):
+        domain, name = rng.choice(keys)
+        corpus.clear_cache()
+        start = time.perf_counter()
+        corpus.section(domain, name)
+        miss_latencies.append(time.perf_counter() - start)
+
+    file_latencies = []
+    for _ in range(200):
+        domain, name = rng.choice(keys)
+        relative = corpus.meta["files"][domain]["path"]
+        start = time.perf_counter()
+        data = (Path(references_dir) / relative).read_bytes()
+        span = _section_spans(data, parse_reference(data))[name]
+        data[span[0]:span[1]].decode("utf-8")
+        file_latencies.append(time.perf_counter() - start)
+
+    print(f"⏱️ 章节访问: LRU命中 {_percentiles(hit_latencies)}; 解压 {_percentiles(miss_latencies)}; "
+          f"读文件并解析 {_percentiles(file_latencies)}")
+    corpus.close()
+
+
+def main():
+    """主函数"""
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="压缩的领域知识库存储")
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("build", help="构建/重建存储")
+    show = sub.add_parser("show", help="读取领域章节")
+    show.add_argument("domain")
+    show.add_argument("section", nargs="?")
+    bench_parser = sub.add_parser("bench", help="内存与访问延迟报告")
+    bench_parser.add_argument("--workers", type=int, default=4, help="估算多进程合计内存时的进程数")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.perf_counter()
+        meta = build_store()
+        sections = sum(len(entry["sections"]) for entry in meta["files"].values())
+        print(f"✅ 已压缩 {len(meta['files'])} 个领域, {sections} 个章节: "
+              f"{meta['raw_bytes'] / 1024:.0f} KB -> {meta['compressed_bytes'] / 1024:.0f} KB "
+              f"+ 字典 {meta['dictionary'] / 1024:.0f} KB ({(time.perf_counter() - start) * 1000:.0f} ms)")
+        print(f"   存储路径: {STORE_PATH}")
+    elif args.command == "show":
+        with CorpusStore() as corpus:
+            if args.section:
+                print(corpus.section(args.domain, args.section))
+            else:
+                print(f"{args.domain}: {corpus.header(args.domain, 'Domain')}")
+                print(f"  章节: {', '.join(corpus.sections(args.domain))}")
+                for kind in KINDS:
+                    print(f"  {kind}: {len(corpus.entry(args.domain)[kind])}")
+    elif args.command == "bench":
+        bench(workers=args.workers)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
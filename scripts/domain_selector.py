@@ -4,12 +4,28 @@ Domain Selector - 智能领域选择器 (v3.0)
 基于Morphism结构匹配的智能领域选择算法
 """
 
+import hashlib
+import heapq
 import json
+import math
 import os
-from typing import Dict, List, Tuple, Any, Optional
+import pickle
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from typing import Dict, List, Tuple, Any, Optional, Iterator, Set, Union
 from dataclasses import dataclass
 from pathlib import Path
 
+from tags_db import MANIFEST_KEY, TagsDatabase, core_path, default_db_path, journal_path, shard_stamp, source_digest
+
+# 编译快照格式版本；快照结构变化时递增，旧快照会被自动重建
+SNAPSHOT_VERSION = 4
+SNAPSHOT_SUFFIX = ".snapshot"
+# 检查Morphism数据库分片是否被直接编辑的最短间隔（秒）；分片很多时扫描目录代价较高
+SHARD_CHECK_INTERVAL = 1.0
+
 @dataclass
 class MorphismTag:
     """Morphism标签定义"""
@@ -24,36 +40,928 @@ class MorphismTag:
 @dataclass
 class DomainMatch:
     """领域匹配结果"""
+    # 手写__slots__而非dataclass(slots=True)，兼容Python 3.10以下
+    __slots__ = ("domain", "score", "best_matches", "reasoning")
     domain: str
     score: float
     best_matches: List[Dict[str, Any]]
     reasoning: str
 
+@dataclass
+class IndicatorHit:
+    """指标词命中记录"""
+    __slots__ = ("morphism_index", "tag", "indicator", "start", "end")
+    morphism_index: int
+    tag: str
+    indicator: str
+    start: int
+    end: int
+
+class IndicatorMatcher:
+    """
+    指标词多模式匹配器 (Aho-Corasick自动机)
+
+    在构造时把所有标签的indicators编译为一个自动机，
+    之后对每条dynamics只需一次线性扫描即可找出全部命中（含重叠命中）。
+    """
+
+    def __init__(self, tags: Dict[str, MorphismTag]):
+        """
+        编译指标词自动机
+
+        Args:
+            tags: 标签ID到MorphismTag的映射
+        """
+        self._compile({tag_id: tag.indicators for tag_id, tag in tags.items()}, lowercase=True)
+
+    @classmethod
+    def from_keywords(cls, keywords: Dict[str, List[str]], lowercase: bool = True) -> "IndicatorMatcher":
+        """
+        由 {归属ID: 关键词列表} 编译自动机（不依赖MorphismTag）
+
+        Args:
+            keywords: 归属ID到关键词列表的映射
+            lowercase: 是否小写化关键词（扫描文本需同样处理）
+        """
+        matcher = cls.__new__(cls)
+        matcher._compile(keywords, lowercase)
+        return matcher
+
+    def _compile(self, keywords: Dict[str, List[str]], lowercase: bool):
+        """构建转移表、失败指针与输出表"""
+        # 状态0为根节点；每个状态：转移表、失败指针、输出(指标词, 标签ID元组)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[str, Tuple[str, ...]]]] = [[]]
+        # 空指标词在原实现中总是命中
+        self.always_tags: Set[str] = set()
+
+        indicator_tags: Dict[str, List[str]] = {}
+        for tag_id, indicators in keywords.items():
+            for indicator in indicators:
+                key = indicator.lower() if lowercase else indicator
+                if not key:
+                    self.always_tags.add(tag_id)
+                    continue
+                owners = indicator_tags.setdefault(key, [])
+                if tag_id not in owners:
+                    owners.append(tag_id)
+
+        for indicator, owners in indicator_tags.items():
+            self._insert(indicator, tuple(owners))
+        self._build_failure_links()
+
+    def _insert(self, indicator: str, owners: Tuple[str, ...]):
+        """插入一个指标词"""
+        state = 0
+        for ch in indicator:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = nxt
+        self._output[state].append((indicator, owners))
+
+    def _build_failure_links(self):
+        """按BFS顺序构建失败指针，并合并后缀输出"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._output[nxt] = self._output[nxt] + self._output[self._fail[nxt]]
+
+    def to_state(self) -> Tuple:
+        """导出自动机表（纯内置类型，可直接pickle）"""
+        return self._goto, self._fail, self._output, self.always_tags
+
+    @classmethod
+    def from_state(cls, state: Tuple) -> "IndicatorMatcher":
+        """从to_state()的结果恢复自动机，无需重新编译"""
+        matcher = cls.__new__(cls)
+        matcher._goto, matcher._fail, matcher._output, matcher.always_tags = state
+        return matcher
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, str, Tuple[str, ...]]]:
+        """
+        扫描文本，产出全部指标词命中
+
+        Args:
+            text: 已小写化的dynamics文本
+
+        Yields:
+            (起始位置, 结束位置, 指标词, 标签ID元组)
+        """
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        state = 0
+        for pos, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for indicator, owners in output[state]:
+                yield pos + 1 - len(indicator), pos + 1, indicator, owners
+
+    def match_indicators(self, text: str) -> Set[str]:
+        """返回文本中出现的不同指标词集合"""
+        found = set()
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for indicator, _ in output[state]:
+                found.add(indicator)
+        return found
+
+    def match_tags(self, text: str) -> Set[str]:
+        """返回文本命中的标签ID集合"""
+        found = set(self.always_tags)
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for _, owners in output[state]:
+                found.update(owners)
+        return found
+
+class HistoryTracker:
+    """
+    滑动窗口领域使用统计（熵值衰减）
+
+    deque保存最近window_size次选择，Counter维护窗口内计数，
+    记录一次选择与查询某领域是否超过阈值均为O(1)。
+    """
+
+    def __init__(
+        self,
+        window_size: int = 10,
+        threshold: int = 3,
+        penalty: float = 0.5,
+        history: Optional[List[str]] = None
+    ):
+        """
+        Args:
+            window_size: 统计窗口大小
+            threshold: 窗口内使用次数超过该值即衰减
+            penalty: 衰减系数
+            history: 初始历史（按时间顺序，仅保留最近window_size条）
+        """
+        self.window_size = window_size
+        self.threshold = threshold
+        self.penalty = penalty
+        self._recent: deque = deque()
+        self._counts: Counter = Counter()
+        for domain in history or []:
+            self.record(domain)
+
+    @classmethod
+    def from_rules(cls, scoring_rules: Dict[str, Any], history: Optional[List[str]] = None) -> "HistoryTracker":
+        """按scoring_rules中的entropy_decay规则创建"""
+        entropy_rules = scoring_rules.get("entropy_decay", {})
+        return cls(
+            window_size=entropy_rules.get("window_size", 10),
+            threshold=entropy_rules.get("threshold", 3),
+            penalty=entropy_rules.get("penalty", 0.5),
+            history=history
+        )
+
+    def __len__(self) -> int:
+        return len(self._recent)
+
+    def record(self, domain: str):
+        """记录一次领域选择，窗口满时淘汰最早的一条"""
+        self._recent.append(domain)
+        self._counts[domain] += 1
+        if len(self._recent) > self.window_size:
+            oldest = self._recent.popleft()
+            self._counts[oldest] -= 1
+            if not self._counts[oldest]:
+                del self._counts[oldest]
+
+    def count(self, domain: str) -> int:
+        """窗口内该领域的使用次数"""
+        return self._counts.get(domain, 0)
+
+    def is_over_threshold(self, domain: str) -> bool:
+        """该领域是否超过使用阈值"""
+        return self._counts.get(domain, 0) > self.threshold
+
+    def apply(self, domain: str, score: float) -> float:
+        """对分数应用熵值衰减"""
+        if self._counts.get(domain, 0) > self.threshold:
+            return score * self.penalty
+        return score
+
+    def over_threshold(self) -> Dict[str, float]:
+        """所有超过阈值的领域及其衰减系数"""
+        return {d: self.penalty for d, c in self._counts.items() if c > self.threshold}
+
+    def to_dict(self) -> Dict[str, Any]:
+        """序列化（可直接json.dump），用于会话恢复"""
+        return {
+            "window_size": self.window_size,
+            "threshold": self.threshold,
+            "penalty": self.penalty,
+            "recent": list(self._recent),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "HistoryTracker":
+        """从to_dict()的结果恢复"""
+        return cls(
+            window_size=data["window_size"],
+            threshold=data["threshold"],
+            penalty=data["penalty"],
+            history=data.get("recent", [])
+        )
+
+HistoryLike = Union[List[str], HistoryTracker]
+
+class LRUCache:
+    """容量有界的LRU缓存，记录命中/未命中次数"""
+    
+    def __init__(self, maxsize: int):
+        """
+        Args:
+            maxsize: 最大条目数，超出时淘汰最久未使用的条目
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def get(self, key) -> Any:
+        """命中时返回值并标记为最近使用，未命中返回None"""
+        value = self._data.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+    
+    def put(self, key, value):
+        """写入条目，必要时淘汰最旧条目"""
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+    
+    def clear(self):
+        """清空条目与统计"""
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+    
+    def info(self) -> Dict[str, Any]:
+        """命中统计"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+        }
+
+class ResultStore:
+    """
+    跨进程共享的选择结果持久缓存（SQLite，WAL模式）
+    
+    键为查询的规范化哈希，已包含标签库版本；写入时若发现标签库版本变化，
+    先清除旧版本的全部条目。条目超过TTL即失效，总数超过max_entries时
+    淘汰最久未访问的条目。数据库异常（锁超时、磁盘不可写等）只当作未命中。
+    """
+    
+    # 每写入多少条执行一次过期与容量清理
+    PRUNE_INTERVAL = 64
+    
+    def __init__(self, path: str, ttl: float = 7 * 24 * 3600, max_entries: int = 100000):
+        """
+        Args:
+            path: SQLite数据库文件路径（多进程可共用同一文件）
+            ttl: 条目有效期（秒）
+            max_entries: 最大条目数
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._version: Optional[str] = None
+        self._puts = 0
+    
+    def _connect(self) -> sqlite3.Connection:
+        """按进程建立连接（fork出的子进程不能复用父进程的连接）"""
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, version TEXT NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL, payload TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._conn = conn
+            self._pid = os.getpid()
+            self._version = None
+        return self._conn
+    
+    def _bind_version(self, conn: sqlite3.Connection, version: str):
+        """记录当前标签库版本；版本变化时删除旧版本条目"""
+        if version == self._version:
+            return
+        row = conn.execute("SELECT value FROM meta WHERE name = 'tags_version'").fetchone()
+        if row is None or row[0] != version:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute("DELETE FROM results WHERE version != ?", (version,))
+                conn.execute("INSERT OR REPLACE INTO meta VALUES ('tags_version', ?)", (version,))
+        self._version = version
+    
+    def get(self, key: str, version: str) -> Any:
+        """命中且未过期时返回结果，否则返回None"""
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connect()
+                row = conn.execute(
+                    "SELECT payload FROM results WHERE key = ? AND version = ? AND created > ?",
+                    (key, version, now - self.ttl)
+                ).fetchone()
+                if row is not None:
+                    conn.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+        except sqlite3.Error:
+            row = None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+    
+    def put(self, key: str, version: str, value: Any):
+        """写入结果（JSON序列化），定期清理过期与超量条目"""
+        payload = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connect()
+                self._bind_version(conn, version)
+                conn.execute(
+                    "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                    (key, version, now, now, payload)
+                )
+                self._puts += 1
+                if self._puts % self.PRUNE_INTERVAL == 0:
+                    self._prune(conn, now)
+        except sqlite3.Error:
+            pass
+    
+    def _prune(self, conn: sqlite3.Connection, now: float):
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM results WHERE created <= ?", (now - self.ttl,))
+            conn.execute(
+                "DELETE FROM results WHERE key IN "
+                "(SELECT key FROM results ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+    
+    def prune(self):
+        """立即清理过期与超量条目"""
+        with self._lock:
+            self._prune(self._connect(), time.time())
+    
+    def clear(self):
+        """删除全部条目与统计"""
+        with self._lock:
+            self._connect().execute("DELETE FROM results")
+        self.hits = 0
+        self.misses = 0
+    
+    def close(self):
+        """关闭本进程的连接"""
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+    
+    def info(self) -> Dict[str, Any]:
+        """命中统计与当前条目数"""
+        try:
+            with self._lock:
+                size = self._connect().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        except sqlite3.Error:
+            size = None
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": size,
+            "maxsize": self.max_entries,
+            "path": self.path,
+        }
+
+
+class StageProfiler:
+    """
+    select_domains分阶段计时与计数
+    
+    以"圈速"方式计时：mark(stage)把自上次mark以来的时间记入该阶段。
+    只在begin()与end()之间生效，因此单独调用calculate_domain_score等方法不会污染统计。
+    """
+    
+    # 阶段输出顺序
+    STAGES = ("extract_tags", "complexity", "result_store", "scoring", "profile_bonus",
+              "entropy_decay", "sort", "reasoning")
+    
+    def __init__(self):
+        self.reset()
+    
+    def reset(self):
+        """清空累计统计"""
+        self.calls = 0
+        self.totals: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        self.last_stages: Dict[str, float] = {}
+        self.last_counters: Dict[str, int] = {}
+        self.active = False
+        self._stages: Dict[str, float] = {}
+        self._counters: Dict[str, int] = {}
+        self._t = 0.0
+    
+    def begin(self):
+        """开始一次调用"""
+        self.active = True
+        self._stages = {}
+        self._counters = {}
+        self._t = time.perf_counter()
+    
+    def mark(self, stage: str):
+        """把自上次mark以来的耗时记入stage"""
+        if not self.active:
+            return
+        now = time.perf_counter()
+        self._stages[stage] = self._stages.get(stage, 0.0) + (now - self._t)
+        self._t = now
+    
+    def count(self, name: str, n: int = 1):
+        """累加计数器"""
+        if self.active:
+            self._counters[name] = self._counters.get(name, 0) + n
+    
+    def end(self):
+        """结束一次调用，并入累计统计"""
+        if not self.active:
+            return
+        self.active = False
+        self.calls += 1
+        for stage, seconds in self._stages.items():
+            self.totals[stage] = self.totals.get(stage, 0.0) + seconds
+        for name, n in self._counters.items():
+            self.counters[name] = self.counters.get(name, 0) + n
+        self.last_stages = self._stages
+        self.last_counters = self._counters
+    
+    def _ordered(self, stages: Dict[str, float]) -> Dict[str, float]:
+        names = [s for s in self.STAGES if s in stages] + sorted(set(stages) - set(self.STAGES))
+        return {name: stages[name] * 1000 for name in names}
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """导出统计（时间单位: 毫秒）"""
+        return {
+            "calls": self.calls,
+            "stages_ms": self._ordered(self.totals),
+            "counters": dict(self.counters),
+            "last_call": {
+                "stages_ms": self._ordered(self.last_stages),
+                "counters": dict(self.last_counters),
+            },
+        }
+    
+    def merge(self, other: Dict[str, Any]):
+        """并入另一个snapshot()的累计部分（用于汇总多进程统计）"""
+        self.calls += other.get("calls", 0)
+        for stage, ms in other.get("stages_ms", {}).items():
+            self.totals[stage] = self.totals.get(stage, 0.0) + ms / 1000
+        for name, n in other.get("counters", {}).items():
+            self.counters[name] = self.counters.get(name, 0) + n
+
+def format_stats(stats: Dict[str, Any], last_call: bool = False) -> str:
+    """把stats()结果格式化为分阶段耗时表"""
+    section = stats["last_call"] if last_call else stats
+    stages = section["stages_ms"]
+    total = sum(stages.values())
+    lines = [f"{'阶段':<16}{'耗时(ms)':>12}{'占比':>8}"]
+    for stage, ms in stages.items():
+        share = ms / total * 100 if total > 0 else 0.0
+        lines.append(f"{stage:<16}{ms:>12.3f}{share:>7.1f}%")
+    lines.append(f"{'total':<16}{total:>12.3f}")
+    if not last_call and stats["calls"]:
+        lines.append(f"调用次数: {stats['calls']}, 平均每次 {total / stats['calls']:.3f} ms")
+    for name, n in section["counters"].items():
+        lines.append(f"{name}: {n}")
+    return "\n".join(lines)
+
+def _to_mask(cols: Iterator[int]) -> int:
+    """列号集合 -> 位掩码"""
+    mask = 0
+    for col in cols:
+        mask |= 1 << col
+    return mask
+
+if hasattr(int, "bit_count"):
+    _popcount = int.bit_count
+else:  # Python < 3.10
+    def _popcount(mask: int) -> int:
+        """位掩码中1的个数"""
+        return bin(mask).count("1")
+
+def _iter_bits(mask: int) -> Iterator[int]:
+    """按从低到高的顺序产出位掩码中为1的列号"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+class MorphismIndex:
+    """
+    领域Core Morphism × 标签 的稀疏矩阵，用于Morphism粒度的匹配
+    
+    标签集合相同的Morphism与任何用户Morphism的相似度都相同，因此矩阵的列按标签集合去重
+    （16个标签、每个Morphism 1-3个标签时至多数百列，与领域数无关）；
+    另以 标签集合 -> 领域 的倒排表把列上的分数聚合回领域。
+    """
+    
+    def __init__(self, tag_index: Dict[str, int], domains: Iterator[Tuple[str, List[Dict[str, Any]]]]):
+        """
+        Args:
+            tag_index: 标签 -> 列号
+            domains: (领域, Morphism列表) 序列，Morphism含name与tags（未知标签忽略）
+        """
+        self.tag_names = list(tag_index)
+        self.domain_names: List[str] = []
+        # 每个领域的 (Morphism名称, 标签位掩码)，按原顺序
+        self.domain_morphisms: List[Tuple[Tuple[str, int], ...]] = []
+        self.masks: List[int] = []
+        mask_ids: Dict[int, int] = {}
+        mask_domains: List[Set[int]] = []
+        for domain, morphisms in domains:
+            index = len(self.domain_names)
+            rows = []
+            for morphism in morphisms:
+                mask = _to_mask(tag_index[t] for t in morphism.get("tags") or [] if t in tag_index)
+                rows.append((morphism.get("name", ""), mask))
+                if not mask:
+                    continue
+                column = mask_ids.get(mask)
+                if column is None:
+                    column = mask_ids[mask] = len(self.masks)
+                    self.masks.append(mask)
+                    mask_domains.append(set())
+                mask_domains[column].add(index)
+            self.domain_names.append(domain)
+            self.domain_morphisms.append(tuple(rows))
+        
+        self.mask_domains = [frozenset(d) for d in mask_domains]
+        self.mask_norms = [math.sqrt(_popcount(mask)) for mask in self.masks]
+        # 转置的CSR：标签列 -> 含该标签的标签集合列
+        postings: List[List[int]] = [[] for _ in tag_index]
+        for column, mask in enumerate(self.masks):
+            for col in _iter_bits(mask):
+                postings[col].append(column)
+        self.tag_postings = [tuple(p) for p in postings]
+    
+    def __len__(self) -> int:
+        return sum(len(rows) for rows in self.domain_morphisms)
+    
+    def product(self, user_masks: List[int]) -> List[Dict[int, float]]:
+        """
+        稀疏矩阵乘 U·Mᵀ（按行累加，只访问共享标签的列）
+        
+        Returns:
+            每个用户Morphism一行 {标签集合列: 余弦相似度}，只含非零项
+        """
+        rows = []
+        seen: Dict[int, Dict[int, float]] = {}
+        for user_mask in user_masks:
+            row = seen.get(user_mask)
+            if row is None:
+                overlap: Dict[int, int] = {}
+                for col in _iter_bits(user_mask):
+                    for column in self.tag_postings[col]:
+                        overlap[column] = overlap.get(column, 0) + 1
+                norm = math.sqrt(_popcount(user_mask))
+                row = seen[user_mask] = {
+                    column: count / (norm * self.mask_norms[column]) for column, count in overlap.items()
+                }
+            rows.append(row)
+        return rows
+    
+    def domain_scores(self, user_masks: List[int]) -> List[float]:
+        """
+        每个领域的得分：各用户Morphism在该领域中最佳对齐的相似度之和 / 用户Morphism数
+        
+        每行按相似度降序遍历标签集合列，领域第一次被覆盖时的分数即其最佳对齐
+        """
+        totals = [0.0] * len(self.domain_names)
+        if not user_masks:
+            return totals
+        for row in self.product(user_masks):
+            assigned: Set[int] = set()
+            for column, score in sorted(row.items(), key=lambda item: item[1], reverse=True):
+                reached = self.mask_domains[column] - assigned
+                if reached:
+                    assigned |= reached
+                    for index in reached:
+                        totals[index] += score
+        return [total / len(user_masks) for total in totals]
+    
+    def alignments(self, index: int, user_masks: List[int]) -> List[Dict[str, Any]]:
+        """领域index中与每个用户Morphism对齐最好的Core Morphism（无共享标签的用户Morphism省略）"""
+        results = []
+        for position, user_mask in enumerate(user_masks):
+            if not user_mask:
+                continue
+            best = None
+            for name, mask in self.domain_morphisms[index]:
+                shared = user_mask & mask
+                if not shared:
+                    continue
+                score = _popcount(shared) / math.sqrt(_popcount(user_mask) * _popcount(mask))
+                if best is None or score > best[0]:
+                    best = (score, name, shared)
+            if best is not None:
+                results.append({
+                    "user_morphism": position,
+                    "domain_morphism": best[1],
+                    "score": best[0],
+                    "shared_tags": [self.tag_names[col] for col in _iter_bits(best[2])],
+                })
+        return results
+
+
 class DomainSelector:
     """智能领域选择器"""
     
-    def __init__(self, tags_file: Optional[str] = None):
+    def __init__(
+        self,
+        tags_file: Optional[str] = None,
+        use_snapshot: bool = True,
+        cache_size: int = 4096,
+        result_store: Optional[Union[str, ResultStore]] = None,
+        morphism_db: Optional[str] = None
+    ):
         """
         初始化领域选择器
         
         Args:
-            tags_file: morphism_tags.json文件路径，默认为脚本所在目录
+            tags_file: morphism_tags.json文件路径或分片目录（只读取其core.json），默认为assets目录
+            use_snapshot: 是否使用/维护JSON旁的编译快照（加速冷启动）
+            cache_size: 标签提取与领域评分LRU缓存的容量，0表示不缓存
+            result_store: 跨进程结果缓存（ResultStore或SQLite文件路径），默认不启用
+            morphism_db: 含各领域Core Morphism标签的数据库（单文件或分片目录），
+                供Morphism粒度匹配使用；默认为标签文件本身（若含领域数据）或data目录下的数据库，
+                两者都不存在时select_domains_by_morphisms抛出FileNotFoundError
         """
         if tags_file is None:
             # 默认从assets目录加载
             script_dir = Path(__file__).parent.parent
             tags_file = str(script_dir / "assets" / "morphism_tags.json")
+        # 分片布局的领域分片不参与评分，只加载core.json
+        self.tags_file = str(core_path(tags_file))
+        self.use_snapshot = use_snapshot
+        # 分阶段统计，默认关闭（None时各埋点只做一次判空）
+        self._profiler: Optional[StageProfiler] = None
+        # 记忆化缓存：dynamics -> 标签集合；(领域, 标签集合, 画像) -> 评分；标签集合 -> 分数行
+        self._extraction_cache = LRUCache(cache_size) if cache_size > 0 else None
+        self._domain_score_cache = LRUCache(cache_size * 8) if cache_size > 0 else None
+        self._score_row_cache = LRUCache(cache_size) if cache_size > 0 else None
+        if isinstance(result_store, str):
+            result_store = ResultStore(result_store)
+        self.result_store = result_store
+        self.morphism_db = morphism_db
+        self._morphism_index: Optional[MorphismIndex] = None
+        self._morphism_index_stamp = None
+        self._shards_checked_at = 0.0
+        self._incremental: Optional[Tuple] = None
+        self._load()
+    
+    def _load(self):
+        """从快照或JSON加载标签库，并清空所有缓存"""
+        self.clear_caches()
+        self._morphism_index = None
+        self._incremental = None
+        state = self._load_snapshot(self.tags_file) if self.use_snapshot else None
+        if state is not None:
+            self._restore_state(state)
+            return
         
-        self.tags_data = self._load_tags(tags_file)
+        self.tags_data = self._load_tags(self.tags_file)
+        self._build_from_data()
+        if self.use_snapshot:
+            self._write_snapshot(self.tags_file)
+    
+    def reload(self):
+        """重新加载标签库（快照过期时自动重建），缓存随之失效"""
+        self._load()
+    
+    def _caches(self) -> Dict[str, Optional[LRUCache]]:
+        return {
+            "extraction": self._extraction_cache,
+            "domain_scores": self._domain_score_cache,
+            "score_rows": self._score_row_cache,
+        }
+    
+    def cache_info(self) -> Dict[str, Dict[str, Any]]:
+        """各缓存的命中/未命中统计"""
+        info = {name: cache.info() for name, cache in self._caches().items() if cache is not None}
+        if self.result_store is not None:
+            info["result_store"] = self.result_store.info()
+        return info
+    
+    def clear_caches(self):
+        """清空所有记忆化缓存"""
+        for cache in self._caches().values():
+            if cache is not None:
+                cache.clear()
+    
+    def _build_from_data(self):
+        """由tags_data构建标签、匹配器与评分表"""
         self.tags = self._parse_tags()
+        self.indicator_matcher = IndicatorMatcher(self.tags)
         self.domain_tag_mapping = self.tags_data.get("tag_relationships", {}).get("domain_tag_mapping", {})
         self.scoring_rules = self.tags_data.get("scoring_rules", {})
         self.complexity_thresholds = self.tags_data.get("complexity_thresholds", {})
+        self._build_score_tables()
+    
+    def enable_profiling(self, enabled: bool = True):
+        """开启/关闭分阶段计时与计数"""
+        self._profiler = StageProfiler() if enabled else None
+    
+    def stats(self) -> Optional[Dict[str, Any]]:
+        """
+        分阶段统计（未开启时返回None）
+        
+        Returns:
+            {"calls", "stages_ms", "counters", "last_call": {"stages_ms", "counters"}}
+        """
+        return self._profiler.snapshot() if self._profiler else None
+    
+    def reset_stats(self):
+        """清空分阶段统计"""
+        if self._profiler:
+            self._profiler.reset()
     
     def _load_tags(self, tags_file: str) -> Dict:
-        """加载标签定义文件"""
-        with open(tags_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        """加载标签定义文件（重放编辑日志），并以 主文件+日志 的sha256作为标签库版本"""
+        db = TagsDatabase(tags_file)
+        self.tags_version = db.version
+        self._source_state = db.fingerprint
+        return db.core
+    
+    @staticmethod
+    def snapshot_path(tags_file: str) -> str:
+        """快照文件路径：与JSON同目录，如 morphism_tags.json.snapshot"""
+        return tags_file + SNAPSHOT_SUFFIX
+    
+    @staticmethod
+    def _source_fingerprint(tags_file: str, with_hash: bool = True) -> Dict[str, Any]:
+        """源JSON及其编辑日志的指纹：mtime、大小与内容sha256"""
+        stat = os.stat(tags_file)
+        fingerprint = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "journal": None}
+        try:
+            journal = os.stat(journal_path(tags_file))
+            fingerprint["journal"] = (journal.st_mtime_ns, journal.st_size)
+        except OSError:
+            pass
+        if with_hash:
+            fingerprint["sha256"] = source_digest(tags_file)
+        return fingerprint
+    
+    def _load_snapshot(self, tags_file: str) -> Optional[Dict[str, Any]]:
+        """
+        读取编译快照（一次读取+反序列化）
+        
+        mtime与大小一致时直接采用；否则比对内容哈希，
+        哈希一致（仅被touch）则刷新快照头，不一致则返回None触发重建
+        """
+        path = self.snapshot_path(tags_file)
+        try:
+            with open(path, 'rb') as f:
+                header, state = pickle.loads(f.read())
+            current = self._source_fingerprint(tags_file, with_hash=False)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError, AttributeError):
+            return None
+        
+        if header.get("version") != SNAPSHOT_VERSION:
+            return None
+        if all(header.get(key) == current[key] for key in ("mtime_ns", "size", "journal")):
+            return state
+        
+        try:
+            current = self._source_fingerprint(tags_file)
+        except OSError:
+            return None
+        if header.get("sha256") != current["sha256"]:
+            return None
+        self._dump_snapshot(path, dict(current, version=SNAPSHOT_VERSION), state)
+        return state
+    
+    def _snapshot_state(self) -> Dict[str, Any]:
+        """导出可快照的全部状态（仅内置类型）"""
+        return {
+            "tags_data": self.tags_data,
+            "tags_version": self.tags_version,
+            "tags": {
+                tag_id: (t.name, t.description, t.indicators, t.related_tags,
+                         t.opposite_tags, t.example_domains, t.weight)
+                for tag_id, t in self.tags.items()
+            },
+            "matcher": self.indicator_matcher.to_state(),
+            "tag_index": self.tag_index,
+            "related_matrix": self.related_matrix,
+            "related_masks": self.related_masks,
+            "opposite_masks": self.opposite_masks,
+            "domain_names": self.domain_names,
+            "domain_rows": self.domain_rows,
+            "domain_masks": self.domain_masks,
+            "domain_norms": self.domain_norms,
+            "tag_postings": self.tag_postings,
+        }
+    
+    def _restore_state(self, state: Dict[str, Any]):
+        """从快照恢复，跳过JSON解析与所有预计算"""
+        self.tags_data = state["tags_data"]
+        self.tags_version = state["tags_version"]
+        self.tags = {tag_id: MorphismTag(*fields) for tag_id, fields in state["tags"].items()}
+        self.indicator_matcher = IndicatorMatcher.from_state(state["matcher"])
+        self.domain_tag_mapping = self.tags_data.get("tag_relationships", {}).get("domain_tag_mapping", {})
+        self.scoring_rules = self.tags_data.get("scoring_rules", {})
+        self.complexity_thresholds = self.tags_data.get("complexity_thresholds", {})
+        self.tag_index = state["tag_index"]
+        self.tag_names = list(self.tag_index)
+        self.related_matrix = state["related_matrix"]
+        self.related_masks = state["related_masks"]
+        self.opposite_masks = state["opposite_masks"]
+        self.domain_names = state["domain_names"]
+        self.domain_positions = {d: i for i, d in enumerate(self.domain_names)}
+        self.domain_rows = state["domain_rows"]
+        self.domain_masks = state["domain_masks"]
+        self._match_points = self._rule_points()
+        self.domain_norms = state["domain_norms"]
+        self.tag_postings = state["tag_postings"]
+        self._profile_bonus_rows = {}
+    
+    def _write_snapshot(self, tags_file: str):
+        """
+        写入编译快照；目录不可写时静默跳过
+        
+        快照头直接使用加载时在共享锁内记录的指纹（主文件与日志的stat及tags_version），
+        不再重新读取源文件，避免解析后的修改让旧状态挂在新文件的指纹下
+        """
+        header = dict(self._source_state, version=SNAPSHOT_VERSION)
+        self._dump_snapshot(self.snapshot_path(tags_file), header, self._snapshot_state())
+    
+    @staticmethod
+    def _dump_snapshot(path: str, header: Dict[str, Any], state: Dict[str, Any]):
+        """原子写入快照（临时文件 + rename）"""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(pickle.dumps((header, state), protocol=pickle.HIGHEST_PROTOCOL))
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
     
     def _parse_tags(self) -> Dict[str, MorphismTag]:
         """解析标签定义"""
@@ -70,6 +978,238 @@ class DomainSelector:
             )
         return tags
     
+    def _build_score_tables(self):
+        """
+        预计算评分所需的标签×领域表（标签ID驻留为列号，集合以整数位掩码表示）
+        
+        - tag_index / tag_names: 标签ID <-> 列号
+        - domain_rows: 每个领域的标签列号（按domain_tag_mapping顺序，即稀疏的领域×标签矩阵）
+        - domain_masks: 每个领域的标签位掩码；含重复标签的领域为None（按列逐个计分）
+        - related_matrix: 每个标签的相关标签列号（按related_tags顺序，用于生成匹配详情）
+        - related_masks / opposite_masks: 每个已定义标签的相关/对立标签位掩码
+        - domain_norms: 每个领域的归一化分母
+        - tag_postings: 倒排索引，用户标签列号 -> ((领域列号, 可得正分的标签数), ...)，
+          含相关/对立标签边；不在任何倒排表中的领域得分恒为0
+        """
+        tag_names = list(self.tags.keys())
+        for tag in self.tags.values():
+            tag_names.extend(tag.related_tags)
+            tag_names.extend(tag.opposite_tags)
+        for domain_tags in self.domain_tag_mapping.values():
+            tag_names.extend(domain_tags)
+        self.tag_index: Dict[str, int] = {}
+        for name in tag_names:
+            self.tag_index.setdefault(name, len(self.tag_index))
+        
+        self.tag_names: List[str] = list(self.tag_index)
+        
+        size = len(self.tag_index)
+        self.related_matrix: List[Tuple[int, ...]] = [()] * size
+        opposite_matrix: List[Tuple[int, ...]] = [()] * size
+        self.related_masks: List[int] = [0] * size
+        self.opposite_masks: List[int] = [0] * size
+        for tag_id, tag in self.tags.items():
+            col = self.tag_index[tag_id]
+            self.related_matrix[col] = tuple(self.tag_index[t] for t in tag.related_tags)
+            opposite_matrix[col] = tuple(self.tag_index[t] for t in tag.opposite_tags)
+            self.related_masks[col] = _to_mask(self.related_matrix[col])
+            self.opposite_masks[col] = _to_mask(opposite_matrix[col])
+        
+        exact = self.scoring_rules.get("exact_match", 100)
+        self.domain_names: List[str] = list(self.domain_tag_mapping.keys())
+        self.domain_positions: Dict[str, int] = {d: i for i, d in enumerate(self.domain_names)}
+        self.domain_rows: List[Tuple[int, ...]] = [
+            tuple(self.tag_index[t] for t in self.domain_tag_mapping[d])
+            for d in self.domain_names
+        ]
+        # 驻留标签ID：JSON中每次出现的标签字符串都是独立对象，原地替换为tag_names中的同一对象
+        names = self.tag_names
+        for tag_id, tag in self.tags.items():
+            col = self.tag_index[tag_id]
+            tag.related_tags[:] = [names[c] for c in self.related_matrix[col]]
+            tag.opposite_tags[:] = [names[c] for c in opposite_matrix[col]]
+        for domain, row in zip(self.domain_names, self.domain_rows):
+            self.domain_tag_mapping[domain][:] = [names[c] for c in row]
+        self.domain_masks: List[Optional[int]] = [
+            _to_mask(row) if len(set(row)) == len(row) else None
+            for row in self.domain_rows
+        ]
+        self.domain_norms: List[float] = [len(row) * exact for row in self.domain_rows]
+        self._match_points = self._rule_points()
+        
+        # 用户标签t命中领域d的某个标签列c：c本身（完全匹配）或c的相关标签（正分），
+        # 以及c的对立标签（负分，只计入可达不计入上界）
+        postings: List[Dict[int, int]] = [{} for _ in range(size)]
+        for index, tag_cols in enumerate(self.domain_rows):
+            for col in tag_cols:
+                for source in {col, *self.related_matrix[col]}:
+                    postings[source][index] = postings[source].get(index, 0) + 1
+                for source in opposite_matrix[col]:
+                    postings[source].setdefault(index, 0)
+        self.tag_postings: List[Tuple[Tuple[int, int], ...]] = [
+            tuple(posting.items()) for posting in postings
+        ]
+        self._profile_bonus_rows: Dict[str, List[float]] = {}
+    
+    def _rule_points(self) -> Tuple[float, float, float]:
+        """(完全匹配, 相关匹配, 对立匹配) 的得分"""
+        return (
+            self.scoring_rules.get("exact_match", 100),
+            self.scoring_rules.get("related_match", 50),
+            self.scoring_rules.get("opposite_match", -20),
+        )
+    
+    def _profile_bonus_row(self, user_profile: str) -> List[float]:
+        """每个领域的用户画像加权系数 (1 + bonus)，按画像缓存"""
+        row = self._profile_bonus_rows.get(user_profile)
+        if row is None:
+            row = [1 + self._apply_user_profile_bonus(d, user_profile) for d in self.domain_names]
+            self._profile_bonus_rows[user_profile] = row
+        return row
+    
+    def _entropy_penalized(self, history: HistoryLike) -> Dict[str, float]:
+        """统计历史窗口，返回超过阈值的领域及其衰减系数（与_apply_entropy_decay一致）"""
+        if isinstance(history, HistoryTracker):
+            return history.over_threshold()
+        entropy_rules = self.scoring_rules.get("entropy_decay", {})
+        window_size = entropy_rules.get("window_size", 10)
+        threshold = entropy_rules.get("threshold", 3)
+        penalty = entropy_rules.get("penalty", 0.5)
+        
+        recent_history = history[-window_size:] if len(history) > window_size else history
+        counts: Dict[str, int] = {}
+        for domain in recent_history:
+            counts[domain] = counts.get(domain, 0) + 1
+        return {d: penalty for d, c in counts.items() if c > threshold}
+    
+    def _user_tag_mask(self, user_tags: List[str]) -> int:
+        """将用户标签列表转为位掩码（未知标签忽略）"""
+        mask = 0
+        for tag in user_tags:
+            col = self.tag_index.get(tag)
+            if col is not None:
+                mask |= 1 << col
+        return mask
+    
+    def _query_masks(self, user_tags: List[str]) -> Tuple[int, int, int]:
+        """
+        计算一次查询的 (完全匹配, 相关匹配, 对立匹配) 标签位掩码
+        
+        完全匹配得exact_match；否则相关标签命中得related_match，
+        对立标签命中再加opposite_match（与逐标签比较的规则一致）
+        """
+        user_mask = self._user_tag_mask(user_tags)
+        related_mask = opposite_mask = 0
+        if user_mask:
+            for col, (related, opposite) in enumerate(zip(self.related_masks, self.opposite_masks)):
+                if related & user_mask:
+                    related_mask |= 1 << col
+                if opposite & user_mask:
+                    opposite_mask |= 1 << col
+            related_mask &= ~user_mask
+            opposite_mask &= ~user_mask
+        return user_mask, related_mask, opposite_mask
+    
+    def _candidate_bounds(self, user_mask: int) -> Dict[int, float]:
+        """
+        沿倒排索引收集候选领域及其归一化分数上界
+        
+        上界 = min(可得正分的标签列数, 领域标签数) × 单列最高分 / 归一化分母；
+        不在返回结果中的领域无任何标签贡献，归一化分数为0
+        """
+        counts: Dict[int, int] = {}
+        get = counts.get
+        for col in _iter_bits(user_mask):
+            for index, positive in self.tag_postings[col]:
+                counts[index] = get(index, 0) + positive
+        
+        best = max(self.scoring_rules.get("exact_match", 100), self.scoring_rules.get("related_match", 50), 0)
+        rows = self.domain_rows
+        norms = self.domain_norms
+        bounds = {}
+        for index, count in counts.items():
+            norm = norms[index]
+            size = len(rows[index])
+            bounds[index] = (count if count < size else size) * best / norm if norm > 0 else 0.0
+        return bounds
+    
+    def _masked_total(self, index: int, masks: Tuple[int, int, int]) -> float:
+        """单个领域的未归一化分数：各类命中数由位与和popcount得出"""
+        user_mask, related_mask, opposite_mask = masks
+        exact, related, opposite = self._match_points
+        domain_mask = self.domain_masks[index]
+        if domain_mask is not None:
+            return (exact * _popcount(domain_mask & user_mask)
+                    + related * _popcount(domain_mask & related_mask)
+                    + opposite * _popcount(domain_mask & opposite_mask))
+        # 含重复标签的领域：重复的标签列各自计分
+        total = 0
+        for col in self.domain_rows[index]:
+            if user_mask >> col & 1:
+                total += exact
+            else:
+                if related_mask >> col & 1:
+                    total += related
+                if opposite_mask >> col & 1:
+                    total += opposite
+        return total
+    
+    def _domain_row_score(self, index: int, masks: Tuple[int, int, int]) -> float:
+        """单个领域的归一化分数"""
+        norm = self.domain_norms[index]
+        return self._masked_total(index, masks) / norm if norm > 0 else 0.0
+    
+    def _best_matches(self, index: int, masks: Tuple[int, int, int]) -> List[Dict]:
+        """按领域标签顺序生成best_matches（相关匹配取related_tags中第一个命中的标签）"""
+        user_mask, related_mask, _ = masks
+        domain_mask = self.domain_masks[index]
+        if domain_mask is not None and not domain_mask & (user_mask | related_mask):
+            return []
+        exact, related, _ = self._match_points
+        names = self.tag_names
+        matches = []
+        for col in self.domain_rows[index]:
+            if user_mask >> col & 1:
+                matches.append({"tag": names[col], "score": exact, "type": "exact"})
+            elif related_mask >> col & 1:
+                for candidate in self.related_matrix[col]:
+                    if user_mask >> candidate & 1:
+                        matches.append({
+                            "tag": names[col],
+                            "related_to": names[candidate],
+                            "score": related,
+                            "type": "related"
+                        })
+                        break
+        return matches
+    
+    def score_matrix(self, user_tag_rows: List[List[str]]) -> List[List[float]]:
+        """
+        批量计算归一化领域分数（未含用户画像与熵值衰减）
+        
+        Args:
+            user_tag_rows: N个查询的用户标签列表
+        
+        Returns:
+            N×领域数 的分数矩阵，列顺序同 self.domain_names
+        """
+        cache = self._score_row_cache
+        matrix = []
+        for user_tags in user_tag_rows:
+            key = frozenset(user_tags)
+            row = cache.get(key) if cache is not None else None
+            if row is None:
+                masks = self._query_masks(user_tags)
+                # 只计算倒排索引可达的领域，其余保持0.0
+                row = [0.0] * len(self.domain_names)
+                for index in self._candidate_bounds(masks[0]):
+                    row[index] = self._domain_row_score(index, masks)
+                if cache is not None:
+                    cache.put(key, row)
+            # 返回副本，调用方修改矩阵不会污染缓存
+            matrix.append(list(row))
+        return matrix
+    
     def extract_user_tags(self, morphisms: Optional[List[Dict[str, str]]]) -> List[str]:
         """
         从用户Morphism中提取标签
@@ -79,24 +1219,56 @@ class DomainSelector:
                 [{"from": "A", "to": "B", "dynamics": "描述"}, ...]
         
         Returns:
-            提取的标签列表
+            提取的标签列表（按标签定义顺序，结果确定）
         """
         if morphisms is None:
             return []
             
         user_tags = set()
-        
         for morphism in morphisms:
-            dynamics = morphism.get("dynamics", "").lower()
-            
-            for tag_id, tag in self.tags.items():
-                # 检查指标词匹配
-                for indicator in tag.indicators:
-                    if indicator.lower() in dynamics:
-                        user_tags.add(tag_id)
-                        break
+            user_tags.update(self._dynamics_tags(morphism.get("dynamics", "")))
         
-        return list(user_tags)
+        return sorted(user_tags, key=self.tag_index.__getitem__)
+    
+    def _dynamics_tags(self, dynamics: str) -> Tuple[str, ...]:
+        """单条dynamics命中的标签（按标签定义顺序，带缓存）"""
+        dynamics = dynamics.lower()
+        cache = self._extraction_cache
+        tags = cache.get(dynamics) if cache is not None else None
+        if tags is None:
+            # 一次线性扫描匹配所有标签的指标词，按标签定义顺序加入（与逐标签检查时的顺序一致）
+            tags = tuple(sorted(self.indicator_matcher.match_tags(dynamics), key=self.tag_index.__getitem__))
+            if cache is not None:
+                cache.put(dynamics, tags)
+            prof = self._profiler
+            if prof:
+                # 自动机每个字符做一次状态转移，即与全部指标词的一次并行比较
+                prof.count("indicator_comparisons", len(dynamics))
+        return tags
+    
+    def extract_indicator_hits(
+        self, 
+        morphisms: Optional[List[Dict[str, str]]]
+    ) -> List[IndicatorHit]:
+        """
+        报告每条Morphism中命中的指标词及其位置
+        
+        Args:
+            morphisms: 用户问题的Morphism列表
+        
+        Returns:
+            命中记录列表，位置基于小写化后的dynamics
+        """
+        if morphisms is None:
+            return []
+        
+        hits = []
+        for index, morphism in enumerate(morphisms):
+            dynamics = morphism.get("dynamics", "").lower()
+            for start, end, indicator, owners in self.indicator_matcher.iter_matches(dynamics):
+                for tag_id in owners:
+                    hits.append(IndicatorHit(index, tag_id, indicator, start, end))
+        return hits
     
     def calculate_domain_score(
         self, 
@@ -115,61 +1287,87 @@ class DomainSelector:
         Returns:
             (分数, 最佳匹配列表, 推理说明)
         """
-        domain_tags = self.domain_tag_mapping.get(domain, [])
-        if not domain_tags:
+        return self._domain_score(
+            domain, user_tags, frozenset(user_tags), self._query_masks(user_tags), user_profile
+        )
+    
+    def _domain_score(
+        self,
+        domain: str,
+        user_tags: List[str],
+        tag_key: frozenset,
+        masks: Tuple[int, int, int],
+        user_profile: Optional[str]
+    ) -> Tuple[float, List[Dict], str]:
+        """带LRU缓存的领域评分，键为 (领域, 标签集合, 画像)"""
+        cache = self._domain_score_cache
+        if cache is None:
+            return self._compute_domain_score(domain, user_tags, masks, user_profile)
+        
+        key = (domain, tag_key, user_profile)
+        cached = cache.get(key)
+        if cached is None:
+            cached = self._compute_domain_score(domain, user_tags, masks, user_profile)
+            cache.put(key, cached)
+        elif self._profiler:
+            self._profiler.mark("scoring")
+        # 返回副本，调用方修改结果不会污染缓存
+        score, matches, reasoning = cached
+        return score, [dict(m) for m in matches], reasoning
+    
+    def _compute_domain_score(
+        self,
+        domain: str,
+        user_tags: List[str],
+        masks: Tuple[int, int, int],
+        user_profile: Optional[str]
+    ) -> Tuple[float, List[Dict], str]:
+        """计算领域匹配分数（无缓存）"""
+        index = self.domain_positions.get(domain)
+        if index is None or not self.domain_rows[index]:
             return 0.0, [], f"领域 {domain} 无标签定义"
         
-        total_score = 0
-        best_matches = []
-        
-        # 计算标签匹配分数
-        for domain_tag in domain_tags:
-            if domain_tag in user_tags:
-                # 完全匹配
-                score = self.scoring_rules.get("exact_match", 100)
-                total_score += score
-                best_matches.append({
-                    "tag": domain_tag,
-                    "score": score,
-                    "type": "exact"
-                })
-            else:
-                # 检查相关标签
-                tag_obj = self.tags.get(domain_tag)
-                if tag_obj:
-                    for related in tag_obj.related_tags:
-                        if related in user_tags:
-                            score = self.scoring_rules.get("related_match", 50)
-                            total_score += score
-                            best_matches.append({
-                                "tag": domain_tag,
-                                "related_to": related,
-                                "score": score,
-                                "type": "related"
-                            })
-                            break
-                    
-                    # 检查对立标签（惩罚）
-                    for opposite in tag_obj.opposite_tags:
-                        if opposite in user_tags:
-                            score = self.scoring_rules.get("opposite_match", -20)
-                            total_score += score
-                            break
+        # 完全/相关/对立命中由位运算得出，匹配详情按领域标签顺序生成
+        total_score = self._masked_total(index, masks)
+        best_matches = self._best_matches(index, masks)
         
         # 归一化分数
-        max_possible = len(domain_tags) * self.scoring_rules.get("exact_match", 100)
+        max_possible = self.domain_norms[index]
         normalized_score = total_score / max_possible if max_possible > 0 else 0
+        prof = self._profiler
+        if prof:
+            prof.mark("scoring")
+            prof.count("domains_scored")
         
         # 用户画像加权
         if user_profile:
             profile_bonus = self._apply_user_profile_bonus(domain, user_profile)
             normalized_score *= (1 + profile_bonus)
+            if prof:
+                prof.mark("profile_bonus")
         
         # 生成推理说明
         reasoning = self._generate_reasoning(domain, best_matches, user_tags)
+        if prof:
+            prof.mark("reasoning")
         
         return normalized_score, best_matches, reasoning
     
+    def _unreachable_score(
+        self,
+        index: int,
+        user_tags: List[str],
+        user_profile: Optional[str]
+    ) -> Tuple[float, List[Dict], str]:
+        """无任何标签贡献的领域的评分结果（与calculate_domain_score一致）"""
+        domain = self.domain_names[index]
+        if not self.domain_rows[index]:
+            return 0.0, [], f"领域 {domain} 无标签定义"
+        score = 0.0
+        if user_profile:
+            score *= (1 + self._apply_user_profile_bonus(domain, user_profile))
+        return score, [], self._generate_reasoning(domain, [], user_tags)
+    
     def _apply_user_profile_bonus(self, domain: str, user_profile: str) -> float:
         """应用用户画像加权"""
         profile_rules = self.scoring_rules.get("user_profile_bonus", {})
@@ -205,7 +1403,9 @@ class DomainSelector:
         morphisms: Optional[List[Dict[str, str]]],
         user_profile: Optional[str] = None,
         exclude_domains: Optional[List[str]] = None,
-        history_domains: Optional[List[str]] = None
+        history_domains: Optional[HistoryLike] = None,
+        top_k: int = 5,
+        lean: bool = False
     ) -> Dict[str, Any]:
         """
         选择最适合的领域
@@ -215,35 +1415,87 @@ class DomainSelector:
             morphisms: 用户问题的Morphisms列表
             user_profile: 用户画像类型
             exclude_domains: 要排除的领域列表
-            history_domains: 历史使用领域列表（用于熵值衰减）
+            history_domains: 历史使用领域列表或HistoryTracker（用于熵值衰减）
+            top_k: 返回的推荐领域数量
+            lean: 精简模式——先纯数值评分并部分选择Top k，
+                只为这k个领域生成匹配详情与推理说明，且不返回all_domains
         
         Returns:
             选择结果字典
         """
+        prof = self._profiler
+        if prof:
+            prof.begin()
+        
         # 处理None值
         objects = objects or []
         morphisms = morphisms or []
         
         # 提取用户标签
         user_tags = self.extract_user_tags(morphisms)
+        if prof:
+            prof.mark("extract_tags")
         
         # 计算复杂度
         complexity_level = self._determine_complexity(objects, morphisms)
+        if prof:
+            prof.mark("complexity")
         
-        # 计算所有领域分数
+        # 跨进程结果缓存：只缓存评分部分，user_tags与复杂度每次重新计算
+        store_key = None
+        if self.result_store is not None:
+            store_key = self._result_key(user_tags, user_profile, exclude_domains, history_domains, top_k, lean)
+            cached = self.result_store.get(store_key, self.tags_version)
+            if prof:
+                prof.mark("result_store")
+            if cached is not None:
+                if prof:
+                    prof.end()
+                if lean:
+                    return {"top_domains": cached, "user_tags": user_tags, "complexity_level": complexity_level}
+                return {
+                    "all_domains": cached,
+                    "top_domains": cached[:top_k],
+                    "user_tags": user_tags,
+                    "complexity_level": complexity_level,
+                }
+        
+        if lean:
+            top_domains = self._select_top_k(
+                user_tags, user_profile, exclude_domains, history_domains, top_k
+            )
+            if store_key is not None:
+                self.result_store.put(store_key, self.tags_version, top_domains)
+            if prof:
+                prof.end()
+            return {
+                "top_domains": top_domains,
+                "user_tags": user_tags,
+                "complexity_level": complexity_level,
+            }
+        
+        # 计算所有领域分数（倒排索引不可达的领域直接得0分）
+        tag_key = frozenset(user_tags)
+        masks = self._query_masks(user_tags)
+        candidates = self._candidate_bounds(masks[0])
         domain_scores = []
-        for domain in self.domain_tag_mapping.keys():
+        for index, domain in enumerate(self.domain_names):
             # 排除指定领域
             if exclude_domains and domain in exclude_domains:
                 continue
             
-            score, matches, reasoning = self.calculate_domain_score(
-                domain, user_tags, user_profile
-            )
+            if index in candidates:
+                score, matches, reasoning = self._domain_score(
+                    domain, user_tags, tag_key, masks, user_profile
+                )
+            else:
+                score, matches, reasoning = self._unreachable_score(index, user_tags, user_profile)
             
             # 应用熵值衰减
             if history_domains:
                 score = self._apply_entropy_decay(domain, score, history_domains)
+                if prof:
+                    prof.mark("entropy_decay")
             
             domain_scores.append({
                 "domain": domain,
@@ -252,19 +1504,411 @@ class DomainSelector:
                 "reasoning": reasoning
             })
         
-        # 排序并选择Top 5
+        # 排序并选择Top k
         domain_scores.sort(key=lambda x: x["score"], reverse=True)
 
-        # 总是返回Top 5，让用户选择
-        top_5 = domain_scores[:5]
+        # 总是返回Top k（默认5），让用户选择
+        top_k_domains = domain_scores[:top_k]
+        if store_key is not None:
+            self.result_store.put(store_key, self.tags_version, domain_scores)
+        if prof:
+            prof.mark("sort")
+            prof.end()
 
         return {
             "all_domains": domain_scores,  # 所有领域评分
-            "top_domains": top_5,          # Top 5领域
+            "top_domains": top_k_domains,  # Top k领域
             "user_tags": user_tags,
             "complexity_level": complexity_level,
         }
     
+    def _result_key(
+        self,
+        user_tags: List[str],
+        user_profile: Optional[str],
+        exclude_domains: Optional[List[str]],
+        history_domains: Optional[HistoryLike],
+        top_k: int,
+        lean: bool
+    ) -> str:
+        """
+        结果缓存的规范化键
+        
+        历史只取其生效部分（窗口内超过阈值的领域及衰减系数），
+        完整模式缓存全部领域评分，top_k不进入键
+        """
+        penalized = self._entropy_penalized(history_domains) if history_domains else {}
+        canonical = json.dumps([
+            self.tags_version,
+            sorted(user_tags),
+            user_profile,
+            sorted(set(exclude_domains or [])),
+            sorted(penalized.items()),
+            top_k if lean else None,
+            lean,
+        ], ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    
+    def _morphism_db_path(self) -> Optional[str]:
+        """Morphism粒度匹配使用的数据库路径；未指定且默认位置都不存在时返回None"""
+        if self.morphism_db:
+            return self.morphism_db
+        if "domains" in self.tags_data or MANIFEST_KEY in self.tags_data:
+            return self.tags_file
+        default = default_db_path(Path(__file__).parent.parent / "data")
+        return str(default) if core_path(default).exists() else None
+    
+    def morphism_index(self) -> MorphismIndex:
+        """
+        领域Core Morphism的稀疏索引（首次使用时构建）
+        
+        数据库主文件或编辑日志变化时立即重建；直接编辑分片（domains/<domain>.json）
+        最多在 SHARD_CHECK_INTERVAL 秒后被发现并重建。
+        
+        Raises:
+            FileNotFoundError: 找不到Morphism数据库
+        """
+        path = self._morphism_db_path()
+        try:
+            if path is None:
+                raise FileNotFoundError
+            source = self._source_fingerprint(str(core_path(path)), with_hash=False)
+        except FileNotFoundError:
+            raise FileNotFoundError(
+                f"未找到Morphism数据库: {path or 'data/morphism_tags(.json)'}，"
+                "请通过 morphism_db 参数（服务模式为 --morphism-db）指定含各领域Core Morphism标签的数据库"
+            ) from None
+        
+        now = time.monotonic()
+        stale = self._morphism_index is None or source != self._morphism_index_stamp[0]
+        shards = None
+        if not stale and now - self._shards_checked_at >= SHARD_CHECK_INTERVAL:
+            shards = shard_stamp(path)
+            self._shards_checked_at = now
+            stale = shards != self._morphism_index_stamp[1]
+        if stale:
+            if shards is None:
+                shards = shard_stamp(path)
+                self._shards_checked_at = now
+            db = TagsDatabase(path)
+            self._morphism_index = MorphismIndex(
+                self.tag_index,
+                ((name, data.get("morphisms", [])) for name, data in db.iter_domains())
+            )
+            self._morphism_index_stamp = (source, shards)
+        return self._morphism_index
+    
+    def select_domains_by_morphisms(
+        self,
+        morphisms: Optional[List[Dict[str, str]]],
+        top_k: int = 5,
+        exclude_domains: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Morphism粒度选择：把用户的每个Morphism与各领域的14个Core Morphism按标签逐一对齐
+        
+        领域得分为各用户Morphism最佳对齐的标签余弦相似度的平均值（0-1），
+        只返回得分大于0的领域。
+        
+        Args:
+            morphisms: 用户问题的Morphism列表
+            top_k: 返回的推荐领域数量
+            exclude_domains: 要排除的领域列表
+        
+        Returns:
+            {"top_domains": [{"domain", "score", "alignments": [{"user_morphism", "domain_morphism",
+             "score", "shared_tags"}, ...]}, ...], "morphism_tags": 每个用户Morphism的标签}
+        
+        Raises:
+            FileNotFoundError: 找不到Morphism数据库（见构造参数morphism_db）
+        """
+        prof = self._profiler
+        if prof:
+            prof.begin()
+        morphisms = morphisms or []
+        morphism_tags = [self._dynamics_tags(m.get("dynamics", "")) for m in morphisms]
+        user_masks = [_to_mask(self.tag_index[t] for t in tags) for tags in morphism_tags]
+        if prof:
+            prof.mark("extract_tags")
+        
+        index = self.morphism_index()
+        scores = index.domain_scores(user_masks)
+        if prof:
+            prof.mark("scoring")
+            prof.count("domains_scored", len(scores))
+        
+        excluded = set(exclude_domains or [])
+        best = heapq.nlargest(top_k, (
+            (score, -i) for i, score in enumerate(scores)
+            if score > 0 and index.domain_names[i] not in excluded
+        ))
+        top_domains = [
+            {
+                "domain": index.domain_names[-neg],
+                "score": score,
+                "alignments": index.alignments(-neg, user_masks),
+            }
+            for score, neg in best
+        ]
+        if prof:
+            prof.mark("reasoning")
+            prof.end()
+        return {"top_domains": top_domains, "morphism_tags": [list(tags) for tags in morphism_tags]}
+    
+    def _adjusted_scores(
+        self,
+        row: Any,
+        user_profile: Optional[str],
+        exclude_domains: Optional[List[str]],
+        history_domains: Optional[HistoryLike],
+        indices: Optional[List[int]] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        在归一化分数上应用排除、用户画像加权与熵值衰减（与标量路径一致）
+        
+        Args:
+            row: 归一化分数，可按领域列号下标访问（列表或稀疏字典）
+            indices: 只处理这些领域列号（升序），默认全部领域
+        
+        Returns:
+            [(领域列号, 最终分数), ...]，按domain_names顺序
+        """
+        prof = self._profiler
+        bonus_row, penalized = self._score_adjusters(user_profile, history_domains)
+        
+        scored = []
+        for index in range(len(self.domain_names)) if indices is None else indices:
+            if exclude_domains and self.domain_names[index] in exclude_domains:
+                continue
+            scored.append((index, self._adjust_score(index, row[index], bonus_row, penalized)))
+        if prof:
+            # 向量化路径中画像加权与熵值衰减在同一循环内完成，耗时记入实际生效的阶段
+            prof.mark("profile_bonus" if bonus_row else "entropy_decay" if penalized else "scoring")
+        return scored
+    
+    def _score_adjusters(
+        self,
+        user_profile: Optional[str],
+        history_domains: Optional[HistoryLike]
+    ) -> Tuple[Optional[List[float]], Dict[str, float]]:
+        """返回 (画像加权系数行, 熵值衰减系数)"""
+        bonus_row = self._profile_bonus_row(user_profile) if user_profile else None
+        penalized = self._entropy_penalized(history_domains) if history_domains else {}
+        return bonus_row, penalized
+    
+    def _adjust_score(
+        self,
+        index: int,
+        score: float,
+        bonus_row: Optional[List[float]],
+        penalized: Dict[str, float]
+    ) -> float:
+        """对单个领域的归一化分数应用画像加权与熵值衰减"""
+        # 无标签定义的领域在标量路径中不参与画像加权
+        if bonus_row and self.domain_rows[index]:
+            score *= bonus_row[index]
+        domain = self.domain_names[index]
+        if domain in penalized:
+            score = score * penalized[domain]
+        return score
+    
+    def _pruned_top_k(
+        self,
+        masks: Tuple[int, int, int],
+        user_profile: Optional[str],
+        exclude_domains: Optional[List[str]],
+        history_domains: Optional[HistoryLike],
+        top_k: int
+    ) -> List[Tuple[int, float]]:
+        """
+        只访问倒排索引中的候选领域，按分数上界降序精确评分，
+        当第k名分数严格高于下一个上界时提前停止
+        
+        Returns:
+            与对全部领域 heapq.nlargest(top_k, ...) 相同的 [(领域列号, 最终分数), ...]
+        """
+        if top_k <= 0:
+            return []
+        prof = self._profiler
+        bonus_row, penalized = self._score_adjusters(user_profile, history_domains)
+        bounds = self._candidate_bounds(masks[0])
+        
+        ordered = []
+        for index, bound in bounds.items():
+            if exclude_domains and self.domain_names[index] in exclude_domains:
+                continue
+            ordered.append((self._adjust_score(index, bound, bonus_row, penalized), index))
+        ordered.sort(reverse=True)
+        # 上界只在各项系数非负、对立标签为扣分时成立，否则退化为评分全部候选
+        prune = (
+            self.scoring_rules.get("exact_match", 100) > 0
+            and self.scoring_rules.get("opposite_match", -20) <= 0
+            and (not bonus_row or min(bonus_row) >= 0)
+            and all(p >= 0 for p in penalized.values())
+        )
+        
+        scores: Dict[int, float] = {}
+        heap: List[Tuple[float, int]] = []  # (分数, -列号) 的小顶堆，同分时列号小者优先
+        for bound, index in ordered:
+            if prune and len(heap) == top_k and heap[0][0] > bound:
+                break
+            score = self._adjust_score(index, self._domain_row_score(index, masks), bonus_row, penalized)
+            scores[index] = score
+            item = (score, -index)
+            if len(heap) < top_k:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+        if prof:
+            prof.mark("scoring")
+            prof.count("domains_scored", len(scores))
+            prof.count("domains_pruned", len(self.domain_names) - len(scores))
+        
+        if len(heap) == top_k and heap[0][0] > 0:
+            return [(-neg_index, score) for score, neg_index in sorted(heap, reverse=True)]
+        
+        # 名额未满或第k名不高于0分时，不可达领域（0分）按领域顺序参与竞争
+        for _, index in ordered:
+            if index not in scores:
+                scores[index] = self._adjust_score(
+                    index, self._domain_row_score(index, masks), bonus_row, penalized
+                )
+        filler = []
+        for index, domain in enumerate(self.domain_names):
+            if len(filler) >= top_k:
+                break
+            if index in bounds or (exclude_domains and domain in exclude_domains):
+                continue
+            filler.append((index, self._adjust_score(index, 0.0, bonus_row, penalized)))
+        merged = sorted(list(scores.items()) + filler)
+        return heapq.nlargest(top_k, merged, key=lambda item: item[1])
+    
+    def _domain_result(
+        self,
+        index: int,
+        score: float,
+        masks: Tuple[int, int, int],
+        user_tags: List[str]
+    ) -> Dict[str, Any]:
+        """为单个领域生成结果条目（匹配详情与推理说明）"""
+        domain = self.domain_names[index]
+        if not self.domain_rows[index]:
+            matches, reasoning = [], f"领域 {domain} 无标签定义"
+        else:
+            matches = self._best_matches(index, masks)
+            reasoning = self._generate_reasoning(domain, matches, user_tags)
+        return {
+            "domain": domain,
+            "score": score,
+            "best_matches": matches,
+            "reasoning": reasoning
+        }
+    
+    def _select_top_k(
+        self,
+        user_tags: List[str],
+        user_profile: Optional[str],
+        exclude_domains: Optional[List[str]],
+        history_domains: Optional[HistoryLike],
+        top_k: int
+    ) -> List[Dict[str, Any]]:
+        """精简模式：倒排索引剪枝评分 + 堆选择Top k，只为入选领域构建详情"""
+        prof = self._profiler
+        masks = self._query_masks(user_tags)
+        best = self._pruned_top_k(masks, user_profile, exclude_domains, history_domains, top_k)
+        if prof:
+            prof.mark("sort")
+        results = [self._domain_result(index, score, masks, user_tags) for index, score in best]
+        if prof:
+            prof.mark("reasoning")
+        return results
+    
+    def select_domains_batch(
+        self,
+        queries: List[Dict[str, Any]],
+        top_k: int = 5,
+        lean: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        批量选择领域（矩阵化评分）
+        
+        Args:
+            queries: 查询列表，每项为select_domains的关键字参数字典
+                {"objects", "morphisms", "user_profile", "exclude_domains", "history_domains"}
+            top_k: 每个查询返回的推荐领域数量
+            lean: 精简模式，只为Top k构建详情且不返回all_domains
+        
+        Returns:
+            与逐个调用select_domains相同的结果列表
+        """
+        prof = self._profiler
+        if prof:
+            prof.begin()
+            prof.count("queries", len(queries))
+        
+        prepared = []
+        for query in queries:
+            objects = query.get("objects") or []
+            morphisms = query.get("morphisms") or []
+            prepared.append((objects, morphisms, self.extract_user_tags(morphisms)))
+        if prof:
+            prof.mark("extract_tags")
+        
+        # 精简模式逐个查询剪枝选择，无需完整分数矩阵
+        scores = [None] * len(prepared) if lean else self.score_matrix([t for _, _, t in prepared])
+        if prof and not lean:
+            prof.mark("scoring")
+            prof.count("domains_scored", len(queries) * len(self.domain_names))
+        
+        results = []
+        for query, (objects, morphisms, user_tags), row in zip(queries, prepared, scores):
+            masks = self._query_masks(user_tags)
+            if prof:
+                prof.mark("scoring")
+            result = {
+                "user_tags": user_tags,
+                "complexity_level": self._determine_complexity(objects, morphisms),
+            }
+            if prof:
+                prof.mark("complexity")
+            if lean:
+                best = self._pruned_top_k(
+                    masks,
+                    query.get("user_profile"),
+                    query.get("exclude_domains"),
+                    query.get("history_domains"),
+                    top_k
+                )
+                if prof:
+                    prof.mark("sort")
+                result["top_domains"] = [
+                    self._domain_result(index, score, masks, user_tags) for index, score in best
+                ]
+                if prof:
+                    prof.mark("reasoning")
+            else:
+                scored = self._adjusted_scores(
+                    row,
+                    query.get("user_profile"),
+                    query.get("exclude_domains"),
+                    query.get("history_domains")
+                )
+                domain_scores = [
+                    self._domain_result(index, score, masks, user_tags) for index, score in scored
+                ]
+                if prof:
+                    prof.mark("reasoning")
+                domain_scores.sort(key=lambda x: x["score"], reverse=True)
+                result["all_domains"] = domain_scores
+                result["top_domains"] = domain_scores[:top_k]
+                if prof:
+                    prof.mark("sort")
+            results.append(result)
+        
+        if prof:
+            prof.end()
+        return results
+    
     def _determine_complexity(
         self, 
         objects: List[str], 
@@ -279,13 +1923,53 @@ class DomainSelector:
             return "simple"
         return "complex"
     
+    def new_history_tracker(self, history: Optional[List[str]] = None) -> HistoryTracker:
+        """按本选择器的entropy_decay规则创建HistoryTracker"""
+        return HistoryTracker.from_rules(self.scoring_rules, history)
+    
+    def new_session(self, **kwargs) -> "SelectionSession":
+        """创建增量选择会话（参数同SelectionSession）"""
+        return SelectionSession(self, **kwargs)
+    
+    def _incremental_tables(self) -> Tuple[List[Tuple[int, ...]], List[Tuple[int, ...]], List[Tuple[int, ...]]]:
+        """
+        增量评分所需的反向表（首次使用时构建，重新加载后重建）
+        
+        Returns:
+            (related_by, opposite_by, column_domains)：
+            用户标签列 -> 以其为相关/对立标签的标签列；
+            标签列 -> 含该标签的领域列号（领域含重复标签时每次出现记一次）
+        """
+        if self._incremental is None:
+            size = len(self.tag_names)
+            related_by: List[List[int]] = [[] for _ in range(size)]
+            opposite_by: List[List[int]] = [[] for _ in range(size)]
+            for col in range(size):
+                for source in self.related_matrix[col]:
+                    related_by[source].append(col)
+                for source in _iter_bits(self.opposite_masks[col]):
+                    opposite_by[source].append(col)
+            column_domains: List[List[int]] = [[] for _ in range(size)]
+            for index, row in enumerate(self.domain_rows):
+                for col in row:
+                    column_domains[col].append(index)
+            self._incremental = (
+                [tuple(cols) for cols in related_by],
+                [tuple(cols) for cols in opposite_by],
+                [tuple(indices) for indices in column_domains],
+            )
+        return self._incremental
+    
     def _apply_entropy_decay(
         self, 
         domain: str, 
         score: float, 
-        history: List[str]
+        history: HistoryLike
     ) -> float:
         """应用熵值衰减"""
+        if isinstance(history, HistoryTracker):
+            return history.apply(domain, score)
+        
         entropy_rules = self.scoring_rules.get("entropy_decay", {})
         window_size = entropy_rules.get("window_size", 10)
         threshold = entropy_rules.get("threshold", 3)
@@ -348,6 +2032,9 @@ class DomainSelector:
         print("=" * 60)
 
         result = self.select_domains(objects, morphisms, user_profile)
+        if self._profiler:
+            print("\n【分阶段统计】")
+            print(format_stats(self.stats(), last_call=True))
 
         # 输出分析结果
         print("\n【分析结果】")
@@ -406,14 +2093,550 @@ class DomainSelector:
         print("=" * 60)
 
 
+class SelectionSession:
+    """
+    增量选择会话：交互/Agent会话中逐步修改Morphism、Objects、排除领域等，
+    每次修改只重新计算受影响的部分，result() 与用同样参数调用 select_domains 的结果一致。
+    
+    维护的状态：
+    - 每个Morphism的标签元组，以及标签引用计数（计数归零时标签移出用户标签集合）
+    - 每个标签列被用户标签作为相关/对立标签命中的次数，据此增量维护 (完全, 相关, 对立) 位掩码
+    - 每个领域的未归一化总分、归一化分数与最终分数（画像加权与熵值衰减后）；
+      只有状态变化的标签列所在的领域被重新评分，画像或历史变化时只重算最终分数
+    - 每个领域的匹配详情与推理说明（按需生成，领域被重新评分时失效）
+    
+    用法:
+        session = selector.new_session(morphisms=[...], user_profile="tech_executive")
+        session.edit_morphism(0, dynamics="...")
+        session.exclude_domain("game_theory")
+        result = session.result(top_k=5, lean=True)
+    """
+    
+    def __init__(
+        self,
+        selector: DomainSelector,
+        objects: Optional[List[str]] = None,
+        morphisms: Optional[List[Dict[str, str]]] = None,
+        user_profile: Optional[str] = None,
+        exclude_domains: Optional[List[str]] = None,
+        history_domains: Optional[HistoryLike] = None
+    ):
+        """
+        Args:
+            selector: 领域选择器（重新加载标签库后，会话在下次访问时整体重建）
+            objects / morphisms / user_profile / exclude_domains / history_domains: 同select_domains
+        """
+        self.selector = selector
+        self.objects: List[str] = list(objects or [])
+        self.morphisms: List[Dict[str, str]] = [dict(m) for m in morphisms or []]
+        self.user_profile = user_profile
+        self.exclude_domains: Set[str] = set(exclude_domains or [])
+        self.history_domains = history_domains
+        # 最近一次修改的代价：标签变化数、重新评分的领域数
+        self.last_delta: Dict[str, int] = {}
+        self._rebuild()
+    
+    def _rebuild(self):
+        """从当前Morphism列表整体构建状态"""
+        selector = self.selector
+        self._domain_names = selector.domain_names
+        self._morphism_tags: List[Tuple[str, ...]] = []
+        self._tag_counts: Dict[str, int] = {}
+        size = len(selector.tag_names)
+        self._related_counts = [0] * size
+        self._opposite_counts = [0] * size
+        self._user_mask = self._related_any = self._opposite_any = 0
+        self._scores = [0.0] * len(selector.domain_names)
+        # 每个领域的未归一化总分；各项分值为整数时按标签列增量累加（与逐领域重算结果完全相同）
+        self._totals = [0] * len(selector.domain_names)
+        self._additive = all(isinstance(points, int) for points in selector._match_points)
+        # 取负的最终分数，选择Top k时按其升序（同分时列号小者优先）
+        self._keys = [-0.0] * len(selector.domain_names)
+        self._adjusters: Tuple[Optional[List[float]], Dict[str, float]] = (None, {})
+        self._adjusters_key = (None, ())
+        self._details: Dict[int, Tuple[List[Dict], str]] = {}
+        
+        added = []
+        for morphism in self.morphisms:
+            tags = selector._dynamics_tags(morphism.get("dynamics", ""))
+            self._morphism_tags.append(tags)
+            added.extend(tags)
+        self._apply_tags(added, ())
+        self.last_delta = {}
+    
+    def _refresh_adjusters(self) -> Tuple[Optional[List[float]], Dict[str, float]]:
+        """画像或历史生效部分变化时，按新的系数重算所有领域的最终分数"""
+        selector = self.selector
+        bonus_row, penalized = selector._score_adjusters(self.user_profile, self.history_domains)
+        key = (self.user_profile, tuple(sorted(penalized.items())))
+        if key != self._adjusters_key:
+            self._adjusters_key = key
+            self._adjusters = (bonus_row, penalized)
+            scores = self._scores
+            self._keys = [
+                -selector._adjust_score(index, scores[index], bonus_row, penalized)
+                for index in range(len(scores))
+            ]
+        return self._adjusters
+    
+    def _check_selector(self):
+        """选择器重新加载过（评分表被替换）时整体重建"""
+        if self.selector.domain_names is not self._domain_names:
+            self._rebuild()
+    
+    def _masks(self) -> Tuple[int, int, int]:
+        """当前的 (完全匹配, 相关匹配, 对立匹配) 位掩码，与_query_masks一致"""
+        user_mask = self._user_mask
+        return user_mask, self._related_any & ~user_mask, self._opposite_any & ~user_mask
+    
+    def _column_points(self, col: int, masks: Tuple[int, int, int]) -> int:
+        """领域中一个标签列的得分（与_masked_total的逐列规则一致）"""
+        user_mask, related_mask, opposite_mask = masks
+        exact, related, opposite = self.selector._match_points
+        if user_mask >> col & 1:
+            return exact
+        points = 0
+        if related_mask >> col & 1:
+            points += related
+        if opposite_mask >> col & 1:
+            points += opposite
+        return points
+    
+    def _apply_tags(self, added: List[str], removed: List[str]):
+        """
+        更新标签引用计数；用户标签集合有变化时，只对状态变化的标签列所在的领域重新评分：
+        每个变化列的分值差累加到含该列的领域总分上
+        
+        Args:
+            added / removed: 新增/移除的标签（可重复，每次出现计数一次）
+        """
+        selector = self.selector
+        related_by, opposite_by, column_domains = selector._incremental_tables()
+        old_masks = self._masks()
+        counts = self._tag_counts
+        changed: Set[int] = set()
+        # 相关匹配详情中的related_to取决于命中了哪个相关标签，即使该列仍为相关匹配也须重新生成
+        related_touched: Set[int] = set()
+        entered = []
+        for tag in removed:
+            counts[tag] -= 1
+            if not counts[tag]:
+                del counts[tag]
+                entered.append((selector.tag_index[tag], -1))
+        for tag in added:
+            if tag in counts:
+                counts[tag] += 1
+            else:
+                counts[tag] = 1
+                entered.append((selector.tag_index[tag], 1))
+        
+        for col, sign in entered:
+            self._user_mask ^= 1 << col
+            changed.add(col)
+            related_touched.update(related_by[col])
+            for target, tag_counts, attr in ((related_by, self._related_counts, "_related_any"),
+                                             (opposite_by, self._opposite_counts, "_opposite_any")):
+                for dependent in target[col]:
+                    before = tag_counts[dependent]
+                    tag_counts[dependent] = before + sign
+                    if not before or not tag_counts[dependent]:
+                        # 该列的相关/对立命中状态翻转
+                        setattr(self, attr, getattr(self, attr) ^ 1 << dependent)
+                        changed.add(dependent)
+        
+        affected: Set[int] = set()
+        masks = self._masks()
+        totals = self._totals
+        for col in changed:
+            domains = column_domains[col]
+            affected.update(domains)
+            if self._additive:
+                delta = self._column_points(col, masks) - self._column_points(col, old_masks)
+                if delta:
+                    for index in domains:
+                        totals[index] += delta
+        norms = selector.domain_norms
+        scores = self._scores
+        keys = self._keys
+        bonus_row, penalized = self._adjusters
+        for index in affected:
+            if self._additive:
+                norm = norms[index]
+                score = totals[index] / norm if norm > 0 else 0.0
+            else:
+                score = selector._domain_row_score(index, masks)
+            scores[index] = score
+            keys[index] = -selector._adjust_score(index, score, bonus_row, penalized)
+        # 详情只为少数领域生成过，按已缓存的领域失效
+        for index in affected.intersection(self._details):
+            del self._details[index]
+        for col in related_touched - changed:
+            for index in self._details.keys() & set(column_domains[col]):
+                del self._details[index]
+        self.last_delta = {"tags_changed": len(entered), "domains_rescored": len(affected)}
+    
+    # -- 修改 -----------------------------------------------------------------
+    
+    def add_morphism(self, morphism: Dict[str, str]) -> int:
+        """追加一个Morphism，返回其位置"""
+        self._check_selector()
+        tags = self.selector._dynamics_tags(morphism.get("dynamics", ""))
+        self.morphisms.append(dict(morphism))
+        self._morphism_tags.append(tags)
+        self._apply_tags(list(tags), ())
+        return len(self.morphisms) - 1
+    
+    def remove_morphism(self, index: int) -> Dict[str, str]:
+        """移除指定位置的Morphism（其后的位置前移），返回被移除的Morphism"""
+        self._check_selector()
+        morphism = self.morphisms.pop(index)
+        tags = self._morphism_tags.pop(index)
+        self._apply_tags((), list(tags))
+        return morphism
+    
+    def edit_morphism(self, index: int, **fields: str) -> Dict[str, str]:
+        """
+        修改指定位置的Morphism字段（如 dynamics=...），只有dynamics变化时重新提取标签
+        
+        Returns:
+            修改后的Morphism
+        """
+        self._check_selector()
+        morphism = self.morphisms[index]
+        old_dynamics = morphism.get("dynamics", "")
+        morphism.update(fields)
+        if morphism.get("dynamics", "") == old_dynamics:
+            self.last_delta = {"tags_changed": 0, "domains_rescored": 0}
+            return morphism
+        old_tags = self._morphism_tags[index]
+        new_tags = self.selector._dynamics_tags(morphism.get("dynamics", ""))
+        self._morphism_tags[index] = new_tags
+        old_set, new_set = set(old_tags), set(new_tags)
+        self._apply_tags(list(new_set - old_set), list(old_set - new_set))
+        return morphism
+    
+    def add_object(self, obj: str):
+        """追加一个Object（只影响复杂度判定）"""
+        self.objects.append(obj)
+    
+    def remove_object(self, obj: str):
+        """移除一个Object"""
+        self.objects.remove(obj)
+    
+    def exclude_domain(self, domain: str):
+        """排除领域"""
+        self.exclude_domains.add(domain)
+    
+    def include_domain(self, domain: str):
+        """取消排除领域"""
+        self.exclude_domains.discard(domain)
+    
+    def set_user_profile(self, user_profile: Optional[str]):
+        """切换用户画像（画像加权在出结果时应用，无需重新评分）"""
+        self.user_profile = user_profile
+    
+    def set_history(self, history_domains: Optional[HistoryLike]):
+        """替换历史（熵值衰减在出结果时应用）"""
+        self.history_domains = history_domains
+    
+    # -- 结果 -----------------------------------------------------------------
+    
+    @property
+    def user_tags(self) -> List[str]:
+        """当前用户标签（按标签定义顺序，与extract_user_tags一致）"""
+        self._check_selector()
+        return sorted(self._tag_counts, key=self.selector.tag_index.__getitem__)
+    
+    def _result(self, index: int, score: float, masks: Tuple[int, int, int]) -> Dict[str, Any]:
+        """领域结果条目，匹配详情与推理说明按需生成并缓存"""
+        details = self._details.get(index)
+        if details is None:
+            item = self.selector._domain_result(index, score, masks, list(self._tag_counts))
+            self._details[index] = (item["best_matches"], item["reasoning"])
+            item["best_matches"] = [dict(m) for m in item["best_matches"]]
+            return item
+        matches, reasoning = details
+        return {
+            "domain": self._domain_names[index],
+            "score": score,
+            "best_matches": [dict(m) for m in matches],
+            "reasoning": reasoning,
+        }
+    
+    def _top_k(self, top_k: int) -> List[Tuple[int, float]]:
+        """与对全部未排除领域 heapq.nlargest(top_k, ...) 相同的选择（同分时列号小者优先）"""
+        if top_k <= 0:
+            return []
+        keys = self._keys
+        names = self._domain_names
+        excluded = self.exclude_domains
+        # 多取已排除领域的个数，过滤后仍有top_k个
+        best = heapq.nsmallest(top_k + len(excluded), range(len(keys)), key=keys.__getitem__)
+        return [(index, -keys[index]) for index in best if names[index] not in excluded][:top_k]
+    
+    def result(self, top_k: int = 5, lean: bool = False) -> Dict[str, Any]:
+        """
+        当前状态下的选择结果（同select_domains的返回格式）
+        
+        Args:
+            top_k: 返回的推荐领域数量
+            lean: 精简模式，只为Top k构建详情且不返回all_domains
+        """
+        self._check_selector()
+        self._refresh_adjusters()
+        masks = self._masks()
+        result: Dict[str, Any] = {}
+        if lean:
+            result["top_domains"] = [self._result(i, score, masks) for i, score in self._top_k(top_k)]
+        else:
+            names = self._domain_names
+            keys = self._keys
+            domain_scores = [
+                self._result(i, -keys[i], masks)
+                for i in range(len(names)) if names[i] not in self.exclude_domains
+            ]
+            domain_scores.sort(key=lambda x: x["score"], reverse=True)
+            result["all_domains"] = domain_scores
+            result["top_domains"] = domain_scores[:top_k]
+        result["user_tags"] = self.user_tags
+        result["complexity_level"] = self.selector._determine_complexity(self.objects, self.morphisms)
+        return result
+
+
+# ---------------------------------------------------------------------------
+# 批量模式：流式读取JSONL，多进程评分，保序写出
+# ---------------------------------------------------------------------------
+
+_WORKER_SELECTOR: Optional[DomainSelector] = None
+
+def _init_batch_worker(tags_file: Optional[str], profile: bool = False):
+    """工作进程初始化：每个进程持有一个预热的DomainSelector"""
+    global _WORKER_SELECTOR
+    _WORKER_SELECTOR = DomainSelector(tags_file)
+    _WORKER_SELECTOR.enable_profiling(profile)
+
+def _score_batch_chunk(
+    queries: List[Dict[str, Any]],
+    top_k: int = 5,
+    lean: bool = False
+) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    工作进程：对一个分块的（已去重）查询批量评分，返回 (结果, 本分块的分阶段统计)
+    
+    整块评分失败时逐条重试，失败的查询结果为 {"error": ...}，不影响同块其他查询
+    """
+    _WORKER_SELECTOR.reset_stats()
+    try:
+        results = _WORKER_SELECTOR.select_domains_batch(queries, top_k=top_k, lean=lean)
+    except Exception:
+        results = []
+        for query in queries:
+            try:
+                results.extend(_WORKER_SELECTOR.select_domains_batch([query], top_k=top_k, lean=lean))
+            except Exception as e:  # 单条查询的异常不中断整个批次
+                results.append({"error": f"评分失败: {type(e).__name__}: {e}"})
+    return results, _WORKER_SELECTOR.stats()
+
+def _check_string_list(field: str, value: Any):
+    """校验字段为字符串列表（或缺省）"""
+    if value is not None and not (isinstance(value, list) and all(isinstance(v, str) for v in value)):
+        raise ValueError(f"{field} 必须是字符串列表")
+
+def _record_to_query(record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    将JSONL记录 {objects, morphisms, user_profile, history} 转为select_domains参数
+    
+    Raises:
+        ValueError: 字段类型不符（morphisms须为对象列表，objects/exclude_domains/history须为字符串列表）
+    """
+    query = {
+        "objects": record.get("objects"),
+        "morphisms": record.get("morphisms"),
+        "user_profile": record.get("user_profile"),
+        "exclude_domains": record.get("exclude_domains"),
+        "history_domains": record.get("history", record.get("history_domains")),
+    }
+    morphisms = query["morphisms"]
+    if morphisms is not None and not (isinstance(morphisms, list) and all(isinstance(m, dict) for m in morphisms)):
+        raise ValueError("morphisms 必须是对象列表")
+    if any(not isinstance(m.get("dynamics", ""), str) for m in morphisms or []):
+        raise ValueError("morphism 的 dynamics 必须是字符串")
+    for field in ("objects", "exclude_domains", "history_domains"):
+        _check_string_list(field, query[field])
+    if query["user_profile"] is not None and not isinstance(query["user_profile"], str):
+        raise ValueError("user_profile 必须是字符串")
+    return query
+
+def _query_key(query: Dict[str, Any]) -> str:
+    """
+    查询的规范化键，用于分块内去重
+    
+    Morphism按集合比较（顺序无关）；Objects只影响复杂度判定，故只取数量
+    """
+    morphisms = query.get("morphisms") or []
+    return json.dumps({
+        "objects": len(query.get("objects") or []),
+        "morphisms": sorted(json.dumps(m, sort_keys=True, ensure_ascii=False) for m in morphisms),
+        "user_profile": query.get("user_profile"),
+        "exclude_domains": sorted(query.get("exclude_domains") or []),
+        "history_domains": query.get("history_domains") or [],
+    }, sort_keys=True, ensure_ascii=False)
+
+def _read_chunks(input_path: str, chunk_size: int) -> Iterator[List[Tuple[Optional[Dict], Optional[str]]]]:
+    """流式读取JSONL，按chunk_size产出 (查询, 错误信息) 分块"""
+    chunk = []
+    with open(input_path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError("记录必须是JSON对象")
+                chunk.append((_record_to_query(record), None))
+            except ValueError as e:
+                chunk.append((None, f"第{line_no}行解析失败: {e}"))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+def _dedupe_chunk(chunk: List[Tuple[Optional[Dict], Optional[str]]]) -> Tuple[List[Dict], List[Optional[int]]]:
+    """
+    分块内去重
+    
+    Returns:
+        (唯一查询列表, 每条记录对应的唯一查询下标；解析失败的记录为None)
+    """
+    unique: List[Dict] = []
+    positions: Dict[str, int] = {}
+    slots: List[Optional[int]] = []
+    for query, error in chunk:
+        if error is not None:
+            slots.append(None)
+            continue
+        key = _query_key(query)
+        if key not in positions:
+            positions[key] = len(unique)
+            unique.append(query)
+        slots.append(positions[key])
+    return unique, slots
+
+def run_batch(
+    input_path: str,
+    output_path: str,
+    tags_file: Optional[str] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = 256,
+    top_k: int = 5,
+    lean: bool = False,
+    profile: bool = False
+) -> Dict[str, Any]:
+    """
+    批量模式：流式处理JSONL记录并保序输出
+    
+    内存占用与输入大小无关：同时在途的分块数不超过 workers * 2。
+    
+    Args:
+        input_path: 输入JSONL，每行 {objects, morphisms, user_profile, history}
+        output_path: 输出JSONL，每行一个select_domains结果（或 {"error": ...}）
+        tags_file: morphism_tags.json路径
+        workers: 工作进程数，默认CPU核数
+        chunk_size: 每个分块的记录数
+        top_k: 每条记录返回的推荐领域数量
+        lean: 精简模式（只输出Top k详情，不含all_domains）
+        profile: 汇总各工作进程的分阶段统计
+    
+    Returns:
+        统计信息 {records, unique, errors, seconds, records_per_second[, profile]}
+    """
+    from multiprocessing import Pool
+    
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 2
+    stats = {"records": 0, "unique": 0, "errors": 0}
+    profiler = StageProfiler() if profile else None
+    start = time.monotonic()
+    
+    def write_chunk(out, chunk, slots, scored):
+        results, chunk_stats = scored
+        if profiler and chunk_stats:
+            profiler.merge(chunk_stats)
+        for (_, error), slot in zip(chunk, slots):
+            if slot is None:
+                out.write(json.dumps({"error": error}, ensure_ascii=False) + "\n")
+            else:
+                if "error" in results[slot]:
+                    stats["errors"] += 1
+                out.write(json.dumps(results[slot], ensure_ascii=False) + "\n")
+    
+    with Pool(workers, initializer=_init_batch_worker, initargs=(tags_file, profile)) as pool, \
+            open(output_path, 'w', encoding='utf-8') as out:
+        in_flight = deque()
+        for chunk in _read_chunks(input_path, chunk_size):
+            unique, slots = _dedupe_chunk(chunk)
+            stats["records"] += len(chunk)
+            stats["unique"] += len(unique)
+            stats["errors"] += slots.count(None)
+            in_flight.append((chunk, slots, pool.apply_async(_score_batch_chunk, (unique, top_k, lean))))
+            # 背压：在途分块过多时先按顺序写出最早的分块
+            while len(in_flight) >= max_in_flight:
+                chunk, slots, pending = in_flight.popleft()
+                write_chunk(out, chunk, slots, pending.get())
+        while in_flight:
+            chunk, slots, pending = in_flight.popleft()
+            write_chunk(out, chunk, slots, pending.get())
+    
+    stats["seconds"] = time.monotonic() - start
+    stats["records_per_second"] = stats["records"] / stats["seconds"] if stats["seconds"] > 0 else 0.0
+    if profiler:
+        stats["profile"] = profiler.snapshot()
+    return stats
+
+
 def main():
     """主函数"""
+    import argparse
     import sys
     
-    selector = DomainSelector()
+    parser = argparse.ArgumentParser(description="Domain Selector v3.0 - 智能领域选择器", add_help=True)
+    parser.add_argument("--interactive", action="store_true", help="启动交互模式")
+    parser.add_argument("--batch", metavar="IN_JSONL", help="批量模式输入文件")
+    parser.add_argument("--out", metavar="OUT_JSONL", help="批量模式输出文件")
+    parser.add_argument("--workers", type=int, default=None, help="批量模式工作进程数（默认CPU核数）")
+    parser.add_argument("--chunk-size", type=int, default=256, help="批量模式每个分块的记录数")
+    parser.add_argument("--top-k", type=int, default=5, help="返回的推荐领域数量")
+    parser.add_argument("--lean", action="store_true", help="精简输出：只生成Top k详情，不含all_domains")
+    parser.add_argument("--serve", action="store_true", help="启动常驻JSON-RPC服务（标签文件变化时热重载）")
+    parser.add_argument("--socket", default=None, help="服务模式的Unix socket路径")
+    parser.add_argument("--stdio", action="store_true", help="服务模式改用stdin/stdout")
+    parser.add_argument("--profile", action="store_true", help="输出分阶段耗时与计数")
+    parser.add_argument("--result-store", metavar="SQLITE", default=None,
+                        help="跨进程结果缓存（服务与交互模式，多个进程可共用同一文件）")
+    args = parser.parse_args()
     
-    if len(sys.argv) > 1 and sys.argv[1] == "--interactive":
+    if args.serve:
+        # 服务模式（--profile时可通过stats方法查询分阶段统计）
+        from selector_server import serve
+        serve(args.socket, stdio=args.stdio, profile=args.profile, result_store=args.result_store)
+    elif args.batch:
+        # 批量模式
+        if not args.out:
+            parser.error("--batch 需要同时指定 --out")
+        stats = run_batch(args.batch, args.out, workers=args.workers, chunk_size=args.chunk_size,
+                          top_k=args.top_k, lean=args.lean, profile=args.profile)
+        print(f"✅ 批量处理完成: {stats['records']} 条记录 "
+              f"(去重后 {stats['unique']} 条, 失败 {stats['errors']} 条)", file=sys.stderr)
+        print(f"   用时 {stats['seconds']:.2f}s, 吞吐 {stats['records_per_second']:.1f} 条/秒", file=sys.stderr)
+        if args.profile:
+            print("\n【分阶段统计（所有工作进程汇总）】", file=sys.stderr)
+            print(format_stats(stats["profile"]), file=sys.stderr)
+    elif args.interactive:
         # 交互模式
+        selector = DomainSelector(result_store=args.result_store)
+        selector.enable_profiling(args.profile)
         selector.interactive_mode()
     else:
         # 显示帮助
@@ -421,6 +2644,13 @@ def main():
         print()
         print("用法:")
         print("  python domain_selector.py --interactive    启动交互模式")
+        print("  python domain_selector.py --batch in.jsonl --out out.jsonl [--workers N] [--chunk-size M]")
+        print("                            [--top-k K] [--lean]")
+        print("                                             批量模式（流式、多进程、保序输出）")
+        print("  python domain_selector.py --serve [--socket PATH | --stdio]")
+        print("                                             常驻JSON-RPC服务（热重载标签文件）")
+        print("  以上模式均可加 --profile 输出分阶段耗时与计数")
+        print("  服务与交互模式可加 --result-store PATH 共用跨进程结果缓存（SQLite）")
         print()
         print("或在Python代码中使用:")
         print("  from domain_selector import DomainSelector")
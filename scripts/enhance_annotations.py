@@ -4,12 +4,18 @@ Enhanced Morphism Tag Annotator
 增强版Morphism标签标注器
 
 Usage:
-    python enhance_annotations.py
+    python enhance_annotations.py [--dry-run] [--workers N] [--db PATH] [--domain NAME ...]
 """
 
 import json
 import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Dict, List, Tuple
+
+from domain_selector import IndicatorMatcher
+from tags_db import TagsDatabase, default_db_path
 
 # 扩展的关键词映射（包含更多同义词和相关词）
 TAG_KEYWORDS = {
@@ -111,19 +117,57 @@ def calculate_tag_score(dynamics, tag_config):
     
     return score * tag_config["weight"]
 
+class KeywordScorer:
+    """
+    加权多模式关键词打分器
+    
+    把关键词表编译为一个Aho-Corasick自动机与 关键词 -> [(标签列, 分值)] 的表，
+    一次扫描即可得到所有标签的分数（与逐标签calculate_tag_score结果一致）
+    """
+    
+    def __init__(self, tag_keywords: Dict[str, Dict]):
+        """
+        Args:
+            tag_keywords: 形如TAG_KEYWORDS的关键词表
+        """
+        self.tags: List[str] = list(tag_keywords.keys())
+        self.weights: List[float] = [tag_keywords[t]["weight"] for t in self.tags]
+        # 同一关键词在列表中重复出现时分值累加，与原逐项循环一致
+        self.points: Dict[str, List[Tuple[int, int]]] = {}
+        for col, tag in enumerate(self.tags):
+            config = tag_keywords[tag]
+            for level, value in (("primary", 2), ("secondary", 1)):
+                for kw in config[level]:
+                    self.points.setdefault(kw, []).append((col, value))
+        self.matcher = IndicatorMatcher.from_keywords(
+            {kw: [kw] for kw in self.points}, lowercase=False
+        )
+    
+    def scores(self, text: str) -> List[float]:
+        """一次扫描计算所有标签分数（按self.tags顺序）"""
+        raw = [0] * len(self.tags)
+        for kw in self.matcher.match_indicators(text):
+            for col, value in self.points[kw]:
+                raw[col] += value
+        for kw in self.matcher.always_tags:
+            for col, value in self.points[kw]:
+                raw[col] += value
+        return [r * w for r, w in zip(raw, self.weights)]
+
+_SCORER = KeywordScorer(TAG_KEYWORDS)
+
 def extract_tags_enhanced(dynamics, name=""):
     """增强版标签提取"""
     scores = {}
     
-    # 从动态描述中提取
-    for tag, config in TAG_KEYWORDS.items():
-        score = calculate_tag_score(dynamics, config)
+    # 从动态描述中提取（一次扫描得到全部标签分数）
+    for tag, score in zip(_SCORER.tags, _SCORER.scores(dynamics)):
         if score > 0:
             scores[tag] = score
     
     # 从Morphism名称中提取（权重较低）
-    for tag, config in TAG_KEYWORDS.items():
-        score = calculate_tag_score(name, config) * 0.5
+    for tag, score in zip(_SCORER.tags, _SCORER.scores(name)):
+        score = score * 0.5
         if score > 0:
             scores[tag] = scores.get(tag, 0) + score
     
@@ -131,19 +175,20 @@ def extract_tags_enhanced(dynamics, name=""):
     sorted_tags = sorted(scores.items(), key=lambda x: x[1], reverse=True)
     return [tag for tag, score in sorted_tags[:3] if score >= 2]
 
-def enhance_database():
-    """增强数据库标注"""
-    db_path = Path(__file__).parent.parent / "data" / "morphism_tags.json"
-    
-    with open(db_path, 'r', encoding='utf-8') as f:
-        db = json.load(f)
-    
+def _annotate_chunk(items):
+    """工作进程：为一批 (dynamics, name) 提取标签"""
+    return [extract_tags_enhanced(dynamics, name) for dynamics, name in items]
+
+def _enhance(db, workers, dry_run, chunk_size, domains):
+    """完成标注（写回时须在写锁内调用）；返回 (改进数, 已标注数, 总数)"""
     # 统计信息
     total = 0
     annotated = 0
     improved = 0
     
-    for domain_name, domain_data in db['domains'].items():
+    # 收集需要自动标注的Morphism
+    pending = []
+    for domain_name, domain_data in db.iter_domains(domains):
         for morphism in domain_data.get('morphisms', []):
             total += 1
             
@@ -151,28 +196,81 @@ def enhance_database():
             if morphism.get('tags') and morphism.get('annotation_method') == 'manual':
                 annotated += 1
                 continue
-            
-            # 提取新标签
-            dynamics = morphism.get('dynamics', '')
-            name = morphism.get('name', '')
-            new_tags = extract_tags_enhanced(dynamics, name)
-            
-            if new_tags:
-                old_tags = morphism.get('tags', [])
-                if set(new_tags) != set(old_tags):
-                    improved += 1
-                morphism['tags'] = new_tags
-                morphism['annotation_method'] = 'auto'
-                annotated += 1
+            pending.append((domain_name, morphism))
+    
+    # 提取新标签
+    items = [(m.get('dynamics', ''), m.get('name', '')) for _, m in pending]
+    if workers > 1 and len(items) > chunk_size:
+        chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = [tags for chunk in pool.map(_annotate_chunk, chunks) for tags in chunk]
+    else:
+        results = _annotate_chunk(items)
+    
+    for (domain_name, morphism), new_tags in zip(pending, results):
+        if new_tags:
+            old_tags = morphism.get('tags', [])
+            if set(new_tags) != set(old_tags):
+                improved += 1
+                if dry_run:
+                    print(json.dumps({
+                        "domain": domain_name,
+                        "morphism": morphism.get('name', ''),
+                        "old": old_tags,
+                        "new": new_tags
+                    }, ensure_ascii=False))
+            # 只为实际变化的Morphism追加日志记录
+            if not dry_run and (new_tags != old_tags or morphism.get('annotation_method') != 'auto'):
+                db.set_morphism_tags(domain_name, morphism.get('name', ''), new_tags, 'auto')
+            annotated += 1
+    
+    if not dry_run:
+        db.commit()
+    return improved, annotated, total
+
+def enhance_database(db_path=None, workers=1, dry_run=False, chunk_size=512, domains=None):
+    """
+    增强数据库标注
+    
+    Args:
+        db_path: morphism_tags.json路径或分片目录，默认 data/ 下的数据库（分片目录优先）
+        workers: 并行进程数；大于1时用进程池标注（适合大型导入语料）
+        dry_run: 只输出标签集合发生变化的条目（JSON行），不写回数据库
+        chunk_size: 进程池模式下每个任务的Morphism数量
+        domains: 只处理这些领域（分片布局下只加载对应分片），默认全部
+    """
+    if db_path is None:
+        db_path = default_db_path(Path(__file__).parent.parent / "data")
+    
+    db = TagsDatabase(db_path)
+    if dry_run:
+        # 预览不写回：走普通的共享读取路径，不与并发写入者互相阻塞
+        improved, annotated, total = _enhance(db, workers, dry_run, chunk_size, domains)
+    else:
+        # 整个读取-标注-追加过程持有写锁，避免与并发写入互相覆盖
+        with db.lock():
+            improved, annotated, total = _enhance(db, workers, dry_run, chunk_size, domains)
     
-    # 保存
-    with open(db_path, 'w', encoding='utf-8') as f:
-        json.dump(db, f, ensure_ascii=False, indent=2)
+    if dry_run:
+        print(f"(dry-run) {improved} 个Morphism的标签集合将改变，数据库未修改", file=sys.stderr)
+        return
     
     print(f"✅ 增强完成!")
     print(f"   总Morphism: {total}")
     print(f"   已标注: {annotated} ({annotated/total*100:.1f}%)")
     print(f"   改进数量: {improved}")
 
+def main():
+    """主函数"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Enhanced Morphism Tag Annotator")
+    parser.add_argument("--dry-run", action="store_true", help="只输出标签集合变化的diff，不写回数据库")
+    parser.add_argument("--workers", type=int, default=1, help="并行进程数（大型语料建议设为CPU核数）")
+    parser.add_argument("--db", default=None, help="morphism_tags.json路径或分片目录")
+    parser.add_argument("--domain", action="append", default=None, help="只处理指定领域（可重复）")
+    args = parser.parse_args()
+    enhance_database(args.db, workers=args.workers, dry_run=args.dry_run, domains=args.domain)
+
 if __name__ == "__main__":
-    enhance_database()
+    main()
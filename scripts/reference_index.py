@@ -0,0 +1,660 @@
+#!/usr/bin/env python3
+"""
+Reference Index - 领域知识库结构化偏移索引
+一次性扫描 references/ 与 references/custom/ 下的V2领域文件，
+记录每个领域、章节、Object、Morphism、Theorem（含各字段）的字节偏移，
+之后通过mmap切片读取任意单项，无需重新解析整份文件。
+DomainPrefetcher 在领域选择完成后并发预取Top-k领域的映射材料。
+
+Usage:
+    python reference_index.py build
+    python reference_index.py show <domain> [section|object|morphism|theorem] [name] [field]
+    python reference_index.py prefetch <domain> [domain ...]
+"""
+
+import asyncio
+import json
+import mmap
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Tuple, Any, Optional, Iterator, AsyncIterator, Union
+
+INDEX_VERSION = 1
+
+REFERENCES_DIR = Path(__file__).parent.parent / "references"
+INDEX_PATH = REFERENCES_DIR / ".reference_index.json"
+
+# 章节标题：去掉 "(14个)" 等计数后缀
+SECTION_RE = re.compile(r'^## (.+?)(?:\s*\([^)]*\))?\s*$')
+HEADER_RE = re.compile(r'^# (\w+):\s*')
+THEOREM_RE = re.compile(r'^### (\d+)\.\s*(.+?)\s*$')
+THEOREM_FIELD_RE = re.compile(r'^\*\*([^*]+)\*{1,2}:\s*')
+ENTRY_RE = re.compile(r'^- \*\*(.+?)\*\*:\s*')
+ENTRY_FIELD_RE = re.compile(r'^\s+- \*([^*]+)\*:\s*')
+
+# 章节名 -> 条目类型
+ENTRY_SECTIONS = {"Core Objects": "objects", "Core Morphisms": "morphisms"}
+THEOREM_SECTION = "Theorems / Patterns"
+KINDS = ("objects", "morphisms", "theorems")
+
+Span = Tuple[int, int]
+
+
+class StaleIndexError(RuntimeError):
+    """领域文件在取得字节偏移后被修改，偏移已失效"""
+
+
+def domain_name_for(path: Path) -> str:
+    """文件名 -> 领域名，如 game_theory_v2.md -> game_theory"""
+    stem = path.stem
+    return stem[:-3] if stem.endswith("_v2") else stem
+
+
+def iter_reference_files(references_dir: Path = REFERENCES_DIR) -> Iterator[Path]:
+    """遍历内置与自定义领域文件（跳过模板与v1备份）"""
+    for directory in (references_dir, references_dir / "custom"):
+        if not directory.is_dir():
+            continue
+        for path in sorted(directory.glob("*.md")):
+            if path.name.startswith("_"):
+                continue
+            yield path
+
+
+def _trim(data: bytes, start: int, end: int) -> Span:
+    """去掉区间尾部的空白与 '---' 分隔线"""
+    while True:
+        while end > start and data[end - 1:end] in (b" ", b"\t", b"\r", b"\n"):
+            end -= 1
+        if end - start >= 3 and data[end - 3:end] == b"---":
+            end -= 3
+            continue
+        return start, end
+
+
+def _close_field(fields: Dict[str, Span], data: bytes, open_field: Optional[Tuple[str, int]], end: int):
+    """结束当前字段，写入修剪后的区间"""
+    if open_field is not None:
+        name, start = open_field
+        fields.setdefault(name, _trim(data, start, end))
+
+
+def parse_reference(data: bytes) -> Dict[str, Any]:
+    """
+    解析单个领域文件的结构偏移
+
+    Args:
+        data: 文件原始字节
+
+    Returns:
+        {"header", "sections", "objects", "morphisms", "theorems"}，所有位置均为字节偏移
+    """
+    header: Dict[str, Span] = {}
+    sections: Dict[str, Span] = {}
+    items: Dict[str, List[Dict[str, Any]]] = {kind: [] for kind in KINDS}
+
+    section_name: Optional[str] = None
+    section_start = 0
+    item: Optional[Dict[str, Any]] = None
+    open_field: Optional[Tuple[str, int]] = None
+
+    def finish_item(end: int):
+        nonlocal item, open_field
+        if item is not None:
+            _close_field(item["fields"], data, open_field, end)
+            item["span"] = _trim(data, item["span"][0], end)
+        item = None
+        open_field = None
+
+    offset = 0
+    for raw in data.splitlines(keepends=True):
+        line_start = offset
+        offset += len(raw)
+        line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+
+        if line.startswith("## "):
+            finish_item(line_start)
+            if section_name is not None:
+                sections[section_name] = _trim(data, section_start, line_start)
+            match = SECTION_RE.match(line)
+            section_name = match.group(1) if match else line[3:].strip()
+            section_start = line_start
+            continue
+
+        if section_name is None:
+            match = HEADER_RE.match(line)
+            if match:
+                value_start = line_start + len(line[:match.end()].encode("utf-8"))
+                header[match.group(1)] = _trim(data, value_start, offset)
+            continue
+
+        kind = ENTRY_SECTIONS.get(section_name)
+        if kind is not None:
+            match = ENTRY_RE.match(line)
+            if match:
+                finish_item(line_start)
+                value_start = line_start + len(line[:match.end()].encode("utf-8"))
+                item = {"name": match.group(1).strip(), "span": (line_start, offset), "fields": {}}
+                items[kind].append(item)
+                open_field = ("定义", value_start)
+                continue
+            match = ENTRY_FIELD_RE.match(line)
+            if match and item is not None:
+                _close_field(item["fields"], data, open_field, line_start)
+                value_start = line_start + len(line[:match.end()].encode("utf-8"))
+                open_field = (match.group(1).strip(), value_start)
+                continue
+            if line.strip() == "---":
+                finish_item(line_start)
+            continue
+
+        if section_name == THEOREM_SECTION:
+            match = THEOREM_RE.match(line)
+            if match:
+                finish_item(line_start)
+                item = {
+                    "number": int(match.group(1)),
+                    "name": match.group(2),
+                    "span": (line_start, offset),
+                    "fields": {},
+                }
+                items["theorems"].append(item)
+                continue
+            match = THEOREM_FIELD_RE.match(line)
+            if match and item is not None:
+                _close_field(item["fields"], data, open_field, line_start)
+                value_start = line_start + len(line[:match.end()].encode("utf-8"))
+                open_field = (match.group(1).strip(), value_start)
+
+    finish_item(len(data))
+    if section_name is not None:
+        sections[section_name] = _trim(data, section_start, len(data))
+
+    return {"header": header, "sections": sections, **items}
+
+
+def build_index(
+    references_dir: Path = REFERENCES_DIR,
+    previous: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    构建（或增量刷新）索引
+
+    Args:
+        references_dir: references目录
+        previous: 旧索引；mtime与大小未变的文件直接复用其条目
+
+    Returns:
+        索引字典
+    """
+    references_dir = Path(references_dir)
+    old_files = (previous or {}).get("files", {})
+    files: Dict[str, Any] = {}
+    for path in iter_reference_files(references_dir):
+        stat = path.stat()
+        relative = path.relative_to(references_dir).as_posix()
+        domain = domain_name_for(path)
+        old = old_files.get(domain)
+        if (old and old.get("path") == relative and old.get("mtime_ns") == stat.st_mtime_ns
+                and old.get("size") == stat.st_size):
+            files[domain] = old
+            continue
+        entry = parse_reference(path.read_bytes())
+        entry.update(path=relative, mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+        files[domain] = entry
+    return {"version": INDEX_VERSION, "files": files}
+
+
+def save_index(index: Dict[str, Any], index_path: Path = INDEX_PATH):
+    """原子写入索引文件"""
+    index_path = Path(index_path)
+    tmp_path = index_path.with_name(f"{index_path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, index_path)
+
+
+def load_or_build_index(
+    references_dir: Path = REFERENCES_DIR,
+    index_path: Path = INDEX_PATH
+) -> Dict[str, Any]:
+    """读取磁盘索引；缺失、版本不符或有文件变化时增量重建并保存"""
+    previous = None
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+        if previous.get("version") != INDEX_VERSION:
+            previous = None
+    except (OSError, ValueError):
+        previous = None
+
+    index = build_index(references_dir, previous)
+    if index != previous:
+        try:
+            save_index(index, index_path)
+        except OSError:
+            pass
+    return index
+
+
+class ReferenceIndex:
+    """
+    索引读取器：通过mmap切片按需读取单个条目
+
+    entry()（及基于它的header/section/item等）发现领域文件自建索引后被修改时，
+    会先重新解析该文件再返回偏移；read()收到的字节区间若来自修改前的条目则抛出StaleIndexError，
+    而不是静默读出错误的内容。
+
+    用法:
+        with ReferenceIndex() as ref:
+            ref.theorem("game_theory", "纳什均衡", "Mapping_Hint")
+    """
+
+    def __init__(
+        self,
+        references_dir: Path = REFERENCES_DIR,
+        index_path: Path = INDEX_PATH,
+        index: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Args:
+            references_dir: references目录
+            index_path: 索引文件路径
+            index: 已加载的索引（省略时从磁盘读取并按需增量重建）
+        """
+        self.references_dir = Path(references_dir)
+        self.index = index if index is not None else load_or_build_index(self.references_dir, index_path)
+        self._maps: Dict[str, Tuple[Any, mmap.mmap]] = {}
+        self._paths: Dict[str, str] = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """释放所有mmap"""
+        for handle, mapped in self._maps.values():
+            mapped.close()
+            handle.close()
+        self._maps.clear()
+
+    def domains(self) -> List[str]:
+        """已索引的领域列表"""
+        return list(self.index["files"].keys())
+
+    def _entry(self, domain: str) -> Dict[str, Any]:
+        """索引中记录的条目（不检查文件是否被修改）"""
+        try:
+            return self.index["files"][domain]
+        except KeyError:
+            raise KeyError(f"领域 {domain} 不在索引中") from None
+
+    def entry(self, domain: str) -> Dict[str, Any]:
+        """领域的索引条目；文件自建索引后被修改时先重新解析该文件"""
+        if self.is_stale(domain):
+            self._refresh(domain)
+        return self._entry(domain)
+
+    def _path(self, domain: str) -> str:
+        """领域文件的完整路径（缓存，避免每次读取都拼接Path）"""
+        path = self._paths.get(domain)
+        if path is None:
+            path = self._paths[domain] = str(self.references_dir / self._entry(domain)["path"])
+        return path
+
+    def is_stale(self, domain: str) -> bool:
+        """领域文件自建索引后是否被修改"""
+        entry = self._entry(domain)
+        try:
+            stat = os.stat(self._path(domain))
+        except OSError:
+            return True
+        return stat.st_mtime_ns != entry["mtime_ns"] or stat.st_size != entry["size"]
+
+    def _unmap(self, domain: str):
+        """释放领域文件的mmap"""
+        mapped = self._maps.pop(domain, None)
+        if mapped is not None:
+            mapped[1].close()
+            mapped[0].close()
+
+    def _map(self, domain: str) -> Tuple[Any, mmap.mmap, os.stat_result]:
+        """打开并映射领域文件，同时返回该次打开的stat"""
+        handle = open(self._path(domain), 'rb')
+        try:
+            stat = os.fstat(handle.fileno())
+            mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            handle.close()
+            raise
+        return handle, mapped, stat
+
+    def _refresh(self, domain: str):
+        """重新解析被修改的领域文件：索引条目与mmap取自同一次打开，保证偏移与内容一致"""
+        entry = self._entry(domain)
+        self._unmap(domain)
+        handle, mapped, stat = self._map(domain)
+        fresh = parse_reference(mapped[:])
+        fresh.update(path=entry["path"], mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+        self.index["files"][domain] = fresh
+        self._maps[domain] = (handle, mapped)
+
+    def read(self, domain: str, span: Span) -> str:
+        """
+        按字节区间读取文本
+
+        Raises:
+            StaleIndexError: 领域文件在取得该区间后被修改（请重新通过entry()等获取偏移）
+        """
+        if self.is_stale(domain):
+            raise StaleIndexError(f"领域 {domain} 的文件已被修改，字节区间已失效")
+        return self._read(domain, span)
+
+    def _read(self, domain: str, span: Span) -> str:
+        """按字节区间读取；调用方已通过entry()确认偏移是最新的"""
+        mapped = self._maps.get(domain)
+        if mapped is None:
+            handle, data, stat = self._map(domain)
+            entry = self._entry(domain)
+            if stat.st_mtime_ns != entry["mtime_ns"] or stat.st_size != entry["size"]:
+                data.close()
+                handle.close()
+                raise StaleIndexError(f"领域 {domain} 的文件已被修改，字节区间已失效")
+            mapped = self._maps[domain] = (handle, data)
+        start, end = span
+        return mapped[1][start:end].decode("utf-8")
+
+    def header(self, domain: str, field: str) -> str:
+        """读取文件头字段（Domain / Source / Structural_Primitives）"""
+        return self._read(domain, self.entry(domain)["header"][field])
+
+    def section(self, domain: str, name: str) -> str:
+        """读取整个章节（含标题行）"""
+        return self._read(domain, self.entry(domain)["sections"][name])
+
+    def names(self, domain: str, kind: str) -> List[str]:
+        """列出某类条目的名称（kind: objects/morphisms/theorems）"""
+        return [item["name"] for item in self.entry(domain)[kind]]
+
+    def find(self, domain: str, kind: str, key) -> Dict[str, Any]:
+        """按名称（或定理编号）查找条目的索引记录"""
+        for item in self.entry(domain)[kind]:
+            if item["name"] == key or item.get("number") == key:
+                return item
+        raise KeyError(f"{domain} 中不存在 {kind} 条目: {key}")
+
+    def item(self, domain: str, kind: str, key, field: Optional[str] = None) -> str:
+        """读取整个条目，或其中的单个字段"""
+        record = self.find(domain, kind, key)
+        span = record["fields"][field] if field else record["span"]
+        return self._read(domain, span)
+
+    def object(self, domain: str, name: str, field: Optional[str] = None) -> str:
+        """读取Core Object（field: 定义/本质/关联）"""
+        return self.item(domain, "objects", name, field)
+
+    def morphism(self, domain: str, name: str, field: Optional[str] = None) -> str:
+        """读取Core Morphism（field: 定义/涉及/动态）"""
+        return self.item(domain, "morphisms", name, field)
+
+    def theorem(self, domain: str, key, field: Optional[str] = None) -> str:
+        """读取Theorem（key: 名称或编号；field: 内容/Applicable_Structure/Mapping_Hint/Case_Study）"""
+        return self.item(domain, "theorems", key, field)
+
+
+def _material_from_entry(domain: str, entry: Dict[str, Any], buffer) -> Dict[str, Any]:
+    """
+    按索引偏移从文件内容中切出映射阶段所需的条目（Objects / Morphisms / Theorems 的各字段）
+
+    Args:
+        domain: 领域名
+        entry: 领域的索引条目
+        buffer: 文件内容（bytes或mmap）
+
+    Returns:
+        {"domain", "name", "objects", "morphisms", "theorems", "mtime_ns", "size"}，
+        每个条目为 {"name", [number,] 字段名: 文本}
+    """
+    def read(span: Span) -> str:
+        return buffer[span[0]:span[1]].decode("utf-8")
+
+    header = entry["header"]
+    material: Dict[str, Any] = {
+        "domain": domain,
+        "name": read(header["Domain"]) if "Domain" in header else domain,
+        "mtime_ns": entry["mtime_ns"],
+        "size": entry["size"],
+    }
+    for kind in KINDS:
+        items = []
+        for record in entry[kind]:
+            item = {"name": record["name"]}
+            if "number" in record:
+                item["number"] = record["number"]
+            for field, span in record["fields"].items():
+                item[field] = read(span)
+            items.append(item)
+        material[kind] = items
+    return material
+
+
+class DomainPrefetcher:
+    """
+    Top-k领域映射材料的并发预取器
+
+    选择结果一返回即调用 prefetch()，各领域文件在线程池中并发读取与切分，
+    调用方可按完成顺序消费（先加载完的领域先可用）。解析结果存入有界LRU缓存，
+    同一领域的并发请求共享同一个Future；文件被修改后下次访问自动重新加载。
+
+    用法:
+        with DomainPrefetcher() as prefetcher:
+            for domain, material in prefetcher.iter_completed(selector.select_domains(...)):
+                ...
+    """
+
+    def __init__(
+        self,
+        references_dir: Path = REFERENCES_DIR,
+        index_path: Path = INDEX_PATH,
+        max_workers: int = 5,
+        cache_size: int = 32
+    ):
+        """
+        Args:
+            references_dir: references目录
+            index_path: 偏移索引路径
+            max_workers: 线程数（通常等于top_k）
+            cache_size: 缓存的领域数上限
+        """
+        self.references_dir = Path(references_dir)
+        self.index_path = Path(index_path)
+        self.cache_size = cache_size
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="prefetch")
+        self._cache: "OrderedDict[str, Future]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[str, Any]] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """关闭线程池（等待进行中的加载完成）"""
+        self._executor.shutdown(wait=True)
+
+    def _get_index(self) -> Dict[str, Any]:
+        with self._lock:
+            if self._index is None:
+                self._index = load_or_build_index(self.references_dir, self.index_path)
+            return self._index
+
+    def _load(self, domain: str) -> Dict[str, Any]:
+        """工作线程：mmap读取文件并按偏移切出映射材料；文件在建索引后变化时重新解析"""
+        index = self._get_index()
+        entry = index["files"].get(domain)
+        if entry is None:
+            raise KeyError(f"领域 {domain} 不在索引中")
+        with open(self.references_dir / entry["path"], 'rb') as f:
+            stat = os.fstat(f.fileno())
+            if stat.st_mtime_ns != entry["mtime_ns"] or stat.st_size != entry["size"]:
+                data = f.read()
+                entry = dict(parse_reference(data), path=entry["path"],
+                             mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+                with self._lock:
+                    index["files"][domain] = entry
+                return _material_from_entry(domain, entry, data)
+            if stat.st_size == 0:
+                return _material_from_entry(domain, entry, b"")
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return _material_from_entry(domain, entry, mapped)
+
+    def _is_fresh(self, future: Future) -> bool:
+        """已完成的加载结果是否仍与磁盘文件一致"""
+        if not future.done():
+            return True
+        if future.cancelled() or future.exception() is not None:
+            return False
+        material = future.result()
+        entry = self._get_index()["files"].get(material["domain"])
+        try:
+            stat = (self.references_dir / entry["path"]).stat()
+        except (OSError, TypeError):
+            return False
+        return stat.st_mtime_ns == material["mtime_ns"] and stat.st_size == material["size"]
+
+    def submit(self, domain: str) -> Future:
+        """提交（或复用）单个领域的加载任务"""
+        with self._lock:
+            future = self._cache.get(domain)
+            if future is not None:
+                self._cache.move_to_end(domain)
+        if future is not None and self._is_fresh(future):
+            return future
+
+        future = self._executor.submit(self._load, domain)
+        with self._lock:
+            self._cache[domain] = future
+            self._cache.move_to_end(domain)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return future
+
+    @staticmethod
+    def _domains(selection: Union[Dict[str, Any], List[Any]], top_k: Optional[int]) -> List[str]:
+        """从select_domains结果、领域结果列表或领域名列表中取出领域名（保持排名顺序）"""
+        if isinstance(selection, dict):
+            selection = selection.get("top_domains", [])
+        domains = [item["domain"] if isinstance(item, dict) else item for item in selection]
+        return domains[:top_k] if top_k is not None else domains
+
+    def prefetch(
+        self,
+        selection: Union[Dict[str, Any], List[Any]],
+        top_k: Optional[int] = None
+    ) -> "OrderedDict[str, Future]":
+        """
+        为选择结果中的领域发起并发加载
+
+        Args:
+            selection: select_domains的返回值，或领域名列表
+            top_k: 只预取前k个
+
+        Returns:
+            领域名 -> Future（按排名顺序），result() 为映射材料
+        """
+        futures: "OrderedDict[str, Future]" = OrderedDict()
+        for domain in self._domains(selection, top_k):
+            if domain not in futures:
+                futures[domain] = self.submit(domain)
+        return futures
+
+    def get(self, domain: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """阻塞获取单个领域的映射材料"""
+        return self.submit(domain).result(timeout)
+
+    def iter_completed(
+        self,
+        selection: Union[Dict[str, Any], List[Any]],
+        top_k: Optional[int] = None,
+        timeout: Optional[float] = None
+    ) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """按加载完成顺序产出 (领域名, 映射材料)；加载失败时在该项处抛出异常"""
+        futures = self.prefetch(selection, top_k)
+        domains = {future: domain for domain, future in futures.items()}
+        for future in as_completed(domains, timeout):
+            yield domains[future], future.result()
+
+    async def aiter_completed(
+        self,
+        selection: Union[Dict[str, Any], List[Any]],
+        top_k: Optional[int] = None
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """iter_completed的异步版本，供asyncio服务使用"""
+        async def wait(domain: str, future: Future):
+            return domain, await asyncio.wrap_future(future)
+
+        pending = [wait(domain, future) for domain, future in self.prefetch(selection, top_k).items()]
+        for next_done in asyncio.as_completed(pending):
+            yield await next_done
+
+
+def main():
+    """主函数"""
+    import sys
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ("build", "show", "prefetch"):
+        print("用法:")
+        print("  python reference_index.py build")
+        print("  python reference_index.py show <domain> [section|object|morphism|theorem] [name] [field]")
+        print("  python reference_index.py prefetch <domain> [domain ...]")
+        sys.exit(1)
+
+    if sys.argv[1] == "build":
+        index = build_index()
+        save_index(index)
+        total = {kind: sum(len(f[kind]) for f in index["files"].values()) for kind in KINDS}
+        print(f"✅ 已索引 {len(index['files'])} 个领域")
+        print(f"   Objects: {total['objects']}, Morphisms: {total['morphisms']}, Theorems: {total['theorems']}")
+        print(f"   索引路径: {INDEX_PATH}")
+        return
+
+    args = sys.argv[2:]
+    if sys.argv[1] == "prefetch":
+        import time
+
+        start = time.perf_counter()
+        with DomainPrefetcher(max_workers=max(1, len(args))) as prefetcher:
+            for domain, material in prefetcher.iter_completed(args):
+                print(f"✅ {domain} ({material['name']}): Objects {len(material['objects'])}, "
+                      f"Morphisms {len(material['morphisms'])}, Theorems {len(material['theorems'])} "
+                      f"@ {(time.perf_counter() - start) * 1000:.1f} ms")
+        return
+
+    with ReferenceIndex() as ref:
+        if len(args) == 1:
+            entry = ref.entry(args[0])
+            print(f"{args[0]}: {ref.header(args[0], 'Domain')}")
+            print(f"  章节: {', '.join(entry['sections'])}")
+            for kind in KINDS:
+                print(f"  {kind}: {', '.join(ref.names(args[0], kind))}")
+        elif len(args) >= 3 and args[1] == "section":
+            print(ref.section(args[0], args[2]))
+        elif len(args) >= 3:
+            kind = args[1] + "s"
+            key = int(args[2]) if kind == "theorems" and args[2].isdigit() else args[2]
+            print(ref.item(args[0], kind, key, args[3] if len(args) > 3 else None))
+        else:
+            print("参数不足")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+"""
+Report Renderer - 离线HTML报告渲染器
+把 assets/morphism-template.html 编译为「字面片段 + 槽位」的形式（只解析一次），
+再把分析结果（领域选择 + 映射 + 拉回方案）流式渲染为独立的HTML文件。
+
+离线化处理：
+- 移除CDN脚本（Tailwind、html2canvas）、Google Fonts的@import以及依赖html2canvas的PNG下载按钮
+- 模板中用到的Tailwind工具类在编译时生成为内联CSS（内置常用子集），渲染结果不发起任何网络请求
+
+Usage:
+    python report_renderer.py results.jsonl --out reports/ [--workers N] [--chunk-size N]
+    python report_renderer.py --check    # 查看槽位、生成的CSS规则与未识别的类
+
+输入JSONL每行一个分析结果:
+    {"id": "...", "topic": "...", "domain_a": "...", "objects": [...], "morphisms": [...],
+     "identity": "...", "selection": <select_domains结果>,
+     "mapping": {"domain_b", "reason", "theory", "theorem", "theorem_source", "pairs": [[a, b], ...]},
+     "synthesis": [{"title", "core", "impl"}, ...], "slots": {"TOPIC": "..."}}
+"""
+
+import html
+import json
+import os
+import re
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Tuple, Any, Optional, Iterator
+
+TEMPLATE_PATH = Path(__file__).parent.parent / "assets" / "morphism-template.html"
+
+SLOT_RE = re.compile(r'\{\{([A-Z0-9_]+)\}\}')
+CLASS_ATTR_RE = re.compile(r'class="([^"]*)"')
+STYLE_CLOSE_RE = re.compile(r'</style>', re.IGNORECASE)
+REMOTE_REF_RE = re.compile(r'(?:src|href)\s*=\s*["\']https?://|url\(\s*["\']?https?://', re.IGNORECASE)
+
+# 离线化时删除的片段：外部脚本、字体@import、依赖html2canvas的下载按钮与导出脚本
+OFFLINE_STRIP = (
+    re.compile(r'[ \t]*<script[^>]*\bsrc\s*=\s*["\']https?://[^>]*>\s*</script>[ \t]*\n?', re.IGNORECASE),
+    re.compile(r'[ \t]*@import\s+url\([^)]*https?://[^)]*\)\s*;[ \t]*\n?', re.IGNORECASE),
+    re.compile(r'[ \t]*<!--\s*下载按钮\s*-->\s*<div[^>]*>\s*<button[^>]*downloadPNG.*?</button>\s*</div>[ \t]*\n?',
+               re.IGNORECASE | re.DOTALL),
+    re.compile(r'[ \t]*<script>(?:(?!</script>).)*html2canvas.*?</script>[ \t]*\n?', re.IGNORECASE | re.DOTALL),
+)
+
+# 精简版preflight（Tailwind基础样式中模板依赖的部分）
+PREFLIGHT_CSS = (
+    "*,::before,::after{box-sizing:border-box;border:0 solid #e5e7eb}"
+    "html{line-height:1.5;-webkit-text-size-adjust:100%}"
+    "body{margin:0;line-height:inherit}"
+    "h1,h2,h3,h4,h5,h6{font-size:inherit;font-weight:inherit;margin:0}"
+    "p,blockquote,figure{margin:0}"
+    "svg{display:block;vertical-align:middle}"
+    "button{font:inherit;color:inherit;background-color:transparent;cursor:pointer}"
+)
+
+# Tailwind工具类子集：类名 -> 声明
+STATIC_UTILITIES = {
+    "fixed": "position:fixed",
+    "flex": "display:flex",
+    "inline-flex": "display:inline-flex",
+    "grid": "display:grid",
+    "flex-1": "flex:1 1 0%",
+    "items-center": "align-items:center",
+    "items-start": "align-items:flex-start",
+    "justify-between": "justify-content:space-between",
+    "justify-center": "justify-content:center",
+    "grid-cols-2": "grid-template-columns:repeat(2,minmax(0,1fr))",
+    "grid-cols-3": "grid-template-columns:repeat(3,minmax(0,1fr))",
+    "font-bold": "font-weight:700",
+    "font-medium": "font-weight:500",
+    "italic": "font-style:italic",
+    "uppercase": "text-transform:uppercase",
+    "text-left": "text-align:left",
+    "text-center": "text-align:center",
+    "min-h-screen": "min-height:100vh",
+    "max-w-7xl": "max-width:80rem",
+    "mx-auto": "margin-left:auto;margin-right:auto",
+    "ml-auto": "margin-left:auto",
+    "rounded": "border-radius:.25rem",
+    "rounded-lg": "border-radius:.5rem",
+    "rounded-full": "border-radius:9999px",
+    "shadow-lg": "box-shadow:0 10px 15px -3px rgba(0,0,0,.1),0 4px 6px -4px rgba(0,0,0,.1)",
+    "transition-colors": "transition-property:color,background-color,border-color;"
+                         "transition-timing-function:cubic-bezier(.4,0,.2,1);transition-duration:150ms",
+    "z-50": "z-index:50",
+    "bg-white": "background-color:#fff",
+    "text-white": "color:#fff",
+    "text-gray-300": "color:#d1d5db",
+    "text-gray-500": "color:#6b7280",
+    "text-gray-600": "color:#4b5563",
+    "text-xs": "font-size:.75rem;line-height:1rem",
+    "text-sm": "font-size:.875rem;line-height:1.25rem",
+    "text-lg": "font-size:1.125rem;line-height:1.75rem",
+    "text-xl": "font-size:1.25rem;line-height:1.75rem",
+    "text-2xl": "font-size:1.5rem;line-height:2rem",
+    "text-3xl": "font-size:1.875rem;line-height:2.25rem",
+    "text-4xl": "font-size:2.25rem;line-height:2.5rem",
+    "border-l-4": "border-left-width:4px",
+}
+
+# 间距类：前缀 -> CSS属性（数值 × 0.25rem）
+SPACING_PROPERTIES = {
+    "p": ("padding",), "px": ("padding-left", "padding-right"), "py": ("padding-top", "padding-bottom"),
+    "pt": ("padding-top",), "pb": ("padding-bottom",),
+    "m": ("margin",), "mx": ("margin-left", "margin-right"), "my": ("margin-top", "margin-bottom"),
+    "mt": ("margin-top",), "mb": ("margin-bottom",), "ml": ("margin-left",), "mr": ("margin-right",),
+    "gap": ("gap",), "top": ("top",), "right": ("right",), "bottom": ("bottom",), "left": ("left",),
+    "w": ("width",), "h": ("height",),
+}
+ARBITRARY_COLOR_PROPERTIES = {"bg": "background-color", "text": "color", "border-l": "border-left-color"}
+
+SPACING_RE = re.compile(r'^(p|px|py|pt|pb|m|mx|my|mt|mb|ml|mr|gap|top|right|bottom|left|w|h)-(\d+(?:\.5)?)$')
+SPACE_Y_RE = re.compile(r'^space-y-(\d+(?:\.5)?)$')
+OPACITY_RE = re.compile(r'^opacity-(\d+)$')
+ARBITRARY_COLOR_RE = re.compile(r'^(bg|text|border-l)-\[(#[0-9a-fA-F]{3,8})\]$')
+WHITE_ALPHA_RE = re.compile(r'^bg-white/(\d+)$')
+SELECTOR_ESCAPE_RE = re.compile(r'([^a-zA-Z0-9_-])')
+
+
+def _selector(class_name: str) -> str:
+    """类名 -> 转义后的CSS类选择器"""
+    return "." + SELECTOR_ESCAPE_RE.sub(r'\\\1', class_name)
+
+
+def _rem(value: str) -> str:
+    """Tailwind间距刻度 -> rem"""
+    return f"{float(value) * 0.25:g}rem"
+
+
+def utility_rule(class_name: str) -> Optional[str]:
+    """
+    为单个Tailwind工具类生成CSS规则
+
+    Returns:
+        CSS规则文本；不在支持子集内时返回None
+    """
+    variant, _, base = class_name.rpartition(":")
+    if variant not in ("", "hover"):
+        return None
+    selector = _selector(class_name) + (":hover" if variant else "")
+
+    declarations = STATIC_UTILITIES.get(base)
+    if declarations is None:
+        match = SPACING_RE.match(base)
+        if match:
+            declarations = ";".join(f"{prop}:{_rem(match.group(2))}" for prop in SPACING_PROPERTIES[match.group(1)])
+    if declarations is None:
+        match = OPACITY_RE.match(base)
+        if match:
+            declarations = f"opacity:{int(match.group(1)) / 100:g}"
+    if declarations is None:
+        match = ARBITRARY_COLOR_RE.match(base)
+        if match:
+            declarations = f"{ARBITRARY_COLOR_PROPERTIES[match.group(1)]}:{match.group(2)}"
+    if declarations is None:
+        match = WHITE_ALPHA_RE.match(base)
+        if match:
+            declarations = f"background-color:rgba(255,255,255,{int(match.group(1)) / 100:g})"
+    if declarations is None:
+        match = SPACE_Y_RE.match(base)
+        if match:
+            return f"{selector}>:not([hidden])~:not([hidden]){{margin-top:{_rem(match.group(1))}}}"
+    if declarations is None:
+        return None
+    return f"{selector}{{{declarations}}}"
+
+
+@dataclass
+class CompiledTemplate:
+    """
+    编译后的模板：parts[0] + 槽位0 + parts[1] + ... + parts[n]
+
+    slots按出现顺序排列，同一槽位可出现多次
+    """
+    parts: Tuple[str, ...]
+    slots: Tuple[str, ...]
+    css_rules: int = 0
+    unknown_classes: List[str] = field(default_factory=list)
+    remote_refs: int = 0
+
+    def render(self, values: Dict[str, str]) -> str:
+        """
+        填充槽位（调用方负责转义）；缺失的槽位留空
+
+        Args:
+            values: 槽位名 -> 已转义的HTML文本
+        """
+        pieces = [self.parts[0]]
+        for slot, part in zip(self.slots, self.parts[1:]):
+            pieces.append(values.get(slot, ""))
+            pieces.append(part)
+        return "".join(pieces)
+
+
+def compile_template(source: str) -> CompiledTemplate:
+    """
+    解析模板：离线化、内联工具类CSS，并切分为字面片段与槽位
+
+    Args:
+        source: 模板HTML
+
+    Returns:
+        CompiledTemplate
+    """
+    for pattern in OFFLINE_STRIP:
+        source = pattern.sub("", source)
+
+    # 模板<style>中自定义的类（panel、label-pill等）不需要生成
+    defined = set(re.findall(r'\.([a-zA-Z][\w-]*)\s*[{,:]', source))
+    classes: List[str] = []
+    seen = set()
+    for attr in CLASS_ATTR_RE.findall(source):
+        for class_name in attr.split():
+            if class_name not in seen and not SLOT_RE.search(class_name):
+                seen.add(class_name)
+                classes.append(class_name)
+
+    rules = []
+    unknown = []
+    for class_name in classes:
+        rule = utility_rule(class_name)
+        if rule is not None:
+            rules.append(rule)
+        elif class_name not in defined:
+            unknown.append(class_name)
+
+    # preflight在模板样式之前；工具类在其后（与Tailwind CDN把样式追加到head末尾的效果一致），
+    # 如 border-l-4 覆盖 .panel 的边框宽度
+    utilities = "\n".join(rules)
+    style_open = source.find("<style>")
+    if style_open >= 0:
+        insert_at = style_open + len("<style>")
+        source = source[:insert_at] + "\n" + PREFLIGHT_CSS + "\n" + source[insert_at:]
+        close = STYLE_CLOSE_RE.search(source, insert_at)
+        source = source[:close.start()] + utilities + "\n" + source[close.start():]
+    else:
+        source = source.replace("</head>", f"<style>\n{PREFLIGHT_CSS}\n{utilities}\n</style>\n</head>", 1)
+
+    parts = []
+    slots = []
+    last = 0
+    for match in SLOT_RE.finditer(source):
+        parts.append(source[last:match.start()])
+        slots.append(match.group(1))
+        last = match.end()
+    parts.append(source[last:])
+
+    return CompiledTemplate(
+        parts=tuple(parts),
+        slots=tuple(slots),
+        css_rules=len(rules),
+        unknown_classes=unknown,
+        remote_refs=len(REMOTE_REF_RE.findall(source)),
+    )
+
+
+def load_template(template_path: Optional[str] = None) -> CompiledTemplate:
+    """读取并编译模板"""
+    with open(template_path or TEMPLATE_PATH, 'r', encoding='utf-8') as f:
+        return compile_template(f.read())
+
+
+# ---------------------------------------------------------------------------
+# 分析结果 -> 槽位
+# ---------------------------------------------------------------------------
+
+def _text(value: Any) -> str:
+    """任意值 -> 转义后的HTML文本（列表以顿号连接）"""
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        value = "、".join(str(v) for v in value)
+    return html.escape(str(value))
+
+
+def _morphism_text(morphisms: List[Any]) -> str:
+    parts = []
+    for m in morphisms or []:
+        if isinstance(m, dict):
+            parts.append(f"{m.get('from', '')} → {m.get('to', '')}: {m.get('dynamics', '')}")
+        else:
+            parts.append(str(m))
+    return "；".join(parts)
+
+
+def analysis_slots(record: Dict[str, Any]) -> Dict[str, str]:
+    """
+    将一条分析结果映射为模板槽位（已转义）
+
+    Domain B 优先取 mapping.domain_b，否则取领域选择结果的第一名；
+    record["slots"] 中的同名槽位覆盖自动生成的值
+    """
+    selection = record.get("selection") or {}
+    top_domains = selection.get("top_domains") or [{}]
+    top = top_domains[0]
+    mapping = record.get("mapping") or {}
+    synthesis = record.get("synthesis") or []
+    domain_a = record.get("domain_a", "")
+    domain_b = mapping.get("domain_b") or top.get("domain", "")
+
+    values = {
+        "TOPIC": record.get("topic", ""),
+        "DOMAIN_A": domain_a,
+        "DOMAIN_A_NAME": record.get("domain_a_name") or domain_a,
+        "OBJECTS": record.get("objects") or [],
+        "MORPHISMS": _morphism_text(record.get("morphisms") or []),
+        "IDENTITY": record.get("identity", ""),
+        "DOMAIN_B": domain_b,
+        "DOMAIN_B_NAME": mapping.get("domain_b_name") or domain_b,
+        "DOMAIN_B_REASON": mapping.get("reason") or top.get("reasoning", ""),
+        "DOMAIN_B_THEORY": mapping.get("theory", ""),
+        "THEOREM": mapping.get("theorem", ""),
+        "THEOREM_SOURCE": mapping.get("theorem_source", ""),
+    }
+    for i, pair in enumerate((mapping.get("pairs") or [])[:3], 1):
+        a, b = (pair.get("a"), pair.get("b")) if isinstance(pair, dict) else pair
+        values[f"MAP_A{i}"] = a
+        values[f"MAP_B{i}"] = b
+    for i, solution in enumerate(synthesis[:3], 1):
+        values[f"SOLUTION_{i}_TITLE"] = solution.get("title", "")
+        values[f"SOLUTION_{i}_CORE"] = solution.get("core", "")
+        values[f"SOLUTION_{i}_IMPL"] = solution.get("impl", "")
+    values.update(record.get("slots") or {})
+    return {slot: _text(value) for slot, value in values.items()}
+
+
+# ---------------------------------------------------------------------------
+# 流式并行渲染
+# ---------------------------------------------------------------------------
+
+SAFE_NAME_RE = re.compile(r'[^\w.-]+')
+
+_WORKER_TEMPLATE: Optional[CompiledTemplate] = None
+
+
+def report_filename(record: Dict[str, Any], line_no: int) -> str:
+    """报告文件名：优先使用记录id，否则用行号"""
+    name = SAFE_NAME_RE.sub("_", str(record.get("id") or "")).strip("._")
+    return f"{name or f'report_{line_no:06d}'}.html"
+
+
+def _write_atomic(path: Path, content: str):
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def _init_render_worker(template: CompiledTemplate):
+    """工作进程初始化：接收父进程编译好的模板"""
+    global _WORKER_TEMPLATE
+    _WORKER_TEMPLATE = template
+
+
+def _render_chunk(lines: List[Tuple[int, str]], out_dir: str) -> Tuple[int, List[str]]:
+    """工作进程：解析并渲染一个分块，返回 (写出数, 错误信息)"""
+    written = 0
+    errors = []
+    directory = Path(out_dir)
+    for line_no, line in lines:
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("记录必须是JSON对象")
+            page = _WORKER_TEMPLATE.render(analysis_slots(record))
+            _write_atomic(directory / report_filename(record, line_no), page)
+            written += 1
+        except (ValueError, TypeError, AttributeError, OSError) as e:
+            errors.append(f"第{line_no}行渲染失败: {e}")
+    return written, errors
+
+
+def _read_line_chunks(input_path: str, chunk_size: int) -> Iterator[List[Tuple[int, str]]]:
+    """流式读取JSONL原始行（解析在工作进程中进行）"""
+    chunk = []
+    with open(input_path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            chunk.append((line_no, line))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def render_reports(
+    input_path: str,
+    out_dir: str,
+    template_path: Optional[str] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = 64
+) -> Dict[str, Any]:
+    """
+    把JSONL中的分析结果渲染为独立HTML文件
+
+    模板只在父进程编译一次并下发给各工作进程；同时在途的分块数不超过 workers * 2。
+
+    Args:
+        input_path: 输入JSONL
+        out_dir: 输出目录（不存在时创建）
+        template_path: 模板路径，默认assets/morphism-template.html
+        workers: 工作进程数，默认CPU核数；1表示在当前进程渲染
+        chunk_size: 每个分块的记录数
+
+    Returns:
+        统计信息 {written, errors, seconds, reports_per_second}
+    """
+    template = load_template(template_path)
+    os.makedirs(out_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    stats: Dict[str, Any] = {"written": 0, "errors": []}
+    start = time.monotonic()
+
+    def collect(result):
+        written, errors = result
+        stats["written"] += written
+        stats["errors"].extend(errors)
+
+    if workers == 1:
+        _init_render_worker(template)
+        for chunk in _read_line_chunks(input_path, chunk_size):
+            collect(_render_chunk(chunk, out_dir))
+    else:
+        from multiprocessing import Pool
+
+        with Pool(workers, initializer=_init_render_worker, initargs=(template,)) as pool:
+            in_flight = deque()
+            for chunk in _read_line_chunks(input_path, chunk_size):
+                in_flight.append(pool.apply_async(_render_chunk, (chunk, out_dir)))
+                while len(in_flight) >= workers * 2:
+                    collect(in_flight.popleft().get())
+            while in_flight:
+                collect(in_flight.popleft().get())
+
+    stats["seconds"] = time.monotonic() - start
+    stats["reports_per_second"] = stats["written"] / stats["seconds"] if stats["seconds"] > 0 else 0.0
+    return stats
+
+
+def main():
+    """主函数"""
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="离线HTML报告渲染器")
+    parser.add_argument("input", nargs="?", help="分析结果JSONL")
+    parser.add_argument("--out", default="reports", help="输出目录（默认 reports/）")
+    parser.add_argument("--template", default=None, help="模板路径，默认assets/morphism-template.html")
+    parser.add_argument("--workers", type=int, default=None, help="工作进程数，默认CPU核数")
+    parser.add_argument("--chunk-size", type=int, default=64, help="每个分块的记录数")
+    parser.add_argument("--check", action="store_true", help="只编译模板并打印槽位与CSS信息")
+    args = parser.parse_args()
+
+    if args.check:
+        template = load_template(args.template)
+        print(f"槽位({len(set(template.slots))}): {', '.join(dict.fromkeys(template.slots))}")
+        print(f"内联CSS规则: {template.css_rules}")
+        print(f"未识别的类: {', '.join(template.unknown_classes) or '无'}")
+        print(f"剩余外部引用: {template.remote_refs}")
+        return
+    if not args.input:
+        parser.print_help()
+        return
+
+    stats = render_reports(args.input, args.out, args.template, args.workers, args.chunk_size)
+    for error in stats["errors"]:
+        print(f"⚠️ {error}", file=sys.stderr)
+    print(f"✅ 已生成 {stats['written']} 份报告 -> {args.out}")
+    print(f"   失败 {len(stats['errors'])} 条, 用时 {stats['seconds']:.2f}s "
+          f"({stats['reports_per_second']:.0f} 份/秒)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Selector Server - DomainSelector 常驻JSON-RPC服务
+在Unix socket或stdio上提供按行分隔的JSON-RPC 2.0接口，进程内保持一个预热的选择器，
+并监视 morphism_tags.json 及其编辑日志：文件变化时在后台重建选择器后原子替换，不影响正在处理的请求。
+
+Usage:
+    python selector_server.py serve [--socket PATH | --stdio] [--tags-file PATH]
+    python selector_server.py loadgen --socket PATH [--concurrency N] [--requests M]
+
+请求示例（每行一个）:
+    {"jsonrpc": "2.0", "id": 1, "method": "select_domains",
+     "params": {"objects": [...], "morphisms": [...], "lean": true}}
+    {"jsonrpc": "2.0", "id": 2, "method": "select_domains_by_morphisms",
+     "params": {"morphisms": [...], "top_k": 5}}
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Tuple
+
+from domain_selector import DomainSelector, ResultStore
+from tags_db import core_path, journal_path
+
+DEFAULT_SOCKET = "/tmp/morphism-selector.sock"
+
+# JSON-RPC 2.0 错误码
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+
+class RpcError(Exception):
+    """JSON-RPC错误"""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class SelectorService:
+    """
+    持有当前选择器并分发JSON-RPC调用
+
+    每个请求在开始时取一次 self.selector 的引用，热重载只替换该引用，
+    因此进行中的请求始终使用同一个选择器完成。
+    """
+
+    def __init__(
+        self,
+        tags_file: Optional[str] = None,
+        poll_interval: float = 0.5,
+        profile: bool = False,
+        result_store: Optional[str] = None,
+        morphism_db: Optional[str] = None
+    ):
+        """
+        Args:
+            tags_file: morphism_tags.json路径或分片目录，默认assets目录
+            poll_interval: 监视标签文件的轮询间隔（秒）
+            profile: 开启选择器分阶段统计（通过stats方法返回）
+            result_store: 跨进程结果缓存的SQLite路径（多个服务进程可共用），默认不启用
+            morphism_db: Morphism粒度匹配使用的数据库（见DomainSelector），其变化由选择器自行检测
+        """
+        if tags_file is None:
+            tags_file = str(Path(__file__).parent.parent / "assets" / "morphism_tags.json")
+        # 分片布局监视core.json（领域分片不影响选择器）
+        self.tags_file = str(core_path(tags_file))
+        self.poll_interval = poll_interval
+        self.profile = profile
+        # 重载前后的选择器共用同一个结果缓存，标签库版本变化时旧条目自动清除
+        self.result_store = ResultStore(result_store) if result_store else None
+        self.morphism_db = morphism_db
+        self.selector = self._build_selector()
+        self.reloads = 0
+        self.requests = 0
+        self._mtime_ns = self._current_mtime()
+
+    def _build_selector(self) -> DomainSelector:
+        selector = DomainSelector(self.tags_file, result_store=self.result_store, morphism_db=self.morphism_db)
+        selector.enable_profiling(self.profile)
+        return selector
+
+    def _current_mtime(self) -> Optional[Tuple[int, Optional[int]]]:
+        """标签文件与编辑日志的mtime"""
+        try:
+            mtime = os.stat(self.tags_file).st_mtime_ns
+        except OSError:
+            return None
+        try:
+            return mtime, os.stat(journal_path(self.tags_file)).st_mtime_ns
+        except OSError:
+            return mtime, None
+
+    async def watch(self):
+        """轮询标签文件；变化时在线程中重建选择器，成功后原子替换"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            mtime = self._current_mtime()
+            if mtime is None or mtime == self._mtime_ns:
+                continue
+            try:
+                selector = await loop.run_in_executor(None, self._build_selector)
+            except Exception as e:
+                # 文件可能正在写入或结构有误：保留旧选择器，下次轮询重试，不能让监视任务退出
+                print(f"⚠️ 重载失败，继续使用旧选择器: {type(e).__name__}: {e}", file=sys.stderr)
+                continue
+            self.selector = selector
+            self._mtime_ns = mtime
+            self.reloads += 1
+            print(f"🔄 已重载 {self.tags_file}（第{self.reloads}次）", file=sys.stderr)
+
+    def call(self, method: str, params: Any) -> Any:
+        """执行一次RPC调用"""
+        selector = self.selector
+        self.requests += 1
+        if method == "ping":
+            return "pong"
+        if method == "stats":
+            return {"requests": self.requests, "reloads": self.reloads,
+                    "domains": len(selector.domain_tag_mapping), "profile": selector.stats(),
+                    "cache": selector.cache_info()}
+        if not isinstance(params, dict):
+            raise RpcError(INVALID_PARAMS, "params必须是对象")
+        if method == "select_domains":
+            try:
+                return selector.select_domains(
+                    params.get("objects"),
+                    params.get("morphisms"),
+                    user_profile=params.get("user_profile"),
+                    exclude_domains=params.get("exclude_domains"),
+                    history_domains=params.get("history_domains", params.get("history")),
+                    top_k=params.get("top_k", 5),
+                    lean=params.get("lean", False)
+                )
+            except (AttributeError, TypeError) as e:
+                raise RpcError(INVALID_PARAMS, str(e)) from None
+        if method == "select_domains_by_morphisms":
+            try:
+                return selector.select_domains_by_morphisms(
+                    params.get("morphisms"),
+                    top_k=params.get("top_k", 5),
+                    exclude_domains=params.get("exclude_domains")
+                )
+            except (AttributeError, TypeError) as e:
+                raise RpcError(INVALID_PARAMS, str(e)) from None
+        if method == "extract_user_tags":
+            try:
+                return selector.extract_user_tags(params.get("morphisms"))
+            except (AttributeError, TypeError) as e:
+                raise RpcError(INVALID_PARAMS, str(e)) from None
+        raise RpcError(METHOD_NOT_FOUND, f"未知方法: {method}")
+
+    def handle_line(self, line: bytes) -> Optional[bytes]:
+        """处理一行请求，返回响应行（通知返回None）"""
+        request_id = None
+        try:
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                raise RpcError(PARSE_ERROR, f"JSON解析失败: {e}") from None
+            if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+                raise RpcError(INVALID_REQUEST, "无效请求")
+            request_id = request.get("id")
+            result = self.call(request["method"], request.get("params", {}))
+            if "id" not in request:
+                return None
+            response = {"jsonrpc": "2.0", "id": request_id, "result": result}
+        except RpcError as e:
+            response = {"jsonrpc": "2.0", "id": request_id, "error": {"code": e.code, "message": e.message}}
+        except Exception as e:  # 保证单个请求的异常不会中断服务
+            response = {"jsonrpc": "2.0", "id": request_id,
+                        "error": {"code": INTERNAL_ERROR, "message": f"{type(e).__name__}: {e}"}}
+        return (json.dumps(response, ensure_ascii=False) + "\n").encode("utf-8")
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """处理一个socket连接，同一连接上的请求可流水线发送"""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                response = self.handle_line(line)
+                if response is not None:
+                    writer.write(response)
+                    await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve_unix(service: SelectorService, socket_path: str):
+    """在Unix socket上服务"""
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = await asyncio.start_unix_server(service.handle_connection, path=socket_path, limit=2 ** 24)
+    watcher = asyncio.create_task(service.watch())
+    print(f"✅ Domain Selector 服务已启动: {socket_path}", file=sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        watcher.cancel()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+async def serve_stdio(service: SelectorService):
+    """在stdin/stdout上服务（每行一个请求/响应）"""
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=2 ** 24)
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    watcher = asyncio.create_task(service.watch())
+    out = sys.stdout.buffer
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+            response = service.handle_line(line)
+            if response is not None:
+                out.write(response)
+                out.flush()
+    finally:
+        watcher.cancel()
+
+
+def serve(
+    socket_path: Optional[str] = None,
+    stdio: bool = False,
+    tags_file: Optional[str] = None,
+    profile: bool = False,
+    result_store: Optional[str] = None,
+    morphism_db: Optional[str] = None
+):
+    """启动服务（阻塞）"""
+    service = SelectorService(tags_file, profile=profile, result_store=result_store, morphism_db=morphism_db)
+    try:
+        if stdio:
+            asyncio.run(serve_stdio(service))
+        else:
+            asyncio.run(serve_unix(service, socket_path or DEFAULT_SOCKET))
+    except KeyboardInterrupt:
+        pass
+
+
+# ---------------------------------------------------------------------------
+# 本地压测：多连接并发请求，统计p50/p99延迟
+# ---------------------------------------------------------------------------
+
+def _synthetic_params(selector: DomainSelector, count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """用标签指标词拼出合成请求"""
+    import random
+
+    rng = random.Random(seed)
+    indicators = [i for tag in selector.tags.values() for i in tag.indicators]
+    params = []
+    for _ in range(count):
+        morphisms = [
+            {"from": "A", "to": "B", "dynamics": "".join(rng.sample(indicators, 2))}
+            for _ in range(rng.randint(1, 8))
+        ]
+        params.append({"objects": ["A", "B"], "morphisms": morphisms, "lean": True})
+    return params
+
+
+async def _loadgen_worker(socket_path: str, params: List[Dict[str, Any]], latencies: List[float]):
+    """单连接：逐个发送请求并记录往返延迟"""
+    reader, writer = await asyncio.open_unix_connection(socket_path, limit=2 ** 24)
+    try:
+        for i, p in enumerate(params):
+            payload = json.dumps({"jsonrpc": "2.0", "id": i, "method": "select_domains", "params": p},
+                                 ensure_ascii=False) + "\n"
+            start = time.perf_counter()
+            writer.write(payload.encode("utf-8"))
+            await writer.drain()
+            response = json.loads(await reader.readline())
+            latencies.append(time.perf_counter() - start)
+            if "error" in response:
+                raise RuntimeError(response["error"])
+    finally:
+        writer.close()
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """最近秩百分位数"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def loadgen(socket_path: str, concurrency: int = 16, requests: int = 5000, tags_file: Optional[str] = None):
+    """对运行中的服务发起并发请求并打印延迟分布"""
+    params = _synthetic_params(DomainSelector(tags_file), requests)
+    per_worker = [params[i::concurrency] for i in range(concurrency)]
+    latencies: List[float] = []
+
+    async def run():
+        await asyncio.gather(*(_loadgen_worker(socket_path, chunk, latencies) for chunk in per_worker if chunk))
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(f"请求数: {len(latencies)}, 并发连接: {concurrency}, 用时 {elapsed:.2f}s, "
+          f"吞吐 {len(latencies) / elapsed:.1f} 请求/秒")
+    for q in (50, 90, 99):
+        print(f"  p{q}: {percentile(latencies, q) * 1000:.3f} ms")
+    print(f"  max: {latencies[-1] * 1000:.3f} ms")
+
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Domain Selector JSON-RPC 服务")
+    sub = parser.add_subparsers(dest="command")
+    serve_parser = sub.add_parser("serve", help="启动服务")
+    serve_parser.add_argument("--socket", default=DEFAULT_SOCKET, help="Unix socket路径")
+    serve_parser.add_argument("--stdio", action="store_true", help="改用stdin/stdout")
+    serve_parser.add_argument("--tags-file", default=None)
+    serve_parser.add_argument("--profile", action="store_true", help="开启分阶段统计（stats方法返回）")
+    serve_parser.add_argument("--result-store", default=None, help="跨进程结果缓存的SQLite路径")
+    serve_parser.add_argument("--morphism-db", default=None,
+                              help="Morphism粒度匹配使用的数据库（默认为标签文件本身或data目录下的数据库，"
+                                   "都不存在时select_domains_by_morphisms返回错误）")
+    load_parser = sub.add_parser("loadgen", help="本地压测")
+    load_parser.add_argument("--socket", default=DEFAULT_SOCKET)
+    load_parser.add_argument("--concurrency", type=int, default=16)
+    load_parser.add_argument("--requests", type=int, default=5000)
+    load_parser.add_argument("--tags-file", default=None)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.socket, args.stdio, args.tags_file, args.profile, args.result_store, args.morphism_db)
+    elif args.command == "loadgen":
+        loadgen(args.socket, args.concurrency, args.requests, args.tags_file)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
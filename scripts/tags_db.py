@@ -0,0 +1,532 @@
+#!/usr/bin/env python3
+"""
+Tags DB - morphism_tags 数据库的单文件/分片两种布局
+
+单文件布局（原有）:
+    morphism_tags.json        tags、tag_relationships、scoring_rules ... 以及 domains[*].morphisms
+
+分片布局:
+    morphism_tags/
+    ├── core.json             除domains外的全部内容 + domain_manifest（领域 -> 分片文件、Morphism数）
+    └── domains/
+        └── <domain>.json     单个领域的数据 {"morphisms": [...]}
+
+DomainSelector只读取core.json；领域分片在首次访问时才加载，压缩时只重写被修改的分片和core.json，
+因此启动内存与写入开销只与实际涉及的领域数有关。两种布局通过同一个TagsDatabase接口读写。
+
+编辑日志:
+    <主文件>.journal          写入者在文件锁下追加fsync的编辑记录（每行一个JSON），不重写主文件:
+                                {"op": "put_domain", "domain", "data"}
+                                {"op": "set_morphism_tags", "domain", "morphism", "tags", "annotation_method"}
+    <主文件>.lock             文件锁：写入者独占，读取者共享
+读取者总是重放 主文件 + 日志；compact 把日志原子地合并回主文件。
+
+Usage:
+    python tags_db.py split morphism_tags.json morphism_tags/   # 单文件 -> 分片
+    python tags_db.py merge morphism_tags/ morphism_tags.json   # 分片 -> 单文件
+    python tags_db.py info  <单文件或分片目录>
+    python tags_db.py compact <单文件或分片目录>                # 日志合并回主文件
+"""
+
+import hashlib
+import json
+import os
+import re
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Any, Iterator, Optional, Tuple, Union
+
+CORE_NAME = "core.json"
+SHARD_DIR = "domains"
+MANIFEST_KEY = "domain_manifest"
+JOURNAL_SUFFIX = ".journal"
+LOCK_SUFFIX = ".lock"
+
+try:
+    import fcntl
+except ImportError:  # 非POSIX平台：不加文件锁
+    fcntl = None
+
+# 可直接用作文件名的领域名
+SAFE_NAME_RE = re.compile(r'^[\w\-]+$')
+
+PathLike = Union[str, Path]
+
+
+def write_json_atomic(path: PathLike, data: Any, indent: Optional[int] = 2):
+    """原子写入JSON（临时文件 + rename），中途失败不会留下半个文件"""
+    path = Path(path)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=indent)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+def is_sharded(path: PathLike) -> bool:
+    """路径是否指向分片布局（目录或其中的core.json）"""
+    path = Path(path)
+    return path.is_dir() or path.name == CORE_NAME
+
+
+def core_path(path: PathLike) -> Path:
+    """标签库中选择器需要读取的文件：分片布局为core.json，单文件布局为文件本身"""
+    path = Path(path)
+    return path / CORE_NAME if path.is_dir() else path
+
+
+def journal_path(path: PathLike) -> Path:
+    """主文件旁的编辑日志路径"""
+    core = core_path(path)
+    return core.with_name(core.name + JOURNAL_SUFFIX)
+
+
+def source_digest(path: PathLike) -> str:
+    """主文件 + 日志中完整记录的sha256（标签库版本，无需解析JSON）"""
+    core = core_path(path)
+    with open(core, 'rb') as f:
+        digest = hashlib.sha256(f.read())
+    try:
+        with open(journal_path(core), 'rb') as f:
+            journal = f.read()
+    except FileNotFoundError:
+        journal = b""
+    digest.update(journal[:journal.rfind(b"\n") + 1])
+    return digest.hexdigest()
+
+
+def shard_stamp(path: PathLike) -> Tuple[Tuple[str, int, int], ...]:
+    """
+    分片目录中各分片的 (文件名, mtime, 大小)，用于发现对 domains/<domain>.json 的直接编辑
+
+    单文件布局或尚无分片目录时返回空元组
+    """
+    if not is_sharded(path):
+        return ()
+    stamp = []
+    try:
+        with os.scandir(core_path(path).parent / SHARD_DIR) as entries:
+            for entry in entries:
+                if entry.name.endswith(".json"):
+                    stat = entry.stat()
+                    stamp.append((entry.name, stat.st_mtime_ns, stat.st_size))
+    except FileNotFoundError:
+        return ()
+    return tuple(sorted(stamp))
+
+
+def default_db_path(data_dir: PathLike) -> Path:
+    """data目录下的数据库：存在分片目录时优先使用，否则为单文件"""
+    sharded = Path(data_dir) / "morphism_tags"
+    return sharded if (sharded / CORE_NAME).exists() else Path(data_dir) / "morphism_tags.json"
+
+
+def shard_filename(domain: str) -> str:
+    """领域 -> 分片文件名；含特殊字符的领域名改用哈希，避免路径问题"""
+    if SAFE_NAME_RE.match(domain):
+        return f"{domain}.json"
+    return f"_{hashlib.sha1(domain.encode('utf-8')).hexdigest()[:16]}.json"
+
+
+class TagsDatabase:
+    """
+    标签数据库的统一读写接口
+
+    core为主文件内容（分片布局即core.json）；领域数据通过domain()按需读取。
+    修改经set_domain()/set_morphism_tags()记录，commit()以日志记录追加写入，
+    compact()把日志合并回主文件。读取时总是重放 主文件 + 日志。
+
+    读取-修改-写入应在 with db.lock(): ... db.commit() 中完成，
+    进入锁时会先重放其他进程新追加的记录，从而不会丢失并发修改。
+    """
+
+    def __init__(self, path: PathLike):
+        """
+        Args:
+            path: 单文件JSON路径，或分片目录（及其中的core.json）路径
+        """
+        path = Path(path)
+        self.sharded = is_sharded(path)
+        self.root = path if path.is_dir() else path.parent
+        self.path = core_path(path)
+        self.journal_path = journal_path(self.path)
+        self.lock_path = self.path.with_name(self.path.name + LOCK_SUFFIX)
+        self._lock_depth = 0
+        self._queued: List[Dict[str, Any]] = []
+        with self._flock(shared=True):
+            self._load()
+
+    # ---- 加载与日志重放 ----
+
+    @staticmethod
+    def _stat(path: Path) -> Tuple[int, int, int]:
+        stat = os.stat(path)
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _load(self):
+        """读取主文件并重放全部日志"""
+        with open(self.path, 'rb') as f:
+            raw = f.read()
+            # 对已打开的文件取stat，保证与读到的内容一致
+            stat = os.fstat(f.fileno())
+        self._base_stat = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        self._journal_stat: Optional[Tuple[int, int]] = None
+        self._digest = hashlib.sha256(raw)
+        self.core: Dict[str, Any] = json.loads(raw)
+        if self.sharded:
+            self.core.setdefault(MANIFEST_KEY, {})
+            self._domains: Dict[str, Dict[str, Any]] = {}
+        else:
+            # 单文件布局：领域数据就是主文件中的domains（保持原有键顺序）
+            self._domains = self.core.get("domains", {})
+        # 分片尚未加载的领域上待应用的日志记录
+        self._pending: Dict[str, List[Dict[str, Any]]] = {}
+        self._dirty: set = set()
+        self._journal_end = 0
+        self.journal_records = 0
+        self._replay()
+
+    def _replay(self):
+        """应用日志中尚未读取的记录（末尾写入中断的不完整行忽略）"""
+        try:
+            with open(self.journal_path, 'rb') as f:
+                f.seek(self._journal_end)
+                data = f.read()
+                journal = os.fstat(f.fileno())
+        except FileNotFoundError:
+            return
+        self._journal_stat = (journal.st_mtime_ns, journal.st_size)
+        end = data.rfind(b"\n") + 1
+        if not end:
+            return
+        self._digest.update(data[:end])
+        for line in data[:end].splitlines():
+            if line.strip():
+                self._apply(json.loads(line))
+                self.journal_records += 1
+        self._journal_end += end
+        self._refresh_metadata()
+
+    def _refresh(self):
+        """主文件被压缩替换后整体重新加载（保留未提交的修改），否则只重放新增日志"""
+        if self._stat(self.path) == self._base_stat:
+            self._replay()
+            return
+        queued = self._queued
+        self._load()
+        for record in queued:
+            self._apply(record)
+        self._queued = queued
+
+    def _apply(self, record: Dict[str, Any]):
+        """在内存中应用一条日志记录（所有操作幂等，重复重放结果不变）"""
+        op, domain = record["op"], record["domain"]
+        if op == "put_domain":
+            self._put_domain(domain, record["data"])
+        elif op == "set_morphism_tags":
+            if domain in self._domains:
+                _apply_morphism_tags(self._domains[domain], record)
+            elif self.has_domain(domain):
+                self._pending.setdefault(domain, []).append(record)
+            else:
+                return
+            self._dirty.add(domain)
+        else:
+            raise ValueError(f"未知的日志操作: {op}")
+
+    @contextmanager
+    def _flock(self, shared: bool = False) -> Iterator[None]:
+        """
+        文件锁（可重入）：写入者独占，读取者共享
+
+        读取时锁文件不存在说明从未有写入者，无需加锁；目录不可写时退化为不加锁
+        """
+        if self._lock_depth or fcntl is None:
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+            return
+        try:
+            lock_file = open(self.lock_path, 'r' if shared else 'a')
+        except OSError:
+            lock_file = None
+        if lock_file is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        self._lock_depth += 1
+        try:
+            yield
+        finally:
+            self._lock_depth -= 1
+            if lock_file is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                lock_file.close()
+
+    @contextmanager
+    def lock(self) -> Iterator["TagsDatabase"]:
+        """独占写锁；进入时先追上其他进程的修改"""
+        with self._flock():
+            self._refresh()
+            yield self
+
+    @property
+    def version(self) -> str:
+        """主文件 + 已重放日志的sha256，与source_digest()一致"""
+        return self._digest.hexdigest()
+
+    @property
+    def fingerprint(self) -> Dict[str, Any]:
+        """
+        加载时（共享锁内）记录的源指纹：主文件mtime/大小、日志(mtime, 大小)与version
+
+        与实际读到的内容一一对应，可直接作为编译快照头，无需再次读取源文件
+        """
+        return {
+            "mtime_ns": self._base_stat[1],
+            "size": self._base_stat[2],
+            "journal": self._journal_stat,
+            "sha256": self.version,
+        }
+
+    # ---- 读取 ----
+
+    @property
+    def manifest(self) -> Dict[str, Dict[str, Any]]:
+        """领域清单 {领域: {"shard", "morphisms"}}（仅分片布局）"""
+        return self.core[MANIFEST_KEY] if self.sharded else {}
+
+    def domain_names(self) -> List[str]:
+        """全部领域名（不加载分片）"""
+        return list(self.manifest if self.sharded else self._domains)
+
+    def has_domain(self, domain: str) -> bool:
+        return domain in (self.manifest if self.sharded else self._domains)
+
+    def __len__(self) -> int:
+        return len(self.manifest if self.sharded else self._domains)
+
+    def _shard_path(self, domain: str) -> Path:
+        entry = self.manifest.get(domain)
+        name = entry["shard"] if entry else f"{SHARD_DIR}/{shard_filename(domain)}"
+        return self.root / name
+
+    def domain(self, domain: str) -> Dict[str, Any]:
+        """
+        读取领域数据（分片布局下首次访问时加载分片，并应用其上待重放的日志记录）
+
+        Raises:
+            KeyError: 领域不存在
+        """
+        data = self._domains.get(domain)
+        if data is None:
+            if not self.sharded or domain not in self.manifest:
+                raise KeyError(domain)
+            with open(self._shard_path(domain), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            for record in self._pending.pop(domain, []):
+                _apply_morphism_tags(data, record)
+            self._domains[domain] = data
+        return data
+
+    def iter_domains(self, domains: Optional[List[str]] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """按需逐个加载并产出 (领域, 数据)"""
+        for name in self.domain_names() if domains is None else domains:
+            yield name, self.domain(name)
+
+    def morphism_counts(self) -> Dict[str, int]:
+        """各领域的Morphism数（分片布局取自清单，不加载分片）"""
+        if self.sharded:
+            return {name: entry.get("morphisms", 0) for name, entry in self.manifest.items()}
+        return {name: len(data.get("morphisms", [])) for name, data in self._domains.items()}
+
+    def _refresh_metadata(self):
+        metadata = self.core.get("metadata")
+        if metadata is None:
+            return
+        counts = self.morphism_counts()
+        metadata["total_domains"] = len(counts)
+        metadata["total_morphisms"] = sum(counts.values())
+
+    # ---- 修改 ----
+
+    def _put_domain(self, domain: str, data: Dict[str, Any]):
+        if not self.sharded:
+            self.core.setdefault("domains", self._domains)
+        self._domains[domain] = data
+        self._pending.pop(domain, None)
+        self._dirty.add(domain)
+        if self.sharded:
+            self.manifest[domain] = {
+                "shard": self._shard_path(domain).relative_to(self.root).as_posix(),
+                "morphisms": len(data.get("morphisms", [])),
+            }
+
+    def set_domain(self, domain: str, data: Dict[str, Any]):
+        """新增或整体替换领域数据（commit()时记入日志）"""
+        self._put_domain(domain, data)
+        self._refresh_metadata()
+        self._queued.append({"op": "put_domain", "domain": domain, "data": data})
+
+    def set_morphism_tags(self, domain: str, morphism: str, tags: List[str], annotation_method: str):
+        """设置某个Morphism（按名称）的标签与标注方式（commit()时记入日志）"""
+        record = {
+            "op": "set_morphism_tags",
+            "domain": domain,
+            "morphism": morphism,
+            "tags": tags,
+            "annotation_method": annotation_method,
+        }
+        _apply_morphism_tags(self.domain(domain), record)
+        self._dirty.add(domain)
+        self._queued.append(record)
+
+    def commit(self) -> int:
+        """
+        把未提交的修改作为日志记录追加写入（独占锁 + fsync）
+
+        Returns:
+            写入的记录数
+        """
+        if not self._queued:
+            return 0
+        payload = b"".join(
+            (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+            for record in self._queued
+        )
+        # 在lock()内调用时进入锁时已追上；单独调用时先重放其他进程的记录
+        caught_up = self._lock_depth > 0
+        with self._flock():
+            if not caught_up:
+                self._refresh()
+            with open(self.journal_path, 'ab') as f:
+                # 截掉上次写入中断留下的不完整行
+                if f.tell() > self._journal_end:
+                    f.truncate(self._journal_end)
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+                journal = os.fstat(f.fileno())
+        self._journal_stat = (journal.st_mtime_ns, journal.st_size)
+        self._digest.update(payload)
+        self._journal_end += len(payload)
+        self.journal_records += len(self._queued)
+        written = len(self._queued)
+        self._queued = []
+        return written
+
+    def _write_base(self, indent: Optional[int] = 2):
+        """把当前状态写入主文件：分片布局先写被修改的分片，再原子替换core.json"""
+        self._refresh_metadata()
+        if self.sharded:
+            (self.root / SHARD_DIR).mkdir(parents=True, exist_ok=True)
+            for name in sorted(self._dirty):
+                write_json_atomic(self._shard_path(name), self.domain(name), indent)
+        write_json_atomic(self.path, self.core, indent)
+        self._dirty.clear()
+
+    def compact(self, indent: Optional[int] = 2) -> int:
+        """
+        把日志（及未提交的修改）合并回主文件并清空日志
+
+        主文件原子替换后才清空日志；两步之间中断时，日志记录会在已包含它们的主文件上
+        再重放一次，因操作幂等而结果不变。
+
+        Returns:
+            合并的记录数
+        """
+        with self.lock():
+            merged = self.journal_records + len(self._queued)
+            self._write_base(indent)
+            if self.journal_path.exists():
+                with open(self.journal_path, 'r+b') as f:
+                    f.truncate(0)
+                    f.flush()
+                    os.fsync(f.fileno())
+            self._queued = []
+            self._load()
+        return merged
+
+    def to_dict(self) -> Dict[str, Any]:
+        """加载全部领域，返回单文件布局的完整内容"""
+        if not self.sharded:
+            return self.core
+        data = {k: v for k, v in self.core.items() if k != MANIFEST_KEY}
+        data["domains"] = dict(self.iter_domains())
+        return data
+
+
+def _apply_morphism_tags(data: Dict[str, Any], record: Dict[str, Any]):
+    for morphism in data.get("morphisms", []):
+        if morphism.get("name") == record["morphism"]:
+            morphism["tags"] = record["tags"]
+            morphism["annotation_method"] = record["annotation_method"]
+
+
+def split_database(source: PathLike, target_dir: PathLike) -> TagsDatabase:
+    """将单文件数据库拆分为分片布局"""
+    with open(source, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    target_dir = Path(target_dir)
+    target_dir.mkdir(parents=True, exist_ok=True)
+    domains = data.pop("domains", {})
+    data[MANIFEST_KEY] = {}
+    write_json_atomic(target_dir / CORE_NAME, data)
+
+    db = TagsDatabase(target_dir)
+    for name, domain_data in domains.items():
+        db.set_domain(name, domain_data)
+    db.compact()
+    return db
+
+
+def merge_database(source: PathLike, target: PathLike):
+    """将任一布局的数据库合并为单文件"""
+    write_json_atomic(target, TagsDatabase(source).to_dict())
+
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="morphism_tags数据库布局转换")
+    sub = parser.add_subparsers(dest="command")
+    split_parser = sub.add_parser("split", help="单文件 -> 分片目录")
+    split_parser.add_argument("source")
+    split_parser.add_argument("target_dir")
+    merge_parser = sub.add_parser("merge", help="分片目录 -> 单文件")
+    merge_parser.add_argument("source")
+    merge_parser.add_argument("target")
+    info_parser = sub.add_parser("info", help="显示数据库概况")
+    info_parser.add_argument("path")
+    compact_parser = sub.add_parser("compact", help="把编辑日志合并回主文件")
+    compact_parser.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "split":
+        db = split_database(args.source, args.target_dir)
+        print(f"✅ 已拆分为 {len(db)} 个领域分片: {db.root}")
+    elif args.command == "merge":
+        merge_database(args.source, args.target)
+        print(f"✅ 已合并为单文件: {args.target}")
+    elif args.command == "info":
+        db = TagsDatabase(args.path)
+        counts = db.morphism_counts()
+        print(f"布局: {'分片' if db.sharded else '单文件'} ({db.path})")
+        print(f"标签: {len(db.core.get('tags', {}))} 个, 领域: {len(counts)} 个, "
+              f"Morphism: {sum(counts.values())} 个")
+        print(f"编辑日志: {db.journal_records} 条记录 ({db.journal_path})")
+    elif args.command == "compact":
+        merged = TagsDatabase(args.path).compact()
+        print(f"✅ 已将 {merged} 条日志记录合并回主文件")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Theorem Index - 定理检索索引（字符n-gram TF-IDF稀疏矩阵）
+对 references/ 下所有领域的 Theorems / Patterns 建立稀疏TF-IDF矩阵，
+文本取自每条定理的名称、Applicable_Structure 与 Mapping_Hint。
+矩阵持久化到磁盘；领域文件变化时只重新分词变化的文件。
+
+Usage:
+    python theorem_index.py build
+    python theorem_index.py query "<用户Morphism动态描述>" [--domain d] [--top-k k]
+"""
+
+import heapq
+import math
+import os
+import pickle
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Tuple, Any, Optional
+
+from reference_index import REFERENCES_DIR, INDEX_PATH, ReferenceIndex, load_or_build_index
+
+THEOREM_INDEX_VERSION = 1
+THEOREM_INDEX_PATH = REFERENCES_DIR / ".theorem_index.pickle"
+
+# 参与检索的定理字段
+INDEXED_FIELDS = ("Applicable_Structure", "Mapping_Hint")
+NGRAM_SIZES = (2, 3)
+WORD_RE = re.compile(r'\w+')
+
+
+def char_ngrams(text: str) -> Counter:
+    """按连续的字母数字片段切出字符n-gram并计数（标点与空白不跨越）"""
+    grams = Counter()
+    for run in WORD_RE.findall(text.lower()):
+        if len(run) < NGRAM_SIZES[0]:
+            grams[run] += 1
+            continue
+        for n in NGRAM_SIZES:
+            for i in range(len(run) - n + 1):
+                grams[run[i:i + n]] += 1
+    return grams
+
+
+def _theorem_docs(ref: ReferenceIndex, domain: str) -> List[Dict[str, Any]]:
+    """读取某领域所有定理的检索文本并分词"""
+    docs = []
+    for record in ref.entry(domain)["theorems"]:
+        parts = [record["name"]]
+        for field in INDEXED_FIELDS:
+            span = record["fields"].get(field)
+            if span:
+                parts.append(ref.read(domain, span))
+        docs.append({
+            "number": record["number"],
+            "name": record["name"],
+            "tf": dict(char_ngrams("\n".join(parts))),
+        })
+    return docs
+
+
+class TheoremIndex:
+    """
+    定理TF-IDF稀疏索引
+
+    - rows: 每条定理的稀疏向量 {term_id: weight}（L2归一化）
+    - postings: 倒排表 term_id -> [(row, weight)]，查询时只访问共有n-gram
+    """
+
+    def __init__(self, files: Dict[str, Dict[str, Any]]):
+        """
+        Args:
+            files: {domain: {"path", "mtime_ns", "size", "docs": [{"number", "name", "tf"}]}}
+        """
+        self.files = files
+        self._build_matrix()
+
+    def _build_matrix(self):
+        """由各文件的词频计算IDF与归一化TF-IDF矩阵"""
+        self.doc_keys: List[Tuple[str, int, str]] = []
+        doc_tfs: List[Dict[str, int]] = []
+        for domain, entry in self.files.items():
+            for doc in entry["docs"]:
+                self.doc_keys.append((domain, doc["number"], doc["name"]))
+                doc_tfs.append(doc["tf"])
+
+        df = Counter()
+        for tf in doc_tfs:
+            df.update(tf.keys())
+        total = len(doc_tfs)
+        self.vocabulary: Dict[str, int] = {term: i for i, term in enumerate(df)}
+        self.idf: List[float] = [math.log((1 + total) / (1 + df[term])) + 1 for term in df]
+
+        self.rows: List[Dict[int, float]] = []
+        self.postings: Dict[int, List[Tuple[int, float]]] = {}
+        for row_id, tf in enumerate(doc_tfs):
+            row = self._weigh(tf)
+            self.rows.append(row)
+            for term_id, weight in row.items():
+                self.postings.setdefault(term_id, []).append((row_id, weight))
+
+    def _weigh(self, tf: Dict[str, int]) -> Dict[int, float]:
+        """次线性TF × IDF，并做L2归一化；未登录词忽略"""
+        row = {}
+        for term, count in tf.items():
+            term_id = self.vocabulary.get(term)
+            if term_id is not None:
+                row[term_id] = (1 + math.log(count)) * self.idf[term_id]
+        norm = math.sqrt(sum(w * w for w in row.values()))
+        if norm > 0:
+            for term_id in row:
+                row[term_id] /= norm
+        return row
+
+    def query(
+        self,
+        text: str,
+        top_k: int = 5,
+        domains: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        检索与文本最相近的定理（余弦相似度）
+
+        Args:
+            text: 查询文本，如用户Morphism的dynamics
+            top_k: 返回数量
+            domains: 只在这些领域内检索
+
+        Returns:
+            [{"domain", "number", "name", "score"}, ...]，按分数降序
+        """
+        allowed = set(domains) if domains else None
+        scores: Dict[int, float] = {}
+        for term_id, weight in self._weigh(char_ngrams(text)).items():
+            for row_id, doc_weight in self.postings.get(term_id, ()):
+                scores[row_id] = scores.get(row_id, 0.0) + weight * doc_weight
+        if allowed is not None:
+            scores = {r: s for r, s in scores.items() if self.doc_keys[r][0] in allowed}
+
+        best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+        return [
+            {"domain": self.doc_keys[r][0], "number": self.doc_keys[r][1],
+             "name": self.doc_keys[r][2], "score": score}
+            for r, score in best
+        ]
+
+    def query_morphisms(
+        self,
+        morphisms: List[Dict[str, str]],
+        top_k: int = 3,
+        domains: Optional[List[str]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        为每个用户Morphism检索最匹配的定理
+
+        Args:
+            morphisms: [{"from", "to", "dynamics"}, ...]
+            top_k: 每个Morphism返回的定理数
+            domains: 限定领域（通常为已选定的Domain B）
+
+        Returns:
+            与morphisms一一对应的检索结果列表
+        """
+        return [self.query(m.get("dynamics", ""), top_k, domains) for m in morphisms]
+
+    def save(self, path: Path = THEOREM_INDEX_PATH):
+        """原子写入：词频与矩阵一并持久化，加载时无需重新计算"""
+        path = Path(path)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        state = {
+            "version": THEOREM_INDEX_VERSION,
+            "files": self.files,
+            "doc_keys": self.doc_keys,
+            "vocabulary": self.vocabulary,
+            "idf": self.idf,
+            "rows": self.rows,
+            "postings": self.postings,
+        }
+        with open(tmp_path, 'wb') as f:
+            f.write(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def _from_state(cls, state: Dict[str, Any]) -> "TheoremIndex":
+        """从持久化状态恢复，跳过矩阵计算"""
+        index = cls.__new__(cls)
+        for key in ("files", "doc_keys", "vocabulary", "idf", "rows", "postings"):
+            setattr(index, key, state[key])
+        return index
+
+    @classmethod
+    def load(
+        cls,
+        path: Path = THEOREM_INDEX_PATH,
+        references_dir: Path = REFERENCES_DIR,
+        reference_index_path: Path = INDEX_PATH
+    ) -> "TheoremIndex":
+        """
+        加载索引；有领域文件新增、删除或变化时增量重建并保存
+
+        只有变化的文件会被重新读取和分词，IDF与矩阵随之整体重算
+        """
+        try:
+            with open(path, 'rb') as f:
+                state = pickle.loads(f.read())
+            if state.get("version") != THEOREM_INDEX_VERSION:
+                state = None
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError, AttributeError):
+            state = None
+        old_files = state["files"] if state else {}
+
+        ref_index = load_or_build_index(references_dir, reference_index_path)
+        files: Dict[str, Any] = {}
+        changed = False
+        with ReferenceIndex(references_dir, index=ref_index) as ref:
+            for domain, entry in ref_index["files"].items():
+                old = old_files.get(domain)
+                if old and all(old.get(k) == entry[k] for k in ("path", "mtime_ns", "size")):
+                    files[domain] = old
+                    continue
+                files[domain] = {
+                    "path": entry["path"],
+                    "mtime_ns": entry["mtime_ns"],
+                    "size": entry["size"],
+                    "docs": _theorem_docs(ref, domain),
+                }
+                changed = True
+        changed = changed or set(files) != set(old_files)
+
+        if state and not changed:
+            return cls._from_state(state)
+
+        index = cls(files)
+        try:
+            index.save(path)
+        except OSError:
+            pass
+        return index
+
+
+def main():
+    """主函数"""
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="定理TF-IDF检索索引")
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("build", help="构建/刷新索引")
+    query = sub.add_parser("query", help="检索定理")
+    query.add_argument("text", help="查询文本（用户Morphism的动态描述）")
+    query.add_argument("--domain", action="append", help="限定领域，可重复")
+    query.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.perf_counter()
+        index = TheoremIndex.load()
+        print(f"✅ 已索引 {len(index.doc_keys)} 条定理, {len(index.vocabulary)} 个n-gram "
+              f"({(time.perf_counter() - start) * 1000:.1f} ms)")
+        print(f"   索引路径: {THEOREM_INDEX_PATH}")
+    elif args.command == "query":
+        index = TheoremIndex.load()
+        start = time.perf_counter()
+        results = index.query(args.text, args.top_k, args.domain)
+        elapsed = (time.perf_counter() - start) * 1000
+        for i, hit in enumerate(results, 1):
+            print(f"{i}. [{hit['domain']}] {hit['number']}. {hit['name']}  ({hit['score']:.3f})")
+        print(f"用时 {elapsed:.2f} ms")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,17 +2,34 @@
 """
 自动更新morphism_tags.json数据库
 当新增领域时，自动提取Core Morphisms并添加标签占位符
+
+支持批量模式（--all）：扫描目录，按内容哈希清单只解析新增/变更的文件，
+并行解析后在文件锁下一次性追加到编辑日志
+
+数据库可以是单文件JSON或分片目录（见tags_db.py），修改只追加到编辑日志，
+由 python tags_db.py compact 合并回主文件
 """
 
+import hashlib
 import json
 import re
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+from tags_db import SHARD_DIR, TagsDatabase, core_path, default_db_path, shard_filename, write_json_atomic
+
+# 批量导入的内容哈希清单，位于数据库旁
+MANIFEST_NAME = ".ingest_manifest.json"
+
 def extract_morphisms_from_domain(domain_path):
     """从领域文件中提取Core Morphisms"""
     with open(domain_path, 'r', encoding='utf-8') as f:
         content = f.read()
-    
+    return parse_morphisms(content)
+
+def parse_morphisms(content):
+    """从领域文件内容中提取Core Morphisms"""
     # 查找Core Morphisms部分
     pattern = r'## Core Morphisms \(14个\)(.*?)(?=##|\Z)'
     match = re.search(pattern, content, re.DOTALL)
@@ -41,33 +58,25 @@ def extract_morphisms_from_domain(domain_path):
 def update_morphism_tags_db(domain_name, domain_path, db_path):
     """更新morphism_tags.json数据库"""
     
-    # 读取数据库
-    with open(db_path, 'r', encoding='utf-8') as f:
-        db = json.load(f)
-    
-    # 如果领域已存在，跳过
-    if domain_name in db['domains']:
-        print(f"领域 '{domain_name}' 已存在于数据库中")
-        return False
-    
     # 提取Morphism
     morphisms = extract_morphisms_from_domain(domain_path)
     
-    if len(morphisms) != 14:
-        print(f"警告: 只提取到 {len(morphisms)} 个Morphism，预期14个")
-    
-    # 添加到数据库
-    db['domains'][domain_name] = {
-        'morphisms': morphisms
-    }
-    
-    # 更新metadata
-    db['metadata']['total_domains'] = len(db['domains'])
-    db['metadata']['total_morphisms'] = sum(len(d['morphisms']) for d in db['domains'].values())
-    
-    # 保存
-    with open(db_path, 'w', encoding='utf-8') as f:
-        json.dump(db, f, ensure_ascii=False, indent=2)
+    # 读取数据库（分片布局只读取core.json），在写锁内判断并追加，避免与并发写入互相覆盖
+    db = TagsDatabase(db_path)
+    with db.lock():
+        # 如果领域已存在，跳过
+        if db.has_domain(domain_name):
+            print(f"领域 '{domain_name}' 已存在于数据库中")
+            return False
+        
+        if len(morphisms) != 14:
+            print(f"警告: 只提取到 {len(morphisms)} 个Morphism，预期14个")
+        
+        # 添加到数据库（追加到编辑日志，metadata在重放时重新统计）
+        db.set_domain(domain_name, {
+            'morphisms': morphisms
+        })
+        db.commit()
     
     print(f"✅ 已添加领域 '{domain_name}' 到数据库")
     print(f"   - 提取Morphism: {len(morphisms)} 个")
@@ -76,21 +85,131 @@ def update_morphism_tags_db(domain_name, domain_path, db_path):
     
     return True
 
+def domain_name_from_path(path):
+    """文件名 -> 领域名，如 yijing_thought_v2.md -> yijing_thought"""
+    stem = Path(path).stem
+    return stem[:-3] if stem.endswith("_v2") else stem
+
+def load_manifest(manifest_path):
+    """读取内容哈希清单 {文件名: sha256}"""
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _parse_domain_file(path):
+    """工作进程：解析单个领域文件，返回 (路径, 哈希, Morphism列表, 耗时)"""
+    start = time.perf_counter()
+    with open(path, 'rb') as f:
+        raw = f.read()
+    morphisms = parse_morphisms(raw.decode('utf-8'))
+    return str(path), hashlib.sha256(raw).hexdigest(), morphisms, time.perf_counter() - start
+
+def _merge_morphisms(old_morphisms, new_morphisms):
+    """同名Morphism保留已有标签与标注方式，避免覆盖人工标注"""
+    previous = {m.get('name'): m for m in old_morphisms}
+    for morphism in new_morphisms:
+        old = previous.get(morphism['name'])
+        if old and old.get('tags'):
+            morphism['tags'] = old['tags']
+            morphism['annotation_method'] = old.get('annotation_method', 'pending')
+    return new_morphisms
+
+def ingest_directory(domain_dir, db_path, workers=None, force=False):
+    """
+    批量导入目录下的所有领域文件
+    
+    Args:
+        domain_dir: 领域文件目录（如 references/custom/）
+        db_path: morphism_tags.json路径或分片目录
+        workers: 并行解析进程数，默认CPU核数
+        force: 忽略清单，重新解析全部文件
+    
+    Returns:
+        (新增领域数, 更新领域数, 跳过文件数)
+    """
+    manifest_path = core_path(db_path).with_name(MANIFEST_NAME)
+    manifest = {} if force else load_manifest(manifest_path)
+    
+    total_start = time.perf_counter()
+    files = sorted(p for p in Path(domain_dir).glob("*.md") if not p.name.startswith("_"))
+    
+    # 先用哈希筛掉未变化的文件（只读文件，不做解析）
+    changed = []
+    for path in files:
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        if manifest.get(path.name) != digest:
+            changed.append(path)
+    skipped = len(files) - len(changed)
+    
+    if not changed:
+        print(f"没有新增或变更的领域文件（已跳过 {skipped} 个）")
+        return 0, 0, skipped
+    
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parsed = list(pool.map(_parse_domain_file, changed))
+    
+    db = TagsDatabase(db_path)
+    added = updated = 0
+    with db.lock():
+        for path_str, digest, morphisms, seconds in parsed:
+            path = Path(path_str)
+            domain_name = domain_name_from_path(path)
+            
+            if db.has_domain(domain_name):
+                data = db.domain(domain_name)
+                data['morphisms'] = _merge_morphisms(data.get('morphisms', []), morphisms)
+                db.set_domain(domain_name, data)
+                updated += 1
+                action = "更新"
+            else:
+                db.set_domain(domain_name, {'morphisms': morphisms})
+                added += 1
+                action = "新增"
+            manifest[path.name] = digest
+            
+            warning = "" if len(morphisms) == 14 else "  ⚠️ 预期14个"
+            print(f"   {action} {domain_name}: {len(morphisms)} 个Morphism, {seconds * 1000:.1f} ms{warning}")
+        
+        # 整批只追加一次日志；数据库写入成功后再更新清单
+        db.commit()
+        write_json_atomic(manifest_path, manifest)
+    
+    print(f"✅ 批量导入完成: 新增 {added}, 更新 {updated}, 跳过 {skipped}, "
+          f"总耗时 {time.perf_counter() - total_start:.2f}s")
+    return added, updated, skipped
+
 def main():
     """主函数"""
     import sys
     
     if len(sys.argv) < 2:
         print("用法: python update_morphism_db.py <domain_name>")
+        print("      python update_morphism_db.py --all [领域目录] [--force]")
         print("示例: python update_morphism_db.py new_domain")
+        print("      python update_morphism_db.py --all            # 导入 references/custom/ 下所有新增或变更的领域")
         sys.exit(1)
     
-    domain_name = sys.argv[1]
-    
     # 路径设置
     script_dir = Path(__file__).parent
+    db_path = default_db_path(script_dir.parent / "data")
+    
+    if sys.argv[1] == "--all":
+        args = [a for a in sys.argv[2:] if a != "--force"]
+        domain_dir = Path(args[0]) if args else script_dir.parent / "references" / "custom"
+        if not domain_dir.is_dir():
+            print(f"错误: 领域目录不存在: {domain_dir}")
+            sys.exit(1)
+        if not db_path.exists():
+            print(f"错误: 数据库文件不存在: {db_path}")
+            sys.exit(1)
+        ingest_directory(domain_dir, db_path, force="--force" in sys.argv)
+        return
+    
+    domain_name = sys.argv[1]
     domain_path = script_dir.parent / "references" / "custom" / f"{domain_name}_v2.md"
-    db_path = script_dir.parent / "data" / "morphism_tags.json"
     
     if not domain_path.exists():
         print(f"错误: 领域文件不存在: {domain_path}")
@@ -106,7 +225,9 @@ def main():
     
     if success:
         print("\n下一步:")
-        print("1. 打开 data/morphism_tags.json")
+        target = db_path / SHARD_DIR / shard_filename(domain_name) if db_path.is_dir() else db_path
+        print(f"1. 运行 python scripts/tags_db.py compact {db_path.relative_to(script_dir.parent)} 合并编辑日志，"
+              f"然后打开 {target.relative_to(script_dir.parent)}")
         print(f"2. 找到 '{domain_name}' 领域")
         print("3. 为每个Morphism的 'tags' 字段添加1-3个标签")
         print("4. 将 'annotation_method' 改为 'manual'")
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Validate References - 领域知识库结构校验
+并行检查 references/ 与 references/custom/ 下的所有V2领域文件：
+- 文件头: Domain / Source / Structural_Primitives
+- 章节数量: Fundamentals 100条（含各小节声明的条数）、Core Objects 14、Core Morphisms 14、Theorems 18
+- 每个Morphism的 *涉及* / *动态* 字段
+- 每个Theorem的 内容 / Applicable_Structure / Mapping_Hint / Case_Study 字段及编号连续性
+- 每个领域在 morphism_tags.json 的 domain_tag_mapping 中有条目
+
+文件内容的校验结果按sha256缓存，重复运行只重新校验变化的文件。
+
+Usage:
+    python validate_references.py [--tags-file PATH] [--workers N] [--force] [--json]
+"""
+
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple
+
+from reference_index import REFERENCES_DIR, iter_reference_files, domain_name_for, parse_reference
+from tags_db import core_path
+
+CACHE_VERSION = 1
+CACHE_PATH = REFERENCES_DIR / ".validation_cache.json"
+TAGS_FILE = Path(__file__).parent.parent / "assets" / "morphism_tags.json"
+
+EXPECTED_COUNTS = {"fundamentals": 100, "objects": 14, "morphisms": 14, "theorems": 18}
+HEADER_FIELDS = ("Domain", "Source", "Structural_Primitives")
+MORPHISM_FIELDS = ("涉及", "动态")
+THEOREM_FIELDS = ("内容", "Applicable_Structure", "Mapping_Hint", "Case_Study")
+FUNDAMENTALS_SECTION = "Fundamentals"
+
+NUMBERED_ITEM_RE = re.compile(r'^(\d+)\.\s+\S', re.MULTILINE)
+SUBSECTION_RE = re.compile(r'^### (.+?)\((\d+)条\)\s*$', re.MULTILINE)
+
+
+def _fundamental_issues(text: str) -> Tuple[int, List[str]]:
+    """统计Fundamentals的编号条目数，核对各小节声明的条数与1-100编号连续性"""
+    issues = []
+    numbers = [int(n) for n in NUMBERED_ITEM_RE.findall(text)]
+    missing = sorted(set(range(1, len(numbers) + 1)) - set(numbers))
+    if missing or numbers != sorted(numbers):
+        issues.append("Fundamentals 编号不连续" + (f"，缺少 {missing[:10]}" if missing else ""))
+    headings = list(SUBSECTION_RE.finditer(text))
+    for i, heading in enumerate(headings):
+        end = headings[i + 1].start() if i + 1 < len(headings) else len(text)
+        declared = int(heading.group(2))
+        actual = len(NUMBERED_ITEM_RE.findall(text, heading.end(), end))
+        if actual != declared:
+            issues.append(f"Fundamentals「{heading.group(1).strip()}」声明{declared}条，实际{actual}条")
+    return len(numbers), issues
+
+
+def validate_content(data: bytes) -> Dict[str, Any]:
+    """
+    校验单个领域文件的内容（与领域库其他部分无关，可按哈希缓存）
+
+    Returns:
+        {"counts": {...}, "issues": [问题描述, ...]}
+    """
+    entry = parse_reference(data)
+    issues = []
+
+    def read(span) -> str:
+        return data[span[0]:span[1]].decode("utf-8", errors="replace")
+
+    for field in HEADER_FIELDS:
+        span = entry["header"].get(field)
+        if span is None or not read(span).strip():
+            issues.append(f"文件头缺少 {field}")
+
+    counts = {kind: len(entry[kind]) for kind in ("objects", "morphisms", "theorems")}
+    span = entry["sections"].get(FUNDAMENTALS_SECTION)
+    if span is None:
+        counts["fundamentals"] = 0
+    else:
+        counts["fundamentals"], fundamental_issues = _fundamental_issues(read(span))
+        issues.extend(fundamental_issues)
+    for kind, expected in EXPECTED_COUNTS.items():
+        if counts[kind] != expected:
+            issues.append(f"{kind} 数量为 {counts[kind]}，预期 {expected}")
+
+    for morphism in entry["morphisms"]:
+        for field in MORPHISM_FIELDS:
+            span = morphism["fields"].get(field)
+            if span is None or not read(span).strip():
+                issues.append(f"Morphism「{morphism['name']}」缺少 *{field}*")
+
+    for expected_number, theorem in enumerate(entry["theorems"], 1):
+        label = f"Theorem {theorem['number']}「{theorem['name']}」"
+        if theorem["number"] != expected_number:
+            issues.append(f"{label} 编号不连续，预期 {expected_number}")
+        for field in THEOREM_FIELDS:
+            span = theorem["fields"].get(field)
+            if span is None or not read(span).strip():
+                issues.append(f"{label} 缺少 **{field}**")
+
+    return {"counts": counts, "issues": issues}
+
+
+def _validate_file(path: str) -> Tuple[str, str, Dict[str, Any]]:
+    """工作进程：读取并校验单个文件，返回 (路径, 哈希, 结果)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    return path, hashlib.sha256(data).hexdigest(), validate_content(data)
+
+
+def load_cache(cache_path: Path = CACHE_PATH) -> Dict[str, Any]:
+    """读取校验缓存 {相对路径: {"sha256", "counts", "issues"}}"""
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        if cache.get("version") == CACHE_VERSION:
+            return cache["files"]
+    except (OSError, ValueError, KeyError, AttributeError):
+        pass
+    return {}
+
+
+def save_cache(files: Dict[str, Any], cache_path: Path = CACHE_PATH):
+    """原子写入校验缓存"""
+    cache_path = Path(cache_path)
+    tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"version": CACHE_VERSION, "files": files}, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, cache_path)
+
+
+def load_mapped_domains(tags_file: Path = TAGS_FILE) -> Optional[set]:
+    """domain_tag_mapping中的领域集合；标签库不可读时返回None（跳过该项检查）"""
+    try:
+        with open(core_path(tags_file), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return set(data.get("tag_relationships", {}).get("domain_tag_mapping", {}))
+
+
+def validate_corpus(
+    references_dir: Path = REFERENCES_DIR,
+    tags_file: Path = TAGS_FILE,
+    cache_path: Path = CACHE_PATH,
+    workers: Optional[int] = None,
+    force: bool = False
+) -> Dict[str, Any]:
+    """
+    校验整个领域知识库
+
+    Args:
+        references_dir: references目录
+        tags_file: morphism_tags.json路径或分片目录（检查domain_tag_mapping）
+        cache_path: 校验缓存路径
+        workers: 并行校验进程数，默认CPU核数
+        force: 忽略缓存，重新校验全部文件
+
+    Returns:
+        {"files": {领域: {"path", "counts", "issues"}}, "checked", "cached", "seconds"}
+    """
+    start = time.perf_counter()
+    references_dir = Path(references_dir)
+    cache = {} if force else load_cache(cache_path)
+    paths = {path.relative_to(references_dir).as_posix(): path for path in iter_reference_files(references_dir)}
+
+    # 先按内容哈希筛掉未变化的文件，只有变化的文件进入进程池
+    fresh: Dict[str, Any] = {}
+    changed = []
+    for relative, path in paths.items():
+        digest = hashlib.sha256(path.read_bytes()).hexdigest()
+        cached = cache.get(relative)
+        if cached and cached.get("sha256") == digest:
+            fresh[relative] = cached
+        else:
+            changed.append(str(path))
+
+    if len(changed) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_validate_file, changed))
+    else:
+        results = [_validate_file(path) for path in changed]
+    for path, digest, result in results:
+        fresh[Path(path).relative_to(references_dir).as_posix()] = dict(result, sha256=digest)
+
+    if changed or set(fresh) != set(cache):
+        try:
+            save_cache(fresh, cache_path)
+        except OSError:
+            pass
+
+    # domain_tag_mapping随标签库变化，不进入按文件哈希的缓存
+    mapped = load_mapped_domains(tags_file)
+    files = {}
+    for relative in sorted(fresh):
+        domain = domain_name_for(paths[relative])
+        issues = list(fresh[relative]["issues"])
+        if mapped is not None and domain not in mapped:
+            issues.append("domain_tag_mapping 中没有该领域")
+        files[domain] = {"path": relative, "counts": fresh[relative]["counts"], "issues": issues}
+
+    return {
+        "files": files,
+        "checked": len(changed),
+        "cached": len(paths) - len(changed),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def main():
+    """主函数"""
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="领域知识库结构校验")
+    parser.add_argument("--references-dir", default=str(REFERENCES_DIR))
+    parser.add_argument("--tags-file", default=str(TAGS_FILE))
+    parser.add_argument("--workers", type=int, default=None, help="并行进程数，默认CPU核数")
+    parser.add_argument("--force", action="store_true", help="忽略缓存，重新校验全部文件")
+    parser.add_argument("--json", action="store_true", help="以JSON输出完整结果")
+    args = parser.parse_args()
+
+    references_dir = Path(args.references_dir)
+    report = validate_corpus(references_dir, Path(args.tags_file), references_dir / CACHE_PATH.name,
+                             args.workers, args.force)
+    failed = {d: r for d, r in report["files"].items() if r["issues"]}
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        for domain, result in report["files"].items():
+            if not result["issues"]:
+                continue
+            print(f"❌ {domain} ({result['path']})")
+            for issue in result["issues"]:
+                print(f"   - {issue}")
+        print(f"{'✅' if not failed else '⚠️'} 已校验 {len(report['files'])} 个领域: "
+              f"{len(report['files']) - len(failed)} 个通过, {len(failed)} 个有问题 "
+              f"(重新校验 {report['checked']}, 缓存命中 {report['cached']}, {report['seconds'] * 1000:.0f} ms)")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()